@@ -11,21 +11,408 @@ Runs on port 5009.
 import json
 import asyncio
 import aiohttp
+import atexit
+import heapq
+import logging
+import logging.handlers
 import os
+import queue
+import random
 import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from sanic import Sanic, Request, text
 from sanic.response import json as json_response
 
 app = Sanic("ab_proxy")
 
+# ============================================================
+# Logging: records are queued on the event loop and written to
+# stderr by a background listener thread, so a slow terminal or
+# pipe never blocks request handling.  DEBUG detail (request
+# dumps, raw result rows) is skipped entirely unless enabled, and
+# can be sampled when it is.
+# ============================================================
+LOG_LEVEL = os.getenv("AB_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("AB_LOG_FORMAT", "text").lower()  # text | json
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("AB_LOG_DEBUG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("AB_LOG_QUEUE_SIZE", "10000"))
+
+
+class _StructuredFormatter(logging.Formatter):
+    """
+    Render a record as one text line or one JSON object.
+
+    Structured fields are passed as extra={"ctx": {...}} and appended as
+    key=value pairs (text) or merged into the object (json).
+    """
+
+    def __init__(self, fmt: str):
+        super().__init__()
+        self.fmt = fmt
+
+    def format(self, record: logging.LogRecord) -> str:
+        ctx = getattr(record, "ctx", None) or {}
+        message = record.getMessage()
+        if self.fmt == "json":
+            doc = {
+                "ts": round(record.created, 3),
+                "level": record.levelname,
+                "logger": record.name,
+                "msg": message,
+            }
+            doc.update(ctx)
+            if record.exc_info:
+                doc["exc"] = self.formatException(record.exc_info)
+            return json.dumps(doc, ensure_ascii=False, default=str)
+        line = f"{self.formatTime(record)} {record.levelname} [AB Proxy] {message}"
+        if ctx:
+            line += " " + " ".join(f"{k}={v}" for k, v in ctx.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class _DebugSampler(logging.Filter):
+    """Keep only a fraction of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting (timestamps, JSON) happens on the listener thread; only
+        # resolve the message here so mutable args are captured as-is.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _setup_logging() -> tuple[logging.Logger, _NonBlockingQueueHandler, logging.handlers.QueueListener]:
+    logger = logging.getLogger("ab_proxy")
+    logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    logger.propagate = False
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(_StructuredFormatter(LOG_FORMAT))
+    queue_handler = _NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    queue_handler.addFilter(_DebugSampler(LOG_DEBUG_SAMPLE_RATE))
+    logger.handlers = [queue_handler]
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=False)
+    listener.start()
+    atexit.register(listener.stop)
+    return logger, queue_handler, listener
+
+
+log, _log_queue_handler, _log_listener = _setup_logging()
+
+
+class _LazyJson:
+    """Defer json.dumps until the record is actually emitted."""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        return json.dumps(self.obj, ensure_ascii=False)
+
+
+def _log_stats() -> dict:
+    return {
+        "level": logging.getLevelName(log.level),
+        "format": LOG_FORMAT,
+        "debug_sample_rate": LOG_DEBUG_SAMPLE_RATE,
+        "queued": _log_queue_handler.queue.qsize(),
+        "dropped": _log_queue_handler.dropped,
+    }
+
+
+# ============================================================
+# Metrics: in-process counters and histograms rendered in the
+# Prometheus text format by GET /metrics.  Existing stats dicts
+# (cache, coalescing, HTTP pool, jobs) are exported through
+# collectors evaluated at scrape time.
+# ============================================================
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+POLL_ATTEMPT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 25, 40)
+POLL_WAIT_BUCKETS = (0.5, 1, 2, 3, 5, 8, 13, 20, 30, 40, 60, 120, 300, 900)
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _render_labels(labels: tuple, extra: str = "") -> str:
+    parts = [f'{k}="{_escape_label(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, labels, "", value
+
+
+class _Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., sum, count]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        for labels, series in self.values.items():
+            for i, bound in enumerate(self.buckets):
+                yield f"{self.name}_bucket", labels, f'le="{bound}"', series[i]
+            yield f"{self.name}_bucket", labels, 'le="+Inf"', series[-1]
+            yield f"{self.name}_sum", labels, "", series[-2]
+            yield f"{self.name}_count", labels, "", series[-1]
+
+
+class MetricsRegistry:
+    """Minimal Prometheus-compatible registry (no client library dependency)."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._metrics: list = []
+        self._collectors: list = []
+
+    def counter(self, name: str, help_text: str) -> _Counter:
+        metric = _Counter(f"{self.prefix}_{name}", help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS) -> _Histogram:
+        metric = _Histogram(f"{self.prefix}_{name}", help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn) -> None:
+        """fn() -> iterable of (name, kind, help, value) for values owned elsewhere."""
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, extra, value in metric.samples():
+                lines.append(f"{name}{_render_labels(labels, extra)} {value}")
+        for fn in self._collectors:
+            for name, kind, help_text, value in fn():
+                full_name = f"{self.prefix}_{name}"
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                lines.append(f"{full_name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics = MetricsRegistry("ab_proxy")
+_upstream_seconds = _metrics.histogram(
+    "upstream_request_seconds", "AB API call latency by upstream namespace and HTTP status.",
+)
+_poll_attempts = _metrics.histogram(
+    "poll_attempts", "Result polls per query, by outcome (done/failed/pending).", POLL_ATTEMPT_BUCKETS,
+)
+_poll_wait_seconds = _metrics.histogram(
+    "poll_wait_seconds", "Time from first poll until the result was ready or polling stopped.", POLL_WAIT_BUCKETS,
+)
+_stage_seconds = _metrics.histogram(
+    "stage_seconds", "Time spent per /ab_report pipeline stage.",
+)
+_template_fallbacks = _metrics.counter(
+    "template_group_fallback_total", "Key requests retried with the fallback template group.",
+)
+_report_requests = _metrics.counter(
+    "report_requests_total", "/ab_report requests by how they were served.",
+)
+
+
+class _StageTimer:
+    """with _StageTimer("poll"): ... records the block duration in ab_proxy_stage_seconds."""
+
+    __slots__ = ("stage", "started_at")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _stage_seconds.observe(time.perf_counter() - self.started_at, stage=self.stage)
+        return False
+
+
+def _observe_poll(poll_run, outcome: str) -> None:
+    _poll_attempts.observe(poll_run.attempt, outcome=outcome)
+    _poll_wait_seconds.observe(poll_run.elapsed, outcome=outcome)
+
+
 # ============================================================
 # Short-lived response cache to prevent duplicate upstream calls.
 # COTA's dialogue loop can trigger the same executer request many
 # times in a single turn.  We cache by request-body hash for 60s.
 # ============================================================
-_response_cache: dict[str, tuple[float, dict]] = {}  # hash -> (timestamp, response_json)
 CACHE_TTL_SECONDS = 60
+CACHE_MAX_ENTRIES = int(os.getenv("AB_CACHE_MAX_ENTRIES", "512"))
+CACHE_MAX_BYTES = int(os.getenv("AB_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+class ResponseCache:
+    """Bounded LRU + TTL cache for formatted proxy responses.
+
+    Entries live in an OrderedDict in recency order, so LRU eviction is
+    O(1).  Expiry deadlines sit in a min-heap, so purging expired keys
+    on each write costs O(log n) per expired entry instead of a full
+    scan.  Heap entries for overwritten or evicted keys are skipped
+    lazily and the heap is rebuilt once they outnumber live entries.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self._entries: OrderedDict[str, tuple[float, int, dict]] = OrderedDict()  # key -> (expires_at, size, value)
+        self._expiry_heap: list[tuple[float, str]] = []
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, key: str, value: dict, ttl_seconds: float | None = None) -> None:
+        size = len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        if size > self.max_bytes:
+            self.rejected += 1
+            return
+        now = time.monotonic()
+        expires_at = now + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, size, value)
+        self._bytes += size
+        heapq.heappush(self._expiry_heap, (expires_at, key))
+
+        self._purge_expired(now)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            old_key, (_, old_size, _) = self._entries.popitem(last=False)
+            self._bytes -= old_size
+            self.evictions += 1
+        if len(self._expiry_heap) > 2 * len(self._entries) + 64:
+            self._expiry_heap = [(exp, k) for k, (exp, _, _) in self._entries.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def clear(self) -> int:
+        size_before = len(self._entries)
+        self._entries.clear()
+        self._expiry_heap.clear()
+        self._bytes = 0
+        return size_before
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejected": self.rejected,
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _purge_expired(self, now: float) -> None:
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            entry = self._entries.get(key)
+            # Skip heap records left behind by overwritten or evicted keys.
+            if entry is not None and entry[0] == expires_at:
+                self._remove(key)
+                self.expirations += 1
+
+
+_response_cache = ResponseCache(CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
 
 
 def _cache_key(params: dict) -> str:
@@ -37,24 +424,219 @@ def _cache_key(params: dict) -> str:
 
 def _cache_get(key: str) -> dict | None:
     """Return cached response if still valid, else None."""
-    entry = _response_cache.get(key)
-    if entry is None:
-        return None
-    ts, resp = entry
-    if datetime.now().timestamp() - ts > CACHE_TTL_SECONDS:
-        _response_cache.pop(key, None)
-        return None
-    return resp
+    return _response_cache.get(key)
 
 
 def _cache_set(key: str, resp: dict) -> None:
-    """Store a response in cache with current timestamp."""
-    _response_cache[key] = (datetime.now().timestamp(), resp)
-    # Evict old entries to prevent unbounded growth
-    cutoff = datetime.now().timestamp() - CACHE_TTL_SECONDS * 2
-    stale = [k for k, (ts, _) in _response_cache.items() if ts < cutoff]
-    for k in stale:
-        _response_cache.pop(k, None)
+    """Store a response in cache with the default TTL."""
+    _response_cache.set(key, resp)
+
+
+# ============================================================
+# Persistent result store: completed reports survive restarts and
+# are shared by every Sanic worker through one SQLite (WAL) file.
+# Reports ending before today are immutable and kept for a long
+# TTL; ranges that include today get a short one.
+# ============================================================
+RESULT_STORE_BACKEND = os.getenv("AB_RESULT_STORE", "sqlite").lower()  # sqlite | none
+RESULT_STORE_PATH = os.getenv(
+    "AB_RESULT_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ab_result_store.sqlite3"),
+)
+RESULT_STORE_HISTORICAL_TTL_SECONDS = float(os.getenv("AB_RESULT_STORE_HISTORICAL_TTL_SECONDS", str(30 * 86400)))
+RESULT_STORE_RECENT_TTL_SECONDS = float(os.getenv("AB_RESULT_STORE_RECENT_TTL_SECONDS", "300"))
+RESULT_STORE_PURGE_EVERY_WRITES = 200
+
+
+class NullResultStore:
+    """Result store that stores nothing (AB_RESULT_STORE=none)."""
+
+    backend = "none"
+
+    def get(self, key: str) -> dict | None:
+        return None
+
+    def set(self, key: str, value: dict, ttl_seconds: float) -> None:
+        pass
+
+    def clear(self) -> int:
+        return 0
+
+    def stats(self) -> dict:
+        return {"backend": self.backend}
+
+
+class SQLiteResultStore(NullResultStore):
+    """
+    Key/value store in one SQLite file opened in WAL mode.
+
+    Each thread gets its own connection (calls run via asyncio.to_thread), so
+    concurrent readers never block each other and writers from several worker
+    processes serialize on SQLite's own lock.  Any storage error is logged and
+    treated as a miss; the store must never fail a request.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_expires_at ON results(expires_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> dict | None:
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM results WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            log.warning(f"Result store read failed: {e}")
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+        try:
+            value = json.loads(row[0])
+        except ValueError as e:
+            # Corrupt / partially written row: count it as a miss and drop it.
+            self.errors += 1
+            log.warning(f"Result store row for {key[:12]}... is unreadable, discarding: {e}")
+            try:
+                self._conn().execute("DELETE FROM results WHERE key = ?", (key,))
+            except sqlite3.Error:
+                pass
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: dict, ttl_seconds: float) -> None:
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now + ttl_seconds),
+            )
+            self._writes += 1
+            if self._writes % RESULT_STORE_PURGE_EVERY_WRITES == 0:
+                conn.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            self.errors += 1
+            log.warning(f"Result store write failed: {e}")
+
+    def clear(self) -> int:
+        try:
+            return self._conn().execute("DELETE FROM results").rowcount
+        except sqlite3.Error as e:
+            self.errors += 1
+            log.warning(f"Result store clear failed: {e}")
+            return 0
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+def _create_result_store() -> NullResultStore:
+    if RESULT_STORE_BACKEND == "sqlite":
+        return SQLiteResultStore(RESULT_STORE_PATH)
+    if RESULT_STORE_BACKEND not in ("none", "off", ""):
+        log.warning(f"Unknown AB_RESULT_STORE={RESULT_STORE_BACKEND!r}; persistent result store disabled")
+    return NullResultStore()
+
+
+_result_store = _create_result_store()
+
+
+def _result_store_ttl(request_body: dict) -> float:
+    """Long TTL when the whole date range is in the past, short when it includes today."""
+    date_end = ((request_body.get("dates") or [{}])[0]).get("time_end", "")
+    if date_end and date_end < datetime.now().strftime("%Y-%m-%d"):
+        return RESULT_STORE_HISTORICAL_TTL_SECONDS
+    return RESULT_STORE_RECENT_TTL_SECONDS
+
+
+async def _result_store_get(key: str) -> dict | None:
+    return await asyncio.to_thread(_result_store.get, key)
+
+
+async def _result_store_put(query: dict, resp: dict) -> None:
+    if not _result_has_data(resp.get("result", "")):
+        return
+    ttl = _result_store_ttl(query["request_body"])
+    await asyncio.to_thread(_result_store.set, query["store_key"], resp, ttl)
+
+
+# ============================================================
+# In-flight request coalescing.  Duplicates that arrive while the
+# first identical request is still polling upstream attach to the
+# same task instead of starting their own key + poll pipeline.
+# ============================================================
+_inflight_requests: dict[str, asyncio.Task] = {}  # cache key -> shared upstream task
+_inflight_waiters: dict[str, int] = {}  # cache key -> callers currently awaiting it
+_coalesce_stats = {"leaders": 0, "coalesced": 0}
+
+
+async def _coalesce(key: str, factory):
+    """Await the shared upstream task for `key`, starting it if none is running.
+
+    The task is shielded so a disconnecting caller never cancels the
+    upstream run for the other waiters.
+    """
+    task = _inflight_requests.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _inflight_requests[key] = task
+        _coalesce_stats["leaders"] += 1
+
+        def _done(_t, key=key):
+            _inflight_requests.pop(key, None)
+            _inflight_waiters.pop(key, None)
+
+        task.add_done_callback(_done)
+    else:
+        _coalesce_stats["coalesced"] += 1
+        log.info(f"Coalesced onto in-flight request (key={key[:12]}..., waiters={_inflight_waiters.get(key, 0) + 1})")
+
+    _inflight_waiters[key] = _inflight_waiters.get(key, 0) + 1
+    try:
+        return await asyncio.shield(task)
+    finally:
+        if key in _inflight_waiters and _inflight_requests.get(key) is task:
+            _inflight_waiters[key] -= 1
+
+
+def _coalesce_snapshot() -> dict:
+    """Per-key waiter counts for monitoring (keys shortened like the cache logs)."""
+    return {
+        "inflight_keys": len(_inflight_requests),
+        "waiters": {k[:12]: n for k, n in _inflight_waiters.items()},
+        "leaders_total": _coalesce_stats["leaders"],
+        "coalesced_total": _coalesce_stats["coalesced"],
+    }
 
 
 def _is_truthy(value) -> bool:
@@ -93,6 +675,10 @@ DEFAULT_PROJECT_ID = 27
 DEFAULT_TEMPLATE_NAME = "One Page - Search Core Metric"
 DEFAULT_TEMPLATE_GROUP_NAME = os.getenv("AB_TEMPLATE_GROUP_NAME", "(org+ads)  by card")
 FALLBACK_TEMPLATE_GROUP_NAME = os.getenv("AB_TEMPLATE_GROUP_FALLBACK", "Rollout Checklist")
+# How long to remember that an experiment lacks its requested template group
+# and should go straight to the fallback.
+TEMPLATE_GROUP_MEMO_TTL_SECONDS = float(os.getenv("AB_TEMPLATE_GROUP_MEMO_TTL_SECONDS", str(6 * 3600)))
+TEMPLATE_GROUP_MEMO_MAX_ENTRIES = int(os.getenv("AB_TEMPLATE_GROUP_MEMO_MAX_ENTRIES", "1024"))
 DEFAULT_TEMPLATE_GROUP_TYPE = 1
 DEFAULT_NORMALIZATION = "control"
 DEFAULT_METRICS = ["order_cnt", "gmv", "gmv_995", "ads_revenue_usd", "order_per_uu", "gmv_per_uu", "gmv_per_uu_995"]
@@ -104,8 +690,33 @@ DEFAULT_SORT_TYPE = "__ALL__"
 DEFAULT_CONTROL_BY_EXPERIMENT = {
     6850: "31430;31438",
 }
-RESULT_POLL_MAX_ATTEMPTS = int(os.getenv("AB_RESULT_POLL_MAX_ATTEMPTS", "6"))
-RESULT_POLL_INTERVAL_SECONDS = int(os.getenv("AB_RESULT_POLL_INTERVAL_SECONDS", "3"))
+# Result polling: quick first probe, then exponential backoff with jitter
+# inside a total deadline budget (see AdaptivePoller).
+# AB_RESULT_POLL_INTERVAL_SECONDS (the old fixed interval) is still honoured
+# as the default base delay; AB_RESULT_POLL_MAX_ATTEMPTS is now only a
+# secondary cap under the deadline.
+_LEGACY_POLL_INTERVAL = os.getenv("AB_RESULT_POLL_INTERVAL_SECONDS")
+RESULT_POLL_FIRST_DELAY_SECONDS = float(os.getenv("AB_RESULT_POLL_FIRST_DELAY_SECONDS", "0.5"))
+RESULT_POLL_BASE_DELAY_SECONDS = float(os.getenv("AB_RESULT_POLL_BASE_DELAY_SECONDS", _LEGACY_POLL_INTERVAL or "1.0"))
+RESULT_POLL_MAX_DELAY_SECONDS = float(
+    os.getenv("AB_RESULT_POLL_MAX_DELAY_SECONDS", str(max(5.0, float(_LEGACY_POLL_INTERVAL or 0))))
+)
+RESULT_POLL_BACKOFF_FACTOR = float(os.getenv("AB_RESULT_POLL_BACKOFF_FACTOR", "1.6"))
+RESULT_POLL_JITTER = float(os.getenv("AB_RESULT_POLL_JITTER", "0.2"))
+RESULT_POLL_DEADLINE_SECONDS = float(os.getenv("AB_RESULT_POLL_DEADLINE_SECONDS", "40"))
+RESULT_POLL_MAX_ATTEMPTS = int(os.getenv("AB_RESULT_POLL_MAX_ATTEMPTS", "25"))
+if _LEGACY_POLL_INTERVAL is not None:
+    log.warning(
+        "AB_RESULT_POLL_INTERVAL_SECONDS is deprecated: polling now backs off exponentially. "
+        f"Using it as the base delay ({RESULT_POLL_BASE_DELAY_SECONDS}s); "
+        "set AB_RESULT_POLL_BASE_DELAY_SECONDS / AB_RESULT_POLL_MAX_DELAY_SECONDS instead."
+    )
+if "AB_RESULT_POLL_MAX_ATTEMPTS" in os.environ and "AB_RESULT_POLL_DEADLINE_SECONDS" not in os.environ:
+    log.warning(
+        f"AB_RESULT_POLL_MAX_ATTEMPTS={RESULT_POLL_MAX_ATTEMPTS} now only caps attempts within the "
+        f"{RESULT_POLL_DEADLINE_SECONDS:.0f}s polling deadline; "
+        "set AB_RESULT_POLL_DEADLINE_SECONDS to control the total wait."
+    )
 MAX_ROWS_IN_RESPONSE = 20
 ENABLE_LOCAL_CONTROL_SYNTHESIS = _is_truthy(os.getenv("AB_ENABLE_LOCAL_CONTROL_SYNTHESIS", "0"))
 _DIR = os.path.dirname(os.path.abspath(__file__))
@@ -113,6 +724,219 @@ BUCKET_MAPPING_CANDIDATE_PATHS = [
     os.path.join(os.path.dirname(_DIR), "Bucket_mapping.txt"),
     os.path.join(_DIR, "Bucket_mapping.txt"),
 ]
+# How often the mapping files are re-stat'ed for mtime/inode changes.
+BUCKET_MAPPING_CHECK_INTERVAL_SECONDS = float(os.getenv("AB_BUCKET_MAPPING_CHECK_SECONDS", "5"))
+
+
+# ============================================================
+# Shared upstream HTTP session.  One keep-alive connection pool for
+# the whole app lifetime, so key requests and poll attempts reuse
+# TLS connections to the AB gateway instead of handshaking each time.
+# ============================================================
+HTTP_LIMIT = int(os.getenv("AB_HTTP_LIMIT", "64"))
+HTTP_LIMIT_PER_HOST = int(os.getenv("AB_HTTP_LIMIT_PER_HOST", "16"))
+HTTP_DNS_CACHE_TTL_SECONDS = int(os.getenv("AB_HTTP_DNS_CACHE_TTL_SECONDS", "300"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("AB_HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP_TOTAL_TIMEOUT_SECONDS = float(os.getenv("AB_HTTP_TIMEOUT_SECONDS", "30"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("AB_HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+
+_http_session_ref: aiohttp.ClientSession | None = None
+_http_stats = {
+    "requests": 0,
+    "connections_created": 0,
+    "connections_reused": 0,
+    "dns_cache_hits": 0,
+    "dns_cache_misses": 0,
+}
+
+
+def _build_trace_config() -> aiohttp.TraceConfig:
+    """Count new vs reused connections so /health can show handshake savings."""
+    trace = aiohttp.TraceConfig()
+
+    async def _on_request_start(session, ctx, params):
+        _http_stats["requests"] += 1
+
+    async def _on_connection_create_end(session, ctx, params):
+        _http_stats["connections_created"] += 1
+
+    async def _on_connection_reuseconn(session, ctx, params):
+        _http_stats["connections_reused"] += 1
+
+    async def _on_dns_cache_hit(session, ctx, params):
+        _http_stats["dns_cache_hits"] += 1
+
+    async def _on_dns_cache_miss(session, ctx, params):
+        _http_stats["dns_cache_misses"] += 1
+
+    trace.on_request_start.append(_on_request_start)
+    trace.on_connection_create_end.append(_on_connection_create_end)
+    trace.on_connection_reuseconn.append(_on_connection_reuseconn)
+    trace.on_dns_cache_hit.append(_on_dns_cache_hit)
+    trace.on_dns_cache_miss.append(_on_dns_cache_miss)
+    return trace
+
+
+def _create_http_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_LIMIT,
+        limit_per_host=HTTP_LIMIT_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL_SECONDS,
+        use_dns_cache=True,
+        keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+    )
+    return aiohttp.ClientSession(connector=connector, trace_configs=[_build_trace_config()])
+
+
+def _http_session() -> aiohttp.ClientSession:
+    """Return the app-lifetime session (created lazily if the listener has not run)."""
+    global _http_session_ref
+    if _http_session_ref is None or _http_session_ref.closed:
+        _http_session_ref = _create_http_session()
+    return _http_session_ref
+
+
+def _http_call_timeout() -> aiohttp.ClientTimeout:
+    return aiohttp.ClientTimeout(total=HTTP_TOTAL_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS)
+
+
+def _http_stats_snapshot() -> dict:
+    created = _http_stats["connections_created"]
+    reused = _http_stats["connections_reused"]
+    return {
+        **_http_stats,
+        "reuse_ratio": round(reused / (created + reused), 4) if (created + reused) else 0.0,
+        "limit_per_host": HTTP_LIMIT_PER_HOST,
+    }
+
+
+@app.before_server_start
+async def _open_http_session(app, _loop):
+    global _http_session_ref
+    _http_session_ref = _create_http_session()
+
+
+@app.after_server_stop
+async def _close_http_session(app, _loop):
+    global _http_session_ref
+    if _http_session_ref is not None and not _http_session_ref.closed:
+        await _http_session_ref.close()
+    _http_session_ref = None
+
+
+# ============================================================
+# Adaptive result poller shared by /ab_report and /card_types.
+# ============================================================
+class AdaptivePoller:
+    """Backoff schedule for open_get_summary_result polling.
+
+    The first probe fires after `first_delay`.  Later probes back off
+    exponentially from `base_delay` up to `max_delay`, with +/- `jitter`
+    proportional noise, until `deadline` seconds have elapsed or
+    `max_attempts` probes were made.  Completion times are learned per
+    key (experiment id) as an EWMA; while a run is younger than the
+    learned estimate the next probe is pushed out towards it, so slow
+    experiments are not probed pointlessly and fast ones stay fast.
+    """
+
+    def __init__(
+        self,
+        first_delay: float,
+        base_delay: float,
+        max_delay: float,
+        factor: float,
+        jitter: float,
+        deadline: float,
+        max_attempts: int,
+        ewma_alpha: float = 0.3,
+        max_tracked_keys: int = 1024,
+    ):
+        self.first_delay = first_delay
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.ewma_alpha = ewma_alpha
+        self.max_tracked_keys = max_tracked_keys
+        self._estimates: OrderedDict[object, float] = OrderedDict()
+
+    def estimate(self, key) -> float | None:
+        return self._estimates.get(key)
+
+    def observe(self, key, seconds: float) -> None:
+        """Fold one observed completion time into the per-key estimate."""
+        prev = self._estimates.pop(key, None)
+        self._estimates[key] = seconds if prev is None else prev + self.ewma_alpha * (seconds - prev)
+        while len(self._estimates) > self.max_tracked_keys:
+            self._estimates.popitem(last=False)
+
+    def next_delay(self, key, attempt: int, elapsed: float) -> float | None:
+        """Seconds to wait before probe number `attempt + 1`, or None when the budget is spent."""
+        if attempt >= self.max_attempts:
+            return None
+        remaining = self.deadline - elapsed
+        if remaining <= 0:
+            return None
+        if attempt == 0:
+            delay = self.first_delay
+        else:
+            delay = min(self.max_delay, self.base_delay * (self.factor ** (attempt - 1)))
+            est = self._estimates.get(key)
+            if est is not None and elapsed < est:
+                # Aim slightly before the expected completion time.
+                delay = max(delay, min(self.max_delay, 0.9 * est - elapsed))
+            if self.jitter:
+                delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(0.0, min(delay, remaining))
+
+    def run(self, key) -> "_PollRun":
+        return _PollRun(self, key)
+
+
+class _PollRun:
+    """Async iterator over probe attempts: `async for attempt in poller.run(key)`.
+
+    Call `mark_done()` once the result is complete so the poller learns
+    this key's latency.  Iteration ends when the deadline is exhausted.
+    """
+
+    def __init__(self, poller: AdaptivePoller, key):
+        self.poller = poller
+        self.key = key
+        self.attempt = 0
+        self.started_at = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> int:
+        delay = self.poller.next_delay(self.key, self.attempt, self.elapsed)
+        if delay is None:
+            raise StopAsyncIteration
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.attempt += 1
+        return self.attempt
+
+    def mark_done(self) -> None:
+        self.poller.observe(self.key, self.elapsed)
+
+
+_result_poller = AdaptivePoller(
+    first_delay=RESULT_POLL_FIRST_DELAY_SECONDS,
+    base_delay=RESULT_POLL_BASE_DELAY_SECONDS,
+    max_delay=RESULT_POLL_MAX_DELAY_SECONDS,
+    factor=RESULT_POLL_BACKOFF_FACTOR,
+    jitter=RESULT_POLL_JITTER,
+    deadline=RESULT_POLL_DEADLINE_SECONDS,
+    max_attempts=RESULT_POLL_MAX_ATTEMPTS,
+)
 
 
 def get_default_dates():
@@ -146,42 +970,119 @@ def _split_slot_values(value) -> list[str]:
     return [v.strip() for v in value_str.split(",") if v.strip()]
 
 
-def _load_bucket_mapping() -> dict[str, str]:
-    """Load bucket aliases from Bucket_mapping.txt (if present)."""
+def _parse_bucket_mapping_file(path: str) -> dict[str, str]:
+    """Parse one Bucket_mapping.txt (key=value, key: value or whitespace separated)."""
     mapping: dict[str, str] = {}
-    for path in BUCKET_MAPPING_CANDIDATE_PATHS:
-        if not os.path.exists(path):
-            continue
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                for raw_line in f:
-                    line = raw_line.strip()
-                    if not line or line.startswith("#"):
-                        continue
-
-                    key = ""
-                    value = ""
-                    if "=" in line:
-                        key, value = line.split("=", 1)
-                    elif ":" in line:
-                        key, value = line.split(":", 1)
-                    else:
-                        parts = line.split()
-                        if len(parts) >= 2:
-                            key, value = parts[0], parts[1]
+    with open(path, "r", encoding="utf-8") as f:
+        for raw_line in f:
+            line = raw_line.strip()
+            if not line or line.startswith("#"):
+                continue
 
-                    key = key.strip()
-                    value = value.strip()
-                    if not key or not value:
-                        continue
+            key = ""
+            value = ""
+            if "=" in line:
+                key, value = line.split("=", 1)
+            elif ":" in line:
+                key, value = line.split(":", 1)
+            else:
+                parts = line.split()
+                if len(parts) >= 2:
+                    key, value = parts[0], parts[1]
 
-                    mapping[key.lower()] = value
-        except Exception as e:
-            print(f"[AB Proxy] Failed to load bucket mapping from {path}: {e}")
+            key = key.strip()
+            value = value.strip()
+            if not key or not value:
+                continue
 
+            mapping[key] = value
     return mapping
 
 
+class BucketMappingStore:
+    """
+    Bucket aliases parsed once and kept in memory.
+
+    The candidate files are re-stat'ed at most every `check_interval` seconds;
+    they are only re-parsed when a file's (mtime, inode, size) signature
+    changes, appears or disappears. `index` is the precomputed lowercase
+    lookup table used by _resolve_bucket_aliases.
+    """
+
+    def __init__(self, paths: list[str], check_interval: float):
+        self.paths = list(paths)
+        self.check_interval = check_interval
+        self.entries: dict[str, str] = {}
+        self.index: dict[str, str] = {}
+        self._signature: tuple | None = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+        self._loads = 0
+        self._errors = 0
+
+    def _stat_signature(self) -> tuple:
+        sig = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                sig.append((path, None, None, None))
+                continue
+            sig.append((path, st.st_mtime_ns, st.st_ino, st.st_size))
+        return tuple(sig)
+
+    def reload(self, signature: tuple | None = None) -> int:
+        """Re-parse all candidate files unconditionally; returns the alias count."""
+        if signature is None:
+            signature = self._stat_signature()
+        entries: dict[str, str] = {}
+        for path, mtime_ns, *_ in signature:
+            if mtime_ns is None:
+                continue
+            try:
+                entries.update(_parse_bucket_mapping_file(path))
+            except Exception as e:
+                self._errors += 1
+                log.warning(f"Failed to load bucket mapping from {path}: {e}")
+
+        self.entries = entries
+        self.index = {k.lower(): v for k, v in entries.items()}
+        self._signature = signature
+        self._checked_at = self._loaded_at = time.monotonic()
+        self._loads += 1
+        return len(self.index)
+
+    def get(self) -> dict[str, str]:
+        """Lowercase alias -> bucket id; no disk I/O unless the check interval elapsed."""
+        now = time.monotonic()
+        if self._signature is not None and now - self._checked_at < self.check_interval:
+            return self.index
+        signature = self._stat_signature()
+        if signature != self._signature:
+            count = self.reload(signature)
+            log.info(f"Bucket mapping loaded: {count} aliases")
+        else:
+            self._checked_at = now
+        return self.index
+
+    def stats(self) -> dict:
+        return {
+            "aliases": len(self.index),
+            "loads": self._loads,
+            "errors": self._errors,
+            "loaded_age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loads else None,
+            "files": [path for path, mtime_ns, *_ in (self._signature or ()) if mtime_ns is not None],
+        }
+
+
+_bucket_mapping = BucketMappingStore(BUCKET_MAPPING_CANDIDATE_PATHS, BUCKET_MAPPING_CHECK_INTERVAL_SECONDS)
+
+
+def _load_bucket_mapping() -> dict[str, str]:
+    """Bucket aliases (lowercase key -> bucket id) from the in-memory store."""
+    return _bucket_mapping.get()
+
+
 def _resolve_bucket_aliases(values: list[str], alias_mapping: dict[str, str]) -> list[str]:
     """Resolve bucket aliases such as bucket_id_09 to numeric bucket IDs."""
     resolved: list[str] = []
@@ -229,10 +1130,71 @@ def _normalize_control_group(value) -> str:
     return text_value
 
 
-def _parse_row(columns: list[str], row: str) -> dict[str, str]:
-    """Parse a || separated row into a dict keyed by column names."""
-    values = row.split("||")
-    return {col: (values[i] if i < len(values) else "") for i, col in enumerate(columns)}
+def _split_columns(rows: list[str], width: int, size: int) -> list[list[str]]:
+    """Transpose || separated rows into `width` column arrays of length `size`."""
+    if width == 0:
+        return []
+    split_rows = []
+    for row in rows[:size]:
+        values = row.split("||")
+        if len(values) < width:
+            values.extend([""] * (width - len(values)))
+        split_rows.append(values)
+    if len(split_rows) < size:
+        split_rows.extend([[""] * width] * (size - len(split_rows)))
+    if not split_rows:
+        return [[] for _ in range(width)]
+    return [list(col) for _, col in zip(range(width), zip(*split_rows))]
+
+
+class ResultTable:
+    """
+    Columnar view of an AB result payload.
+
+    The header is parsed once; body and relative rows are transposed into one
+    array per column, so filters become masks over row indexes and grouping
+    only moves integers around. Relative arrays are padded to the body length
+    (missing relative rows read as "").
+    """
+
+    def __init__(self, columns: list[str], body_rows: list[str], relative_rows: list[str]):
+        self.columns = columns
+        self.size = len(body_rows)
+        width = len(columns)
+        body_cols = _split_columns(body_rows, width, self.size)
+        rel_cols = _split_columns(relative_rows, width, self.size)
+        # A duplicated column name keeps its last position (dict-per-row semantics).
+        positions = {col: i for i, col in enumerate(columns)}
+        self.values: dict[str, list[str]] = {col: body_cols[i] for col, i in positions.items()}
+        self.relative: dict[str, list[str]] = {col: rel_cols[i] for col, i in positions.items()}
+
+    def column(self, name: str) -> list[str] | None:
+        return self.values.get(name)
+
+    def value(self, name: str, idx: int) -> str:
+        col = self.values.get(name)
+        return col[idx] if col is not None else ""
+
+    def rel(self, name: str, idx: int) -> str:
+        col = self.relative.get(name)
+        return col[idx] if col is not None else ""
+
+    def mask(self, name: str, rows: list[int], predicate) -> list[bool]:
+        """predicate(value) for each row index in `rows`; a missing column reads as ""."""
+        col = self.values.get(name)
+        if col is None:
+            hit = predicate("")
+            return [hit] * len(rows)
+        return [predicate(col[i]) for i in rows]
+
+    def append_row(self, values: dict[str, str]) -> int:
+        """Append a synthetic body row (relative values empty); returns its index."""
+        for name, col in self.values.items():
+            col.append(values.get(name, ""))
+        for col in self.relative.values():
+            col.append("")
+        self.size += 1
+        return self.size - 1
 
 
 def _identify_dim_and_metric_columns(columns: list[str]) -> tuple[list[str], list[str]]:
@@ -315,11 +1277,6 @@ def _dim_context_str(row: dict[str, str], dims: list[str]) -> str:
     return ", ".join(parts)
 
 
-def _build_dim_key(row: dict[str, str], dims: list[str], exclude: str = "abtest_group") -> tuple:
-    """Build a hashable dimension key for grouping, excluding group column."""
-    return tuple(row.get(d, "") for d in dims if d != exclude)
-
-
 def format_ab_results(
     result_data: dict,
     request_body: dict,
@@ -392,103 +1349,49 @@ def format_ab_results(
 
         dims, metrics = _identify_dim_and_metric_columns(columns)
 
-        # Parse all rows
-        raw_row_count = len(body_rows_raw)
-        body_parsed = [_parse_row(columns, r) for r in body_rows_raw]
-        rel_parsed = [_parse_row(columns, r) for r in relative_rows_raw]
+        table = ResultTable(columns, body_rows_raw, relative_rows_raw)
+        raw_row_count = table.size
+        rows = list(range(raw_row_count))
 
+        # Both filters are evaluated as masks over the same row indexes in one
+        # pass; sort_type is applied on top of the card_type survivors.
         # Default card_type behavior: keep only target card_type rows when present.
         # This keeps output aligned with the "card_type=allcard" expectation.
         ct_filter = str(card_type_filter or DEFAULT_CARD_TYPE).strip().lower()
-        if ct_filter and any(c.lower() == "card_type" for c in columns):
-            keep_indexes = []
-            for i, brow in enumerate(body_parsed):
-                if _card_type_matches(brow.get("card_type", ""), ct_filter):
-                    keep_indexes.append(i)
+        apply_ct = bool(ct_filter) and any(c.lower() == "card_type" for c in columns)
+        st_filter = str(sort_type_filter or "").strip().lower()
+        apply_st = bool(st_filter) and any(c.lower() == "sort_type" for c in columns)
 
+        keep = [True] * len(rows)
+        if apply_ct:
+            keep = table.mask("card_type", rows, lambda v: _card_type_matches(v, ct_filter))
             # For all-card mode, allow "__ALL__*" as pragmatic fallback because
             # some templates expose no literal "allcard" row.
-            if not keep_indexes and ct_filter in ("allcard", "all_card", "all"):
-                for i, brow in enumerate(body_parsed):
-                    v = str(brow.get("card_type", "")).strip().lower()
-                    if v.startswith("__all__"):
-                        keep_indexes.append(i)
-
-            if keep_indexes:
-                body_rows_raw = [body_rows_raw[i] for i in keep_indexes]
-                relative_rows_raw = [
-                    relative_rows_raw[i] if i < len(relative_rows_raw) else ""
-                    for i in keep_indexes
-                ]
-                body_parsed = [body_parsed[i] for i in keep_indexes]
-                rel_parsed = [
-                    rel_parsed[i] if i < len(rel_parsed) else {}
-                    for i in keep_indexes
-                ]
-                if isinstance(control_indexes, list):
-                    old_to_new = {old_i: new_i for new_i, old_i in enumerate(keep_indexes)}
-                    control_indexes = [old_to_new[i] for i in control_indexes if i in old_to_new]
-            else:
-                # Never fall back to full-card_type output when filter was requested.
-                body_rows_raw = []
-                relative_rows_raw = []
-                body_parsed = []
-                rel_parsed = []
-                control_indexes = []
-        if ct_filter and any(c.lower() == "card_type" for c in columns):
-            print(f"[AB Proxy] card_type filter: '{ct_filter}' rows {raw_row_count} -> {len(body_rows_raw)}")
-
-        st_filter = str(sort_type_filter or "").strip().lower()
-        if st_filter and any(c.lower() == "sort_type" for c in columns):
-            pre_rows = len(body_rows_raw)
-            keep_indexes = []
-            for i, brow in enumerate(body_parsed):
-                if _sort_type_matches(brow.get("sort_type", ""), st_filter):
-                    keep_indexes.append(i)
-            if keep_indexes:
-                body_rows_raw = [body_rows_raw[i] for i in keep_indexes]
-                relative_rows_raw = [
-                    relative_rows_raw[i] if i < len(relative_rows_raw) else ""
-                    for i in keep_indexes
-                ]
-                body_parsed = [body_parsed[i] for i in keep_indexes]
-                rel_parsed = [
-                    rel_parsed[i] if i < len(rel_parsed) else {}
-                    for i in keep_indexes
-                ]
-                if isinstance(control_indexes, list):
-                    old_to_new = {old_i: new_i for new_i, old_i in enumerate(keep_indexes)}
-                    control_indexes = [old_to_new[i] for i in control_indexes if i in old_to_new]
-            else:
-                body_rows_raw = []
-                relative_rows_raw = []
-                body_parsed = []
-                rel_parsed = []
-                control_indexes = []
-            print(f"[AB Proxy] sort_type filter: '{st_filter}' rows {pre_rows} -> {len(body_rows_raw)}")
+            # Never fall back to full-card_type output when filter was requested.
+            if not any(keep) and ct_filter in ("allcard", "all_card", "all"):
+                keep = table.mask("card_type", rows, lambda v: str(v).strip().lower().startswith("__all__"))
+            log.debug("card_type filter: '%s' rows %d -> %d", ct_filter, raw_row_count, sum(keep))
+        if apply_st:
+            pre_rows = sum(keep)
+            st_keep = table.mask("sort_type", rows, lambda v: _sort_type_matches(v, st_filter))
+            keep = [k and s for k, s in zip(keep, st_keep)]
+            log.debug("sort_type filter: '%s' rows %d -> %d", st_filter, pre_rows, sum(keep))
+        rows = [i for i, k in zip(rows, keep) if k]
 
         # Group rows by non-group dimensions (date, region) to build comparison tables.
         # Each dimension-group gets one table with Control + Treatment(s) side by side.
-        from collections import OrderedDict
-
-        DimGroupEntry = dict  # {"body": parsed_row, "rel": parsed_row, "group_id": str}
-        dim_groups: OrderedDict[tuple, dict[str, list[DimGroupEntry]]] = OrderedDict()
-
-        for idx, brow in enumerate(body_parsed):
-            dim_key = _build_dim_key(brow, dims, exclude="abtest_group")
-            if dim_key not in dim_groups:
-                dim_groups[dim_key] = {"control": [], "treatment": []}
-
-            rrow = rel_parsed[idx] if idx < len(rel_parsed) else {}
-            entry: DimGroupEntry = {
-                "body": brow,
-                "rel": rrow,
-                "group_id": brow.get("abtest_group", ""),
-            }
-            if idx in control_indexes:
-                dim_groups[dim_key]["control"].append(entry)
-            else:
-                dim_groups[dim_key]["treatment"].append(entry)
+        # Groups hold row indexes into `table`, never per-row dicts.
+        key_columns = [table.column(d) for d in dims if d != "abtest_group"]
+        group_column = table.column("abtest_group") or [""] * table.size
+        control_set = set(control_indexes)
+        dim_groups: OrderedDict[tuple, dict[str, list[int]]] = OrderedDict()
+
+        for idx in rows:
+            dim_key = tuple(col[idx] for col in key_columns)
+            grp = dim_groups.get(dim_key)
+            if grp is None:
+                grp = dim_groups[dim_key] = {"control": [], "treatment": []}
+            grp["control" if idx in control_set else "treatment"].append(idx)
 
         # The AB API returns individual control buckets (e.g. 31430, 31438) as
         # "treatment" rows alongside the actual treatment bucket.  We must
@@ -508,14 +1411,12 @@ def format_ab_results(
                 real_treats = []
                 ctrl_bucket_rows = []
                 for t in treat_list:
-                    gid = t["group_id"]
-                    if gid in control_bucket_ids:
+                    if group_column[t] in control_bucket_ids:
                         ctrl_bucket_rows.append(t)
                     else:
                         real_treats.append(t)
 
                 grp["treatment"] = real_treats
-                treat_list = real_treats
 
                 # When control row is missing (e.g., control_group_indexes is empty)
                 # or aggregate control metrics are empty, synthesize control from
@@ -523,18 +1424,19 @@ def format_ab_results(
                 ctrl_values_empty = (
                     (not ctrl_list)
                     or all(
-                        not ctrl_list[0]["body"].get(m, "").strip()
-                        or ctrl_list[0]["body"].get(m, "").strip() == "-"
+                        not table.value(m, ctrl_list[0]).strip()
+                        or table.value(m, ctrl_list[0]).strip() == "-"
                         for m in metrics
                     )
                 )
 
                 if ctrl_values_empty and ctrl_bucket_rows and ENABLE_LOCAL_CONTROL_SYNTHESIS:
-                    agg_body: dict[str, str] = dict(ctrl_bucket_rows[0]["body"])
+                    first_bucket = ctrl_bucket_rows[0]
+                    agg_body: dict[str, str] = {c: table.value(c, first_bucket) for c in table.values}
                     for m in metrics:
                         vals = []
                         for cb in ctrl_bucket_rows:
-                            raw_val = cb["body"].get(m, "").strip()
+                            raw_val = table.value(m, cb).strip()
                             if raw_val and raw_val != "-":
                                 try:
                                     vals.append(float(raw_val))
@@ -543,28 +1445,21 @@ def format_ab_results(
                         agg_body[m] = str(sum(vals) / len(vals)) if vals else ""
 
                     for rt in real_treats:
-                        new_rel = dict(rt["rel"])
                         for m in metrics:
                             ctrl_num_str = agg_body.get(m, "").strip()
-                            treat_num_str = rt["body"].get(m, "").strip()
+                            treat_num_str = table.value(m, rt).strip()
                             if ctrl_num_str and treat_num_str and ctrl_num_str != "-" and treat_num_str != "-":
                                 try:
                                     c = float(ctrl_num_str)
                                     t = float(treat_num_str)
-                                    new_rel[m] = str((t - c) / c) if c != 0 else ""
+                                    if m in table.relative:
+                                        table.relative[m][rt] = str((t - c) / c) if c != 0 else ""
                                 except (ValueError, ZeroDivisionError):
                                     pass
-                        rt["rel"] = new_rel
-
-                    agg_entry = {
-                        "body": agg_body,
-                        "rel": {},
-                        "group_id": ctrl_list[0]["group_id"] if ctrl_list else "control",
-                    }
-                    grp["control"] = [agg_entry]
-                    ctrl_list = grp["control"]
+
+                    grp["control"] = [table.append_row(agg_body)]
                 elif ctrl_values_empty and ctrl_bucket_rows and not ENABLE_LOCAL_CONTROL_SYNTHESIS:
-                    print("[AB Proxy] Skip local control synthesis (AB_ENABLE_LOCAL_CONTROL_SYNTHESIS=0)")
+                    log.info("Skip local control synthesis (AB_ENABLE_LOCAL_CONTROL_SYNTHESIS=0)")
 
         # Determine whether we need per-group sub-headers
         # (skip if only one dimension group — info is already in the main header)
@@ -582,9 +1477,9 @@ def format_ab_results(
                 # Build a readable dimension label
                 non_group_dims = [d for d in dims if d != "abtest_group"]
                 dim_label_parts = []
-                sample_row = (ctrl_list or treat_list)[0]["body"]
+                sample_row = (ctrl_list or treat_list)[0]
                 for d in non_group_dims:
-                    val = sample_row.get(d, "")
+                    val = table.value(d, sample_row)
                     if val:
                         dim_label_parts.append(val)
                 output_lines.append("")
@@ -592,9 +1487,8 @@ def format_ab_results(
 
             # === Simple case: 1 control group, 1 treatment group ===
             if len(ctrl_list) <= 1 and len(treat_list) == 1:
-                ctrl_body = ctrl_list[0]["body"] if ctrl_list else {}
-                treat_body = treat_list[0]["body"]
-                treat_rel = treat_list[0]["rel"]
+                ctrl_row = ctrl_list[0] if ctrl_list else None
+                treat_row = treat_list[0]
 
                 # Find max metric name length for alignment
                 max_name = max((len(m) for m in metrics), default=10)
@@ -608,9 +1502,9 @@ def format_ab_results(
                 output_lines.append(sep)
 
                 for m in metrics:
-                    ctrl_val = _fmt_number(ctrl_body.get(m, "")) if ctrl_body else "-"
-                    treat_val = _fmt_number(treat_body.get(m, ""))
-                    change = _fmt_change(treat_rel.get(m, ""))
+                    ctrl_val = _fmt_number(table.value(m, ctrl_row)) if ctrl_row is not None else "-"
+                    treat_val = _fmt_number(table.value(m, treat_row))
+                    change = _fmt_change(table.rel(m, treat_row))
                     output_lines.append(
                         f"{m:<{max_name}}  {ctrl_val:>{col_w}}  {treat_val:>{col_w}}  {change:>10}"
                     )
@@ -623,7 +1517,7 @@ def format_ab_results(
                 # Build column headers: Control, then each treatment by group_id
                 col_headers = ["Control"]
                 for t in treat_list:
-                    gid = t["group_id"]
+                    gid = group_column[t]
                     col_headers.append(f"T-{gid}" if gid else "Treatment")
 
                 header_parts = [f"{'Metric':<{max_name}}"]
@@ -636,19 +1530,19 @@ def format_ab_results(
                 output_lines.append(header_line)
                 output_lines.append(sep)
 
-                ctrl_body = ctrl_list[0]["body"] if ctrl_list else {}
+                ctrl_row = ctrl_list[0] if ctrl_list else None
 
                 for m in metrics:
                     parts = [f"{m:<{max_name}}"]
-                    ctrl_val = _fmt_number(ctrl_body.get(m, "")) if ctrl_body else "-"
+                    ctrl_val = _fmt_number(table.value(m, ctrl_row)) if ctrl_row is not None else "-"
                     parts.append(f"{ctrl_val:>{col_w}}")
 
                     # Treatment values + collect changes
                     changes = []
                     for t in treat_list:
-                        t_val = _fmt_number(t["body"].get(m, ""))
+                        t_val = _fmt_number(table.value(m, t))
                         parts.append(f"{t_val:>{col_w}}")
-                        changes.append(_fmt_change(t["rel"].get(m, "")))
+                        changes.append(_fmt_change(table.rel(m, t)))
 
                     # Show change(s) — if single treatment, single change; else comma-separated
                     change_str = changes[0] if len(changes) == 1 else ",".join(changes)
@@ -661,16 +1555,16 @@ def format_ab_results(
                 output_lines.append("(Only control data found, no treatment rows)")
                 for m in metrics:
                     for c in ctrl_list:
-                        val = _fmt_number(c["body"].get(m, ""))
+                        val = _fmt_number(table.value(m, c))
                         output_lines.append(f"  {m}: {val}")
 
         # Truncation warning
         total_rows_shown = sum(
             len(g["control"]) + len(g["treatment"]) for g in dim_groups.values()
         )
-        if len(body_rows_raw) > MAX_ROWS_IN_RESPONSE:
+        if len(rows) > MAX_ROWS_IN_RESPONSE:
             output_lines.append(
-                f"\n... showing {total_rows_shown} of {len(body_rows_raw)} rows"
+                f"\n... showing {total_rows_shown} of {len(rows)} rows"
             )
 
         return "\n".join(output_lines)
@@ -723,15 +1617,21 @@ def _result_has_data(formatted: str) -> bool:
 async def _call_ab_api(session: aiohttp.ClientSession, namespace: str, request_body: dict, experiment_id: int) -> tuple[int, dict]:
     """Call AB API for the given namespace and return (http_status, payload)."""
     headers = _build_ab_headers(experiment_id, namespace)
-    async with session.post(
-        AB_API_URL,
-        headers=headers,
-        json=request_body,
-        timeout=aiohttp.ClientTimeout(total=30),
-    ) as response:
-        if response.status == 200:
-            return response.status, await response.json()
-        return response.status, {"error_text": await response.text()}
+    started_at = time.perf_counter()
+    status = "error"
+    try:
+        async with session.post(
+            AB_API_URL,
+            headers=headers,
+            json=request_body,
+            timeout=_http_call_timeout(),
+        ) as response:
+            status = response.status
+            if response.status == 200:
+                return response.status, await response.json()
+            return response.status, {"error_text": await response.text()}
+    finally:
+        _upstream_seconds.observe(time.perf_counter() - started_at, namespace=namespace, status=status)
 
 
 def _extract_unique_card_types(result_payload: dict) -> list[str]:
@@ -770,325 +1670,784 @@ async def fetch_ab_report(request: Request):
         "treatments": "82944"
     }
     """
+    incoming_token = request.headers.get(INTERNAL_PROXY_AUTH_HEADER, "")
+    if incoming_token != INTERNAL_PROXY_TOKEN:
+        return json_response({"result": "Unauthorized"}, status=401)
+    if not AB_TOKEN:
+        return json_response({"result": "Missing AB platform token: set AB_PLATFORM_TOKEN"})
+    params = request.json or {}
+    log.info("Received /ab_report request", extra={"ctx": {"experiment_id": params.get("experiment_id")}})
+    log.debug("Request params: %s", _LazyJson(params))
+    return json_response(await _serve_report(params, _should_disable_cache(request, params)))
+
+
+async def _serve_report(params: dict, disable_cache: bool) -> dict:
+    """Cache lookup, then coalesced upstream run; shared by /ab_report and /ab_report/batch."""
+    if disable_cache:
+        log.info("Cache BYPASS enabled for this request")
+        _report_requests.inc(served="bypass")
+        return await _run_ab_report(params, disable_cache=True)
+
+    # --- Deduplication cache: return cached result for identical requests ---
+    ck = _cache_key(params)
+    cached = _cache_get(ck)
+    if cached is not None:
+        log.info("Cache HIT — returning cached response (skipping upstream API call)")
+        _report_requests.inc(served="cache")
+        return cached
+
+    # --- Coalescing: identical requests still in flight share one upstream run ---
+    _report_requests.inc(served="coalesced" if ck in _inflight_requests else "upstream")
+    return await _coalesce(ck, lambda: _run_ab_report(params, disable_cache=False, ck=ck))
+
+
+def _build_report_query(params: dict) -> tuple[dict | None, dict | None]:
+    """Validate slot values and build the AB API request.
+
+    Returns (query, None) on success or (None, error_response).
+    """
+    # Extract and validate required fields
+    experiment_id = params.get("experiment_id", "")
+    if not experiment_id:
+        return None, {"result": "Error: experiment_id is required"}
+
+    experiment_id = int(str(experiment_id).strip())
+
+    # Parse dates with defaults
+    default_start, default_end = get_default_dates()
+    date_start = params.get("date_start", "").strip()
+    date_end = params.get("date_end", "").strip()
+
+    if not date_start or date_start.lower() in ("default", "默认", ""):
+        date_start = default_start
+    if not date_end or date_end.lower() in ("default", "默认", ""):
+        date_end = default_end
+
+    # Date granularity:
+    # - default: if querying a range, aggregate across date (remove abtest_date from dims)
+    # - optional override: split_by_date/by_date=true to keep daily breakdown
+    split_by_date = _is_truthy(params.get("split_by_date", False)) or _is_truthy(params.get("by_date", False))
+    if date_start == date_end or split_by_date:
+        dims = list(DEFAULT_DIMS)
+    else:
+        dims = [d for d in DEFAULT_DIMS if d != "abtest_date"]
+
+    # Parse regions
+    regions_str = str(params.get("regions", "")).strip()
+    if not regions_str or regions_str.lower() in ("all", "全部", ""):
+        # AB API expects explicit ALL marker; empty list returns business error.
+        regions = ["ALL"]
+    else:
+        regions = [r.upper() for r in _split_slot_values(regions_str)]
+
+    template_group_name = str(
+        params.get("template_group_name", DEFAULT_TEMPLATE_GROUP_NAME)
+    ).strip() or DEFAULT_TEMPLATE_GROUP_NAME
+    is_by_card_template = "by card" in template_group_name.lower()
+
+    # card_type:
+    # - For "by card" templates, always include card_type dimension so
+    #   allcard filtering aligns with page behavior and SQL expectation.
+    # - For other templates, include card_type only when caller requests
+    #   a specific non-allcard slice.
+    card_type = str(params.get("card_type", DEFAULT_CARD_TYPE)).strip() or DEFAULT_CARD_TYPE
+    if is_by_card_template or card_type.lower() not in ("allcard", "all_card", "all"):
+        dims.append(CARD_TYPE_DIM)
+    sort_type = str(params.get("sort_type", DEFAULT_SORT_TYPE)).strip() or DEFAULT_SORT_TYPE
+    # To match page behavior, include sort_type dimension when explicitly specified
+    # (including "__ALL__"), then filter rows in formatter.
+    if sort_type:
+        dims.append(SORT_TYPE_DIM)
+
+    # Parse control and treatments
+    alias_mapping = _load_bucket_mapping()
+
+    control_raw = _normalize_control_group(params.get("control", ""))
+    if not control_raw:
+        default_control = DEFAULT_CONTROL_BY_EXPERIMENT.get(experiment_id, "")
+        if default_control:
+            control_raw = default_control
+            log.info(f"control missing, fallback to default for exp {experiment_id}: {control_raw}")
+    control_parts = [p.strip() for p in control_raw.split(";") if p.strip()]
+    control_parts = _resolve_bucket_aliases(control_parts, alias_mapping)
+    control = ";".join(control_parts)
+
+    treatments = _split_slot_values(params.get("treatments", ""))
+    treatments = _resolve_bucket_aliases(treatments, alias_mapping)
+    # Stabilize treatment ordering to avoid AB backend order-sensitive empty results
+    # for the same bucket set (observed in production for exp 6850).
+    # Use numeric ascending order after alias resolution.
     try:
-        incoming_token = request.headers.get(INTERNAL_PROXY_AUTH_HEADER, "")
-        if incoming_token != INTERNAL_PROXY_TOKEN:
-            return json_response({"result": "Unauthorized"}, status=401)
-        if not AB_TOKEN:
-            return json_response({"result": "Missing AB platform token: set AB_PLATFORM_TOKEN"})
-        params = request.json or {}
-        print(f"[AB Proxy] Received request: {json.dumps(params, ensure_ascii=False)}")
-        disable_cache = _should_disable_cache(request, params)
-        if disable_cache:
-            print("[AB Proxy] Cache BYPASS enabled for this request")
+        treatments = sorted(
+            list(dict.fromkeys(treatments)),
+            key=lambda x: int(x) if str(x).isdigit() else 10**18,
+        )
+    except Exception:
+        # Keep original order if any unexpected token appears.
+        pass
 
-        # --- Deduplication cache: return cached result for identical requests ---
-        ck = _cache_key(params)
-        if not disable_cache:
-            cached = _cache_get(ck)
-            if cached is not None:
-                print(f"[AB Proxy] Cache HIT — returning cached response (skipping upstream API call)")
-                return json_response(cached)
+    if not control or not treatments:
+        return None, {
+            "result": "Error: Both control and treatment bucket IDs are required."
+        }
 
-        # Extract and validate required fields
-        experiment_id = params.get("experiment_id", "")
-        if not experiment_id:
-            return json_response({"result": "Error: experiment_id is required"})
+    unresolved_buckets = [x for x in control_parts + treatments if not str(x).isdigit()]
+    if unresolved_buckets:
+        return None, {
+            "result": (
+                "Error: Unresolved bucket IDs/aliases: "
+                f"{', '.join(unresolved_buckets)}. "
+                "Please provide numeric bucket IDs or define aliases in Bucket_mapping.txt."
+            )
+        }
 
-        experiment_id = int(str(experiment_id).strip())
+    metrics_input = _split_slot_values(params.get("metrics", ""))
+    if metrics_input:
+        metrics = []
+        for metric in metrics_input:
+            metric_norm = metric.strip()
+            if not metric_norm:
+                continue
+            if not re.fullmatch(r"[A-Za-z0-9_]+", metric_norm):
+                return None, {
+                    "result": f"Error: Invalid metric name '{metric_norm}'. Use letters/numbers/underscore only."
+                }
+            if metric_norm not in metrics:
+                metrics.append(metric_norm)
+    else:
+        metrics = DEFAULT_METRICS
+
+    # Build AB API request body
+    request_body = {
+        "project_id": DEFAULT_PROJECT_ID,
+        "experiment_id": experiment_id,
+        "operator": "samaritan.bot",
+        "template_name": DEFAULT_TEMPLATE_NAME,
+        "template_group_name": template_group_name,
+        "template_group_type": DEFAULT_TEMPLATE_GROUP_TYPE,
+        "dates": [
+            {
+                "time_start": date_start,
+                "time_end": date_end
+            }
+        ],
+        "regions": regions,
+        "control": control,
+        "treatments": treatments,
+        "normalization": DEFAULT_NORMALIZATION,
+        "metrics": metrics,
+        "dims": dims
+    }
 
-        # Parse dates with defaults
-        default_start, default_end = get_default_dates()
-        date_start = params.get("date_start", "").strip()
-        date_end = params.get("date_end", "").strip()
-
-        if not date_start or date_start.lower() in ("default", "默认", ""):
-            date_start = default_start
-        if not date_end or date_end.lower() in ("default", "默认", ""):
-            date_end = default_end
-
-        # Date granularity:
-        # - default: if querying a range, aggregate across date (remove abtest_date from dims)
-        # - optional override: split_by_date/by_date=true to keep daily breakdown
-        split_by_date = _is_truthy(params.get("split_by_date", False)) or _is_truthy(params.get("by_date", False))
-        if date_start == date_end or split_by_date:
-            dims = list(DEFAULT_DIMS)
-        else:
-            dims = [d for d in DEFAULT_DIMS if d != "abtest_date"]
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(
+            "=== Built API request ===\n"
+            f"  experiment_id: {experiment_id} (type={type(experiment_id).__name__})\n"
+            f"  dates: {date_start} to {date_end}\n"
+            f"  regions: {regions}\n"
+            f"  control: '{control}' (from raw='{params.get('control', '')}')\n"
+            f"  treatments: {treatments} (from raw='{params.get('treatments', '')}')\n"
+            f"  metrics: {metrics} (from raw='{params.get('metrics', '')}')\n"
+            f"  card_type: {card_type}\n"
+            f"  sort_type: {sort_type}\n"
+            f"  dims: {dims} (split_by_date={split_by_date})\n"
+            f"  Full body: {json.dumps(request_body, ensure_ascii=False)}"
+        )
 
-        # Parse regions
-        regions_str = str(params.get("regions", "")).strip()
-        if not regions_str or regions_str.lower() in ("all", "全部", ""):
-            # AB API expects explicit ALL marker; empty list returns business error.
-            regions = ["ALL"]
-        else:
-            regions = [r.upper() for r in _split_slot_values(regions_str)]
+    query = {
+        "experiment_id": experiment_id,
+        "request_body": request_body,
+        "card_type": card_type,
+        "sort_type": sort_type,
+        # Canonical key for the persistent store: the fully resolved upstream
+        # request (aliases, default dates/control applied) plus the formatter filters.
+        "store_key": _cache_key({"request_body": request_body, "card_type": card_type, "sort_type": sort_type}),
+    }
+    return query, None
 
-        template_group_name = str(
-            params.get("template_group_name", DEFAULT_TEMPLATE_GROUP_NAME)
-        ).strip() or DEFAULT_TEMPLATE_GROUP_NAME
-        is_by_card_template = "by card" in template_group_name.lower()
-
-        # card_type:
-        # - For "by card" templates, always include card_type dimension so
-        #   allcard filtering aligns with page behavior and SQL expectation.
-        # - For other templates, include card_type only when caller requests
-        #   a specific non-allcard slice.
-        card_type = str(params.get("card_type", DEFAULT_CARD_TYPE)).strip() or DEFAULT_CARD_TYPE
-        if is_by_card_template or card_type.lower() not in ("allcard", "all_card", "all"):
-            dims.append(CARD_TYPE_DIM)
-        sort_type = str(params.get("sort_type", DEFAULT_SORT_TYPE)).strip() or DEFAULT_SORT_TYPE
-        # To match page behavior, include sort_type dimension when explicitly specified
-        # (including "__ALL__"), then filter rows in formatter.
-        if sort_type:
-            dims.append(SORT_TYPE_DIM)
-
-        # Parse control and treatments
-        alias_mapping = _load_bucket_mapping()
 
-        control_raw = _normalize_control_group(params.get("control", ""))
-        if not control_raw:
-            default_control = DEFAULT_CONTROL_BY_EXPERIMENT.get(experiment_id, "")
-            if default_control:
-                control_raw = default_control
-                print(f"[AB Proxy] control missing, fallback to default for exp {experiment_id}: {control_raw}")
-        control_parts = [p.strip() for p in control_raw.split(";") if p.strip()]
-        control_parts = _resolve_bucket_aliases(control_parts, alias_mapping)
-        control = ";".join(control_parts)
+# (experiment_id, requested template group) -> (template group that worked, expires_at)
+_template_group_memo: OrderedDict[tuple, tuple[str, float]] = OrderedDict()
+_template_group_memo_stats = {"hits": 0, "stale": 0}
 
-        treatments = _split_slot_values(params.get("treatments", ""))
-        treatments = _resolve_bucket_aliases(treatments, alias_mapping)
-        # Stabilize treatment ordering to avoid AB backend order-sensitive empty results
-        # for the same bucket set (observed in production for exp 6850).
-        # Use numeric ascending order after alias resolution.
-        try:
-            treatments = sorted(
-                list(dict.fromkeys(treatments)),
-                key=lambda x: int(x) if str(x).isdigit() else 10**18,
+
+def _remembered_template_group(experiment_id: int, requested: str) -> str | None:
+    key = (experiment_id, requested)
+    entry = _template_group_memo.get(key)
+    if entry is None:
+        return None
+    group, expires_at = entry
+    if time.monotonic() >= expires_at:
+        del _template_group_memo[key]
+        return None
+    return group
+
+
+def _remember_template_group(experiment_id: int, requested: str, group: str) -> None:
+    key = (experiment_id, requested)
+    _template_group_memo.pop(key, None)
+    _template_group_memo[key] = (group, time.monotonic() + TEMPLATE_GROUP_MEMO_TTL_SECONDS)
+    while len(_template_group_memo) > TEMPLATE_GROUP_MEMO_MAX_ENTRIES:
+        _template_group_memo.popitem(last=False)
+
+
+def _template_group_memo_snapshot() -> dict:
+    return {"entries": len(_template_group_memo), **_template_group_memo_stats}
+
+
+async def _request_summary_key(
+    session: aiohttp.ClientSession, request_body: dict, experiment_id: int
+) -> tuple[dict | None, dict | None]:
+    """Step 1: open_get_summary_key, with template-group fallback.
+
+    Experiments known to lack the requested template group go straight to
+    the group that worked last time, skipping the doomed first request.
+
+    Returns (key_info, None) on success or (None, error_response).
+    """
+    requested_group = request_body.get("template_group_name")
+    remembered_group = _remembered_template_group(experiment_id, requested_group)
+    if remembered_group is not None:
+        _template_group_memo_stats["hits"] += 1
+        request_body["template_group_name"] = remembered_group
+
+    key_status, key_result = await _call_ab_api(
+        session=session,
+        namespace=AB_DES_NAMESPACE_KEY,
+        request_body=request_body,
+        experiment_id=experiment_id,
+    )
+    if (
+        remembered_group is not None
+        and key_status == 200
+        and key_result.get("retcode") not in (0, "0", None)
+        and _is_template_group_not_exists(key_result)
+    ):
+        # The remembered group is gone too; forget it and take the normal path.
+        _template_group_memo_stats["stale"] += 1
+        _template_group_memo.pop((experiment_id, requested_group), None)
+        request_body["template_group_name"] = requested_group
+        key_status, key_result = await _call_ab_api(
+            session=session,
+            namespace=AB_DES_NAMESPACE_KEY,
+            request_body=request_body,
+            experiment_id=experiment_id,
+        )
+
+    if key_status != 200:
+        error_text = key_result.get("error_text", "")
+        log.error(f"Key API error: {key_status} - {error_text[:500]}")
+        return None, {
+            "result": f"AB API key request failed (status {key_status}): {error_text[:500]}"
+        }
+
+    log.debug(
+        "Key API business status: retcode=%s, msg=%s, template_group_name=%s",
+        key_result.get("retcode"), key_result.get("msg", ""), request_body.get("template_group_name"),
+    )
+    if (
+        key_result.get("retcode") not in (0, "0", None)
+        and _is_template_group_not_exists(key_result)
+        and request_body.get("template_group_name") != FALLBACK_TEMPLATE_GROUP_NAME
+    ):
+        # Fallback for experiments that don't have the preferred default template group.
+        log.info(
+            f"Template group '{request_body.get('template_group_name')}' unavailable. "
+            f"Retry with '{FALLBACK_TEMPLATE_GROUP_NAME}'."
+        )
+        _template_fallbacks.inc()
+        request_body["template_group_name"] = FALLBACK_TEMPLATE_GROUP_NAME
+        key_status, key_result = await _call_ab_api(
+            session=session,
+            namespace=AB_DES_NAMESPACE_KEY,
+            request_body=request_body,
+            experiment_id=experiment_id,
+        )
+        if key_status != 200:
+            error_text = key_result.get("error_text", "")
+            return None, {
+                "result": f"AB API key request failed (status {key_status}): {error_text[:500]}"
+            }
+        if key_result.get("retcode") in (0, "0", None):
+            _remember_template_group(experiment_id, requested_group, FALLBACK_TEMPLATE_GROUP_NAME)
+
+    if key_result.get("retcode") not in (0, "0", None):
+        return None, {
+            "result": (
+                f"AB API key request business error: retcode={key_result.get('retcode')}, "
+                f"msg={key_result.get('msg', 'unknown')}"
             )
-        except Exception:
-            # Keep original order if any unexpected token appears.
-            pass
+        }
+
+    key_info = key_result.get("key_info")
+    if not isinstance(key_info, dict):
+        return None, {"result": "AB API key response missing key_info."}
+    return key_info, None
 
-        if not control or not treatments:
-            return json_response({
-                "result": "Error: Both control and treatment bucket IDs are required."
-            })
 
-        unresolved_buckets = [x for x in control_parts + treatments if not str(x).isdigit()]
-        if unresolved_buckets:
-            return json_response({
+async def _poll_summary_result(
+    session: aiohttp.ClientSession,
+    request_body: dict,
+    key_info: dict,
+    experiment_id: int,
+    poll_run: "_PollRun",
+) -> tuple[dict | None, dict, dict | None]:
+    """Step 2: poll open_get_summary_result until done, failed or out of budget.
+
+    Returns (final_result, latest_key_info, error_response).  Both
+    final_result and error_response are None when the query is still
+    running after the poll budget is spent.
+    """
+    result_request_body = dict(request_body)
+    result_request_body["key_info"] = key_info
+    final_key_info = key_info
+
+    async for attempt in poll_run:
+        result_status, result_payload = await _call_ab_api(
+            session=session,
+            namespace=AB_DES_NAMESPACE_RESULT,
+            request_body=result_request_body,
+            experiment_id=experiment_id,
+        )
+
+        if result_status != 200:
+            _observe_poll(poll_run, "failed")
+            error_text = result_payload.get("error_text", "")
+            return None, final_key_info, {
+                "result": f"AB API result request failed (status {result_status}): {error_text[:500]}"
+            }
+
+        if result_payload.get("retcode") not in (0, "0", None):
+            _observe_poll(poll_run, "failed")
+            return None, final_key_info, {
                 "result": (
-                    "Error: Unresolved bucket IDs/aliases: "
-                    f"{', '.join(unresolved_buckets)}. "
-                    "Please provide numeric bucket IDs or define aliases in Bucket_mapping.txt."
+                    f"AB API result request business error: retcode={result_payload.get('retcode')}, "
+                    f"msg={result_payload.get('msg', 'unknown')}"
                 )
-            })
-
-        metrics_input = _split_slot_values(params.get("metrics", ""))
-        if metrics_input:
-            metrics = []
-            for metric in metrics_input:
-                metric_norm = metric.strip()
-                if not metric_norm:
-                    continue
-                if not re.fullmatch(r"[A-Za-z0-9_]+", metric_norm):
-                    return json_response({
-                        "result": f"Error: Invalid metric name '{metric_norm}'. Use letters/numbers/underscore only."
-                    })
-                if metric_norm not in metrics:
-                    metrics.append(metric_norm)
-        else:
-            metrics = DEFAULT_METRICS
+            }
 
-        # Build AB API request body
-        request_body = {
-            "project_id": DEFAULT_PROJECT_ID,
-            "experiment_id": experiment_id,
-            "operator": "samaritan.bot",
-            "template_name": DEFAULT_TEMPLATE_NAME,
-            "template_group_name": template_group_name,
-            "template_group_type": DEFAULT_TEMPLATE_GROUP_TYPE,
-            "dates": [
-                {
-                    "time_start": date_start,
-                    "time_end": date_end
-                }
-            ],
-            "regions": regions,
-            "control": control,
-            "treatments": treatments,
-            "normalization": DEFAULT_NORMALIZATION,
-            "metrics": metrics,
-            "dims": dims
-        }
+        loop_key_info = result_payload.get("key_info")
+        if isinstance(loop_key_info, dict):
+            final_key_info = loop_key_info
+            result_request_body["key_info"] = loop_key_info
 
-        print(f"[AB Proxy] === Built API request ===")
-        print(f"[AB Proxy]   experiment_id: {experiment_id} (type={type(experiment_id).__name__})")
-        print(f"[AB Proxy]   dates: {date_start} to {date_end}")
-        print(f"[AB Proxy]   regions: {regions}")
-        print(f"[AB Proxy]   control: '{control}' (from raw='{params.get('control', '')}')")
-        print(f"[AB Proxy]   treatments: {treatments} (from raw='{params.get('treatments', '')}')")
-        print(f"[AB Proxy]   metrics: {metrics} (from raw='{params.get('metrics', '')}')")
-        print(f"[AB Proxy]   card_type: {card_type}")
-        print(f"[AB Proxy]   sort_type: {sort_type}")
-        print(f"[AB Proxy]   dims: {dims} (split_by_date={split_by_date})")
-        print(f"[AB Proxy]   Full body: {json.dumps(request_body, ensure_ascii=False)}")
-
-        async with aiohttp.ClientSession() as session:
-            # Step 1: open_get_summary_key
-            key_status, key_result = await _call_ab_api(
-                session=session,
-                namespace=AB_DES_NAMESPACE_KEY,
-                request_body=request_body,
-                experiment_id=experiment_id,
-            )
+        status = final_key_info.get("status")
+        log.debug(
+            "Poll attempt %d (%.1fs): status=%s, msg=%s",
+            attempt, poll_run.elapsed, status, final_key_info.get("msg", ""),
+        )
+        if status == 3:
+            poll_run.mark_done()
+            _observe_poll(poll_run, "done")
+            return result_payload, final_key_info, None
+        if status == 2:
+            _observe_poll(poll_run, "failed")
+            fail_msg = final_key_info.get("msg") or result_payload.get("msg") or "unknown"
+            return None, final_key_info, {"result": f"AB report query failed: {fail_msg}"}
+
+    _observe_poll(poll_run, "pending")
+    return None, final_key_info, None
+
+
+def _format_report(final_result: dict, query: dict, key_info: dict, poll_attempts: int) -> dict:
+    """Format a completed result payload into the proxy response body."""
+    if log.isEnabledFor(logging.DEBUG):
+        # Dump raw response structure (null-safe)
+        _dbg_data = final_result.get("data") or {}
+        _dbg_body = _dbg_data.get("body") or []
+        _dbg_rel = _dbg_data.get("relative") or []
+        lines = [
+            f"Raw result header: {_dbg_data.get('header', '')}",
+            f"  control_group_indexes: {_dbg_data.get('control_group_indexes')}",
+            f"  body rows ({len(_dbg_body)}):",
+        ]
+        lines.extend(f"    row[{_i}]: {_r}" for _i, _r in enumerate(_dbg_body[:6]))
+        lines.append(f"  relative rows ({len(_dbg_rel)}):")
+        lines.extend(f"    rel[{_i}]: {_r}" for _i, _r in enumerate(_dbg_rel[:6]))
+        log.debug("\n".join(lines))
+
+    with _StageTimer("format"):
+        formatted = format_ab_results(
+            final_result,
+            query["request_body"],
+            key_info,
+            poll_attempts,
+            card_type_filter=query["card_type"],
+            sort_type_filter=query["sort_type"],
+        )
+    return {"result": formatted}
+
+
+def _maybe_cache(ck: str, resp: dict, disable_cache: bool) -> None:
+    if (not disable_cache) and ck and _result_has_data(resp.get("result", "")):
+        _cache_set(ck, resp)
+        log.debug("Result cached (key=%s...)", ck[:12])
+    else:
+        log.debug("Skip cache (bypass or no metric data)")
+
+
+async def _run_ab_report(params: dict, disable_cache: bool, ck: str = "") -> dict:
+    """Run the full key + poll + format pipeline and return the response body."""
+    try:
+        with _StageTimer("build_query"):
+            query, error = _build_report_query(params)
+        if error is not None:
+            return error
+        experiment_id = query["experiment_id"]
+        request_body = query["request_body"]
 
-            if key_status != 200:
-                error_text = key_result.get("error_text", "")
-                print(f"[AB Proxy] Key API error: {key_status} - {error_text[:500]}")
-                return json_response({
-                    "result": f"AB API key request failed (status {key_status}): {error_text[:500]}"
-                })
-
-            print("[AB Proxy] Key API response status: 200")
-            print(
-                f"[AB Proxy] Key API business status: retcode={key_result.get('retcode')}, "
-                f"msg={key_result.get('msg', '')}, template_group_name={request_body.get('template_group_name')}"
+        if not disable_cache:
+            stored = await _result_store_get(query["store_key"])
+            if stored is not None:
+                log.info("Result store HIT — skipping upstream API call")
+                _maybe_cache(ck, stored, disable_cache)
+                return stored
+
+        session = _http_session()
+        with _StageTimer("request_key"):
+            key_info, error = await _request_summary_key(session, request_body, experiment_id)
+        if error is not None:
+            return error
+
+        poll_run = _result_poller.run(experiment_id)
+        with _StageTimer("poll"):
+            final_result, final_key_info, error = await _poll_summary_result(
+                session, request_body, key_info, experiment_id, poll_run,
             )
-            if (
-                key_result.get("retcode") not in (0, "0", None)
-                and _is_template_group_not_exists(key_result)
-                and request_body.get("template_group_name") != FALLBACK_TEMPLATE_GROUP_NAME
-            ):
-                # Fallback for experiments that don't have the preferred default template group.
-                print(
-                    f"[AB Proxy] Template group '{request_body.get('template_group_name')}' unavailable. "
-                    f"Retry with '{FALLBACK_TEMPLATE_GROUP_NAME}'."
-                )
-                request_body["template_group_name"] = FALLBACK_TEMPLATE_GROUP_NAME
-                key_status, key_result = await _call_ab_api(
-                    session=session,
-                    namespace=AB_DES_NAMESPACE_KEY,
-                    request_body=request_body,
-                    experiment_id=experiment_id,
-                )
-                if key_status != 200:
-                    error_text = key_result.get("error_text", "")
-                    return json_response({
-                        "result": f"AB API key request failed (status {key_status}): {error_text[:500]}"
-                    })
-
-            if key_result.get("retcode") not in (0, "0", None):
-                return json_response({
+        if error is not None:
+            return error
+
+        if final_result is None:
+            # Keep tracking the query in the background so the caller can
+            # fetch the finished report later instead of starting over.
+            job = _start_report_job(query, final_key_info, ck, disable_cache)
+            if job is None:
+                return {
                     "result": (
-                        f"AB API key request business error: retcode={key_result.get('retcode')}, "
-                        f"msg={key_result.get('msg', 'unknown')}"
-                    )
-                })
-
-            key_info = key_result.get("key_info")
-            if not isinstance(key_info, dict):
-                return json_response({"result": "AB API key response missing key_info."})
-
-            # Step 2: poll open_get_summary_result with key_info
-            result_request_body = dict(request_body)
-            result_request_body["key_info"] = key_info
-
-            final_result = None
-            final_key_info = key_info
-            poll_attempts = 0
-
-            for attempt in range(1, RESULT_POLL_MAX_ATTEMPTS + 1):
-                poll_attempts = attempt
-                result_status, result_payload = await _call_ab_api(
-                    session=session,
-                    namespace=AB_DES_NAMESPACE_RESULT,
-                    request_body=result_request_body,
-                    experiment_id=experiment_id,
-                )
+                        f"AB report query is still running after {poll_run.attempt} attempts "
+                        f"({poll_run.elapsed:.0f}s), and too many background jobs are already "
+                        f"running to track it. Please retry later."
+                    ),
+                }
+            return {
+                "result": (
+                    f"AB report query is still running after {poll_run.attempt} attempts "
+                    f"({poll_run.elapsed:.0f}s). "
+                    f"query_key={job['job_id']}. "
+                    f"Fetch the finished report later via GET /ab_report/result/{job['job_id']}"
+                ),
+                "job_id": job["job_id"],
+            }
 
-                if result_status != 200:
-                    error_text = result_payload.get("error_text", "")
-                    return json_response({
-                        "result": f"AB API result request failed (status {result_status}): {error_text[:500]}"
-                    })
-
-                if result_payload.get("retcode") not in (0, "0", None):
-                    return json_response({
-                        "result": (
-                            f"AB API result request business error: retcode={result_payload.get('retcode')}, "
-                            f"msg={result_payload.get('msg', 'unknown')}"
-                        )
-                    })
-
-                loop_key_info = result_payload.get("key_info")
-                if isinstance(loop_key_info, dict):
-                    final_key_info = loop_key_info
-                    result_request_body["key_info"] = loop_key_info
-
-                status = final_key_info.get("status")
-                print(
-                    f"[AB Proxy] Poll attempt {attempt}/{RESULT_POLL_MAX_ATTEMPTS}: "
-                    f"status={status}, msg={final_key_info.get('msg', '')}"
-                )
-                if status == 3:
-                    final_result = result_payload
-                    break
-                if status == 2:
-                    fail_msg = final_key_info.get("msg") or result_payload.get("msg") or "unknown"
-                    return json_response({"result": f"AB report query failed: {fail_msg}"})
+        resp = _format_report(final_result, query, final_key_info, poll_run.attempt)
+        _maybe_cache(ck, resp, disable_cache)
+        await _result_store_put(query, resp)
+        return resp
 
-                await asyncio.sleep(RESULT_POLL_INTERVAL_SECONDS)
+    except ValueError as e:
+        log.warning(f"ValueError: {str(e)}")
+        return {"result": f"Invalid parameter: {str(e)}"}
+    except Exception as e:
+        log.exception(f"Exception: {str(e)}")
+        return {"result": f"Proxy error: {str(e)}"}
 
-            if final_result is None:
-                query_key = final_key_info.get("single_data_query_key")
-                return json_response({
-                    "result": (
-                        f"AB report query is still running after {poll_attempts} attempts. "
-                        f"query_key={query_key}"
-                    )
-                })
-
-            # Debug: dump raw response structure (null-safe)
-            _dbg_data = final_result.get("data") or {}
-            _dbg_header = _dbg_data.get("header", "")
-            _dbg_body = _dbg_data.get("body") or []
-            _dbg_rel = _dbg_data.get("relative") or []
-            _dbg_ctrl_idx = _dbg_data.get("control_group_indexes")
-            print(f"[AB Proxy] DEBUG header: {_dbg_header}")
-            print(f"[AB Proxy] DEBUG control_group_indexes: {_dbg_ctrl_idx}")
-            print(f"[AB Proxy] DEBUG body rows ({len(_dbg_body)}):")
-            for _i, _r in enumerate(_dbg_body[:6]):
-                print(f"[AB Proxy]   row[{_i}]: {_r}")
-            print(f"[AB Proxy] DEBUG relative rows ({len(_dbg_rel)}):")
-            for _i, _r in enumerate(_dbg_rel[:6]):
-                print(f"[AB Proxy]   rel[{_i}]: {_r}")
-
-            formatted = format_ab_results(
-                final_result,
-                request_body,
-                final_key_info,
-                poll_attempts,
-                card_type_filter=card_type,
-                sort_type_filter=sort_type,
-            )
-            resp = {"result": formatted}
-            if (not disable_cache) and _result_has_data(formatted):
-                _cache_set(ck, resp)
-                print(f"[AB Proxy] Result cached (key={ck[:12]}...)")
-            else:
-                print(f"[AB Proxy] Skip cache (bypass or no metric data)")
-            return json_response(resp)
 
+# ============================================================
+# Async job API for long-running reports.  A job is keyed by the
+# upstream single_data_query_key; a background task keeps polling
+# the existing key_info (no new key request) and stores the
+# formatted report for later retrieval.
+# ============================================================
+JOB_POLL_DEADLINE_SECONDS = float(os.getenv("AB_JOB_POLL_DEADLINE_SECONDS", "900"))
+JOB_RETENTION_SECONDS = float(os.getenv("AB_JOB_RETENTION_SECONDS", "3600"))
+MAX_JOBS = int(os.getenv("AB_MAX_JOBS", "256"))
+MAX_RUNNING_JOBS = int(os.getenv("AB_MAX_RUNNING_JOBS", "32"))
+JOB_STORE_PREFIX = "job:"  # finished job records live in the result store under job:<job_id>
+
+_jobs: OrderedDict[str, dict] = OrderedDict()  # job_id -> job record
+_job_poller = AdaptivePoller(
+    first_delay=RESULT_POLL_BASE_DELAY_SECONDS,
+    base_delay=RESULT_POLL_BASE_DELAY_SECONDS,
+    max_delay=max(RESULT_POLL_MAX_DELAY_SECONDS, 15.0),
+    factor=RESULT_POLL_BACKOFF_FACTOR,
+    jitter=RESULT_POLL_JITTER,
+    deadline=JOB_POLL_DEADLINE_SECONDS,
+    max_attempts=10_000,
+)
+
+
+def _job_view(job: dict, include_result: bool = False) -> dict:
+    view = {
+        "job_id": job["job_id"],
+        "experiment_id": job["experiment_id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+    if job.get("error"):
+        view["error"] = job["error"]
+    if include_result and job["status"] == "done":
+        view["result"] = job["result"]["result"]
+    return view
+
+
+async def _persist_job(job: dict, query: dict) -> None:
+    """Save the finished job record (with its report) so status/result survive restarts and pruning."""
+    ttl = max(JOB_RETENTION_SECONDS, _result_store_ttl(query["request_body"]))
+    await asyncio.to_thread(
+        _result_store.set, JOB_STORE_PREFIX + job["job_id"], _job_view(job, include_result=True), ttl,
+    )
+
+
+async def _lookup_job_view(job_id: str, include_result: bool = False) -> dict | None:
+    """Job view from memory, falling back to the record persisted in the result store."""
+    job = _jobs.get(job_id)
+    if job is not None:
+        return _job_view(job, include_result=include_result)
+    view = await _result_store_get(JOB_STORE_PREFIX + job_id)
+    if view is not None and not include_result:
+        view.pop("result", None)
+    return view
+
+
+def _prune_jobs() -> None:
+    """Drop finished jobs past retention, then the oldest finished ones beyond MAX_JOBS."""
+    now = time.time()
+    for job_id in [
+        k for k, j in _jobs.items()
+        if j["status"] != "running" and now - j["updated_at"] > JOB_RETENTION_SECONDS
+    ]:
+        _jobs.pop(job_id, None)
+    if len(_jobs) > MAX_JOBS:
+        for job_id in [k for k, j in _jobs.items() if j["status"] != "running"][: len(_jobs) - MAX_JOBS]:
+            _jobs.pop(job_id, None)
+
+
+def _running_jobs() -> int:
+    return sum(1 for job in _jobs.values() if job["status"] == "running")
+
+
+def _start_report_job(query: dict, key_info: dict, ck: str, disable_cache: bool) -> dict | None:
+    """Register (or reuse) the background job tracking `key_info`.
+
+    Returns None when MAX_RUNNING_JOBS pollers are already running; each one
+    may poll for up to JOB_POLL_DEADLINE_SECONDS, so new jobs are refused
+    rather than queued.
+    """
+    job_id = str(key_info.get("single_data_query_key") or "") or _cache_key(
+        {"request_body": query["request_body"], "key_info": key_info}
+    )
+    job = _jobs.get(job_id)
+    if job is not None and job["status"] in ("running", "done"):
+        return job
+    if _running_jobs() >= MAX_RUNNING_JOBS:
+        log.warning(f"Job {job_id} refused: {MAX_RUNNING_JOBS} background jobs already running",
+                    extra={"ctx": {"experiment_id": query["experiment_id"]}})
+        return None
+
+    _prune_jobs()
+    now = time.time()
+    job = {
+        "job_id": job_id,
+        "experiment_id": query["experiment_id"],
+        "status": "running",
+        "attempts": 0,
+        "created_at": now,
+        "updated_at": now,
+        "result": None,
+        "error": "",
+    }
+    _jobs[job_id] = job
+    job["task"] = asyncio.ensure_future(_track_report_job(job, query, key_info, ck, disable_cache))
+    log.info(f"Job {job_id} tracking in background", extra={"ctx": {"experiment_id": query["experiment_id"]}})
+    return job
+
+
+async def _track_report_job(job: dict, query: dict, key_info: dict, ck: str, disable_cache: bool) -> None:
+    poll_run = _job_poller.run(query["experiment_id"])
+    try:
+        final_result, final_key_info, error = await _poll_summary_result(
+            _http_session(), query["request_body"], key_info, query["experiment_id"], poll_run,
+        )
+        job["attempts"] = poll_run.attempt
+        if error is not None:
+            job["status"] = "failed"
+            job["error"] = error["result"]
+        elif final_result is None:
+            job["status"] = "failed"
+            job["error"] = f"AB report query still running after {poll_run.elapsed:.0f}s; giving up."
+        else:
+            resp = _format_report(final_result, query, final_key_info, poll_run.attempt)
+            _maybe_cache(ck, resp, disable_cache)
+            await _result_store_put(query, resp)
+            job["result"] = resp
+            job["status"] = "done"
+            # Teach the interactive poller too, so later queries wait appropriately.
+            _result_poller.observe(query["experiment_id"], time.time() - job["created_at"])
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = f"Proxy error: {str(e)}"
+    finally:
+        job["updated_at"] = time.time()
+        job.pop("task", None)
+        log.info(f"Job {job['job_id']} finished", extra={"ctx": {"status": job["status"], "attempts": job["attempts"]}})
+    try:
+        await _persist_job(job, query)
+    except Exception as e:
+        log.warning(f"Job {job['job_id']} record not persisted: {e}")
+
+
+def _is_authorized(request: Request) -> bool:
+    return request.headers.get(INTERNAL_PROXY_AUTH_HEADER, "") == INTERNAL_PROXY_TOKEN
+
+
+@app.post("/ab_report/submit")
+async def submit_ab_report(request: Request):
+    """Start an AB report without waiting for it; poll /ab_report/status/<job_id>."""
+    if not _is_authorized(request):
+        return json_response({"result": "Unauthorized"}, status=401)
+    if not AB_TOKEN:
+        return json_response({"result": "Missing AB platform token: set AB_PLATFORM_TOKEN"})
+    params = request.json or {}
+    disable_cache = _should_disable_cache(request, params)
+    ck = _cache_key(params)
+    if not disable_cache:
+        cached = _cache_get(ck)
+        if cached is not None:
+            return json_response({"job_id": "", "status": "done", "result": cached["result"]})
+    try:
+        query, error = _build_report_query(params)
+        if error is not None:
+            return json_response({"status": "failed", **error})
+        if not disable_cache:
+            stored = await _result_store_get(query["store_key"])
+            if stored is not None:
+                _maybe_cache(ck, stored, disable_cache)
+                return json_response({"job_id": "", "status": "done", "result": stored["result"]})
+        key_info, error = await _request_summary_key(
+            _http_session(), query["request_body"], query["experiment_id"],
+        )
+        if error is not None:
+            return json_response({"status": "failed", **error})
     except ValueError as e:
-        print(f"[AB Proxy] ValueError: {str(e)}")
-        return json_response({"result": f"Invalid parameter: {str(e)}"})
+        return json_response({"status": "failed", "result": f"Invalid parameter: {str(e)}"})
     except Exception as e:
-        print(f"[AB Proxy] Exception: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return json_response({"result": f"Proxy error: {str(e)}"})
+        return json_response({"status": "failed", "result": f"Proxy error: {str(e)}"})
+
+    job = _start_report_job(query, key_info, ck, disable_cache)
+    if job is None:
+        return json_response(
+            {"status": "failed", "result": f"Too many running report jobs (max {MAX_RUNNING_JOBS}); retry later."},
+            status=429,
+        )
+    return json_response(_job_view(job), status=202)
+
+
+@app.get("/ab_report/status/<job_id>")
+async def ab_report_status(request: Request, job_id: str):
+    if not _is_authorized(request):
+        return json_response({"result": "Unauthorized"}, status=401)
+    view = await _lookup_job_view(job_id)
+    if view is None:
+        return json_response({"job_id": job_id, "status": "unknown"}, status=404)
+    return json_response(view)
+
+
+@app.get("/ab_report/result/<job_id>")
+async def ab_report_result(request: Request, job_id: str):
+    if not _is_authorized(request):
+        return json_response({"result": "Unauthorized"}, status=401)
+    view = await _lookup_job_view(job_id, include_result=True)
+    if view is None:
+        return json_response({"job_id": job_id, "status": "unknown"}, status=404)
+    if view["status"] == "running":
+        return json_response(view, status=202)
+    return json_response(view)
+
+
+# ============================================================
+# Batch endpoint: many query specs fanned out concurrently under
+# one process-wide cap.  Each item goes through the same cache /
+# coalescing / job path as /ab_report and is streamed back as an
+# NDJSON line the moment it finishes.
+# ============================================================
+BATCH_CONCURRENCY = int(os.getenv("AB_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_QUERIES = int(os.getenv("AB_BATCH_MAX_QUERIES", "50"))
+
+_batch_semaphore: asyncio.Semaphore | None = None
+
+
+async def _run_batch_item(index: int, params: dict, disable_cache: bool) -> dict:
+    global _batch_semaphore
+    if _batch_semaphore is None:
+        _batch_semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    started_at = time.perf_counter()
+    async with _batch_semaphore:
+        resp = await _serve_report(params, disable_cache)
+    return {
+        "index": index,
+        "experiment_id": params.get("experiment_id"),
+        "elapsed_ms": int((time.perf_counter() - started_at) * 1000),
+        **resp,
+    }
+
+
+@app.post("/ab_report/batch")
+async def batch_ab_report(request: Request):
+    """
+    Run several AB report queries concurrently.
+
+    Body: {"queries": [{...same fields as /ab_report...}, ...]}
+
+    Streams one NDJSON line per query in completion order (each carries its
+    `index` in the input list), then a final {"done": true, ...} line.
+    Pass ?stream=0 to get one JSON object with results in input order.
+    """
+    if not _is_authorized(request):
+        return json_response({"result": "Unauthorized"}, status=401)
+    if not AB_TOKEN:
+        return json_response({"result": "Missing AB platform token: set AB_PLATFORM_TOKEN"})
+    body = request.json or {}
+    queries = body.get("queries") if isinstance(body, dict) else None
+    if not isinstance(queries, list) or not queries:
+        return json_response({"result": "queries must be a non-empty list"}, status=400)
+    if len(queries) > BATCH_MAX_QUERIES:
+        return json_response({"result": f"Too many queries ({len(queries)} > {BATCH_MAX_QUERIES})"}, status=400)
+    if not all(isinstance(q, dict) for q in queries):
+        return json_response({"result": "Each query must be a JSON object"}, status=400)
+
+    log.info(f"Received /ab_report/batch request with {len(queries)} queries")
+    started_at = time.perf_counter()
+    tasks = [
+        asyncio.ensure_future(_run_batch_item(i, q, _should_disable_cache(request, q)))
+        for i, q in enumerate(queries)
+    ]
+
+    if not _is_truthy(request.args.get("stream", "1")):
+        results = await asyncio.gather(*tasks)
+        return json_response({
+            "results": results,
+            "count": len(results),
+            "elapsed_ms": int((time.perf_counter() - started_at) * 1000),
+        })
+
+    response = await request.respond(content_type="application/x-ndjson")
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            await response.send(json.dumps(item, ensure_ascii=False) + "\n")
+    except Exception:
+        # Client went away or a send failed: stop the remaining queries.
+        for task in tasks:
+            task.cancel()
+        raise
+    await response.send(json.dumps({
+        "done": True,
+        "count": len(tasks),
+        "elapsed_ms": int((time.perf_counter() - started_at) * 1000),
+    }) + "\n")
+    await response.eof()
 
 
 @app.post("/card_types")
@@ -1142,49 +2501,52 @@ async def fetch_card_types(request: Request):
             "dims": ["abtest_group", "abtest_region", "card_type", "abtest_date"],
         }
 
-        async with aiohttp.ClientSession() as session:
-            key_status, key_result = await _call_ab_api(
+        session = _http_session()
+        key_status, key_result = await _call_ab_api(
+            session=session,
+            namespace=AB_DES_NAMESPACE_KEY,
+            request_body=request_body,
+            experiment_id=experiment_id,
+        )
+        if key_status != 200:
+            return json_response({"error": f"AB key request failed (status={key_status})"})
+        if key_result.get("retcode") not in (0, "0", None):
+            return json_response({"error": f"AB key business error: {key_result.get('msg', 'unknown')}"})
+
+        key_info = key_result.get("key_info")
+        if not isinstance(key_info, dict):
+            return json_response({"error": "AB key response missing key_info"})
+
+        result_request_body = dict(request_body)
+        result_request_body["key_info"] = key_info
+        final_result = None
+        poll_run = _result_poller.run(experiment_id)
+        async for _ in poll_run:
+            result_status, result_payload = await _call_ab_api(
                 session=session,
-                namespace=AB_DES_NAMESPACE_KEY,
-                request_body=request_body,
+                namespace=AB_DES_NAMESPACE_RESULT,
+                request_body=result_request_body,
                 experiment_id=experiment_id,
             )
-            if key_status != 200:
-                return json_response({"error": f"AB key request failed (status={key_status})"})
-            if key_result.get("retcode") not in (0, "0", None):
-                return json_response({"error": f"AB key business error: {key_result.get('msg', 'unknown')}"})
-
-            key_info = key_result.get("key_info")
-            if not isinstance(key_info, dict):
-                return json_response({"error": "AB key response missing key_info"})
-
-            result_request_body = dict(request_body)
-            result_request_body["key_info"] = key_info
-            final_result = None
-            for _ in range(RESULT_POLL_MAX_ATTEMPTS):
-                result_status, result_payload = await _call_ab_api(
-                    session=session,
-                    namespace=AB_DES_NAMESPACE_RESULT,
-                    request_body=result_request_body,
-                    experiment_id=experiment_id,
-                )
-                if result_status != 200:
-                    return json_response({"error": f"AB result request failed (status={result_status})"})
-                if result_payload.get("retcode") not in (0, "0", None):
-                    return json_response({"error": f"AB result business error: {result_payload.get('msg', 'unknown')}"})
-
-                loop_key_info = result_payload.get("key_info")
-                if isinstance(loop_key_info, dict):
-                    result_request_body["key_info"] = loop_key_info
-                    if loop_key_info.get("status") == 3:
-                        final_result = result_payload
-                        break
-                    if loop_key_info.get("status") == 2:
-                        return json_response({"error": f"AB report query failed: {loop_key_info.get('msg', 'unknown')}"})
-                await asyncio.sleep(RESULT_POLL_INTERVAL_SECONDS)
-
-            if final_result is None:
-                return json_response({"error": "AB report query still running"})
+            if result_status != 200:
+                return json_response({"error": f"AB result request failed (status={result_status})"})
+            if result_payload.get("retcode") not in (0, "0", None):
+                return json_response({"error": f"AB result business error: {result_payload.get('msg', 'unknown')}"})
+
+            loop_key_info = result_payload.get("key_info")
+            if isinstance(loop_key_info, dict):
+                result_request_body["key_info"] = loop_key_info
+                if loop_key_info.get("status") == 3:
+                    final_result = result_payload
+                    poll_run.mark_done()
+                    break
+                if loop_key_info.get("status") == 2:
+                    _observe_poll(poll_run, "failed")
+                    return json_response({"error": f"AB report query failed: {loop_key_info.get('msg', 'unknown')}"})
+
+        _observe_poll(poll_run, "done" if final_result is not None else "pending")
+        if final_result is None:
+            return json_response({"error": "AB report query still running"})
 
         card_types = _extract_unique_card_types(final_result)
         return json_response({
@@ -1200,17 +2562,78 @@ async def fetch_card_types(request: Request):
         return json_response({"error": f"card_types proxy error: {str(e)}"})
 
 
+def _collect_state():
+    """Scrape-time export of the stats owned by the cache, coalescer, HTTP pool, jobs and logger."""
+    cache = _response_cache.stats()
+    yield "cache_hits_total", "counter", "Response cache hits.", cache["hits"]
+    yield "cache_misses_total", "counter", "Response cache misses.", cache["misses"]
+    yield "cache_evictions_total", "counter", "Entries evicted by the size/count bound.", cache["evictions"]
+    yield "cache_expirations_total", "counter", "Entries dropped after their TTL.", cache["expirations"]
+    yield "cache_entries", "gauge", "Entries currently cached.", cache["entries"]
+    yield "cache_bytes", "gauge", "Approximate bytes currently cached.", cache["bytes"]
+    yield "coalesce_leaders_total", "counter", "Requests that started an upstream run.", _coalesce_stats["leaders"]
+    yield "coalesce_followers_total", "counter", "Requests served by an in-flight run.", _coalesce_stats["coalesced"]
+    yield "coalesce_inflight", "gauge", "Upstream runs currently in flight.", len(_inflight_requests)
+    yield "http_connections_created_total", "counter", "New upstream TCP connections.", _http_stats["connections_created"]
+    yield "http_connections_reused_total", "counter", "Requests served on a pooled connection.", _http_stats["connections_reused"]
+    yield "template_group_memo_hits_total", "counter", "Key requests sent straight to a remembered template group.", (
+        _template_group_memo_stats["hits"]
+    )
+    store = _result_store.stats()
+    yield "result_store_hits_total", "counter", "Reports served from the persistent result store.", store.get("hits", 0)
+    yield "result_store_errors_total", "counter", "Persistent result store read/write failures.", store.get("errors", 0)
+    yield "jobs_running", "gauge", "Background report jobs still polling.", _running_jobs()
+    yield "log_records_dropped_total", "counter", "Log records dropped because the queue was full.", _log_queue_handler.dropped
+
+
+_metrics.collector(_collect_state)
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """Prometheus text exposition of latency histograms and cache/coalescing counters."""
+    return text(_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/health")
 async def health(request: Request):
-    return json_response({"status": "ok", "service": "ab_proxy"})
+    return json_response({
+        "status": "ok",
+        "service": "ab_proxy",
+        "cache": _response_cache.stats(),
+        "coalescing": _coalesce_snapshot(),
+        "http": _http_stats_snapshot(),
+        "bucket_mapping": _bucket_mapping.stats(),
+        "logging": _log_stats(),
+        "template_group_memo": _template_group_memo_snapshot(),
+        "result_store": _result_store.stats(),
+    })
+
+
+@app.get("/inflight")
+async def inflight(request: Request):
+    """Per-key waiter counts for requests currently coalesced onto one upstream run."""
+    return json_response(_coalesce_snapshot())
 
 
 @app.post("/cache/clear")
 async def clear_cache(request: Request):
-    """Clear in-memory response cache for debugging."""
-    size_before = len(_response_cache)
-    _response_cache.clear()
-    return json_response({"status": "ok", "cleared": size_before})
+    """Clear in-memory response cache for debugging (?store=1 also empties the persistent store)."""
+    clear_store = _is_truthy(request.args.get("store"))
+    if clear_store and not _is_authorized(request):
+        return json_response({"result": "Unauthorized"}, status=401)
+    size_before = _response_cache.clear()
+    resp = {"status": "ok", "cleared": size_before}
+    if clear_store:
+        resp["store_cleared"] = await asyncio.to_thread(_result_store.clear)
+    return json_response(resp)
+
+
+@app.post("/bucket_mapping/reload")
+async def reload_bucket_mapping(request: Request):
+    """Force a re-parse of Bucket_mapping.txt without waiting for the mtime check."""
+    count = _bucket_mapping.reload()
+    return json_response({"status": "ok", "aliases": count, "files": _bucket_mapping.stats()["files"]})
 
 
 if __name__ == "__main__":
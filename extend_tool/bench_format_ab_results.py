@@ -0,0 +1,95 @@
+"""
+Micro-benchmark for ab_proxy.format_ab_results.
+
+Builds a synthetic by-date x region x card_type x sort_type payload (the shape
+the AB summary API returns for split_by_date reports) and times formatting it.
+
+Usage:
+  python3 bench_format_ab_results.py                       # default sizes
+  python3 bench_format_ab_results.py --dates 30 --regions 8 --card-types 6 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ab_proxy  # noqa: E402
+
+METRICS = ["order_cnt", "gmv", "gmv_995", "ads_revenue_usd", "order_per_uu", "gmv_per_uu", "gmv_per_uu_995"]
+CONTROL = "31430;31438"
+TREATMENTS = ["31424", "31425"]
+
+
+def build_payload(n_dates: int, n_regions: int, n_card_types: int, n_sort_types: int, seed: int = 7):
+    rng = random.Random(seed)
+    dates = [(date(2026, 1, 1) + timedelta(days=i)).isoformat() for i in range(n_dates)]
+    regions = ["MY", "SG", "TH", "VN", "PH", "ID", "TW", "BR", "MX", "CO"][:n_regions]
+    regions += [f"R{i}" for i in range(len(regions), n_regions)]
+    card_types = ["allcard"] + [f"card_{i}" for i in range(1, n_card_types)]
+    sort_types = ["__ALL__"] + [f"sort_{i}" for i in range(1, n_sort_types)]
+    groups = [CONTROL] + CONTROL.split(";") + TREATMENTS
+
+    header = "||".join(["abtest_group", "abtest_region", "abtest_date", "card_type", "sort_type"] + METRICS)
+    body, relative, control_indexes = [], [], []
+    for d in dates:
+        for r in regions:
+            for ct in card_types:
+                for st in sort_types:
+                    for g in groups:
+                        if g == CONTROL:
+                            control_indexes.append(len(body))
+                        values = [f"{rng.uniform(10, 100000):.2f}" for _ in METRICS]
+                        body.append("||".join([g, r, d, ct, st] + values))
+                        rel = ["" for _ in METRICS] if g == CONTROL else [f"{rng.uniform(-2, 2):.4f}" for _ in METRICS]
+                        relative.append("||".join(["", "", "", "", ""] + rel))
+
+    result = {
+        "retcode": 0,
+        "data": {"header": header, "body": body, "relative": relative, "control_group_indexes": control_indexes},
+    }
+    request_body = {
+        "experiment_id": 6850,
+        "dates": [{"time_start": dates[0], "time_end": dates[-1]}],
+        "regions": regions,
+        "control": CONTROL,
+        "treatments": TREATMENTS,
+    }
+    return result, request_body
+
+
+def bench(result: dict, request_body: dict, repeat: int) -> tuple[list[float], str]:
+    timings = []
+    out = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = ab_proxy.format_ab_results(result, request_body, {}, 1)
+        timings.append(time.perf_counter() - start)
+    return timings, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark format_ab_results")
+    parser.add_argument("--dates", type=int, default=14)
+    parser.add_argument("--regions", type=int, default=6)
+    parser.add_argument("--card-types", type=int, default=5)
+    parser.add_argument("--sort-types", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    result, request_body = build_payload(args.dates, args.regions, args.card_types, args.sort_types)
+    rows = len(result["data"]["body"])
+    timings, out = bench(result, request_body, args.repeat)
+    print(f"rows={rows} repeat={args.repeat} output_lines={out.count(chr(10)) + 1}")
+    print(
+        f"min={min(timings) * 1000:.2f}ms median={statistics.median(timings) * 1000:.2f}ms "
+        f"per_row={min(timings) / rows * 1e6:.2f}us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,19 +6,43 @@
   python scripts/gateway-monitor.py --session      # 同时监控 session 对话内容
   python scripts/gateway-monitor.py --last 50      # 回放最近 50 条关键事件
   python scripts/gateway-monitor.py --last-session 20  # 回放最近 20 条对话记录
+  python scripts/gateway-monitor.py --since 2h --until 1h  # 回放某个时间段的关键事件
   python scripts/gateway-monitor.py --daemon       # 后台守护模式, 写入 gateway-readable.log
+  python scripts/gateway-monitor.py --poll         # 不用 inotify, 退回 0.3s 轮询
+  python scripts/gateway-monitor.py --stats --format csv --out stats.csv  # 汇总统计 (增量)
+  python scripts/gateway-monitor.py --bench --log sample.log  # 测试事件分类吞吐
 """
 
 import argparse
+import bisect
+import ctypes
+import ctypes.util
+import errno
 import json
+import math
+import mmap
 import os
 import re
+import selectors
+import struct
 import sys
 import time
 import glob
 import signal
+from collections import deque, namedtuple
 from datetime import datetime
 
+# 可选的快速 JSON 解码: orjson > simdjson > 标准库
+try:
+    import orjson
+    _fast_loads, JSON_BACKEND = orjson.loads, "orjson"
+except ImportError:
+    try:
+        import simdjson
+        _fast_loads, JSON_BACKEND = simdjson.loads, "simdjson"
+    except ImportError:
+        _fast_loads, JSON_BACKEND = json.loads, "json"
+
 SEATALK_META_RE = re.compile(
     r"^Conversation info \(untrusted metadata\):\s*```json\s*\{[^}]*\}\s*```\s*",
     re.DOTALL,
@@ -28,6 +52,7 @@ DEFAULT_LOG = os.path.expanduser("~/.openclaw/gateway.log")
 READABLE_LOG = os.path.expanduser("~/.openclaw/gateway-readable.log")
 SESSIONS_DIR = os.path.expanduser("~/.openclaw/agents/main/sessions")
 MONITOR_PID = os.path.expanduser("~/.openclaw/gateway-monitor.pid")
+STATS_CHECKPOINT = os.path.expanduser("~/.openclaw/gateway-monitor.stats.json")
 
 ANSI_RE = re.compile(r"\033\[[0-9;]*m")
 
@@ -80,115 +105,216 @@ def _strip_meta(text):
 # Gateway log parser
 # ---------------------------------------------------------------------------
 
-def parse_gw(raw):
-    raw = raw.strip()
-    if not raw: return None
+def _loads(raw):
+    """解码一行 JSON (bytes 或 str); 失败返回 None.
+
+    快速后端拒收的行 (非法 UTF-8, NaN, 超大整数等) 再交给标准库, 结果与原先一致.
+    """
     try:
-        obj = json.loads(raw)
-    except json.JSONDecodeError:
+        return _fast_loads(raw)
+    except ValueError:
+        pass
+    try:
+        return json.loads(raw.decode("utf-8", errors="replace") if isinstance(raw, bytes) else raw)
+    except ValueError:
         return None
-    ts = obj.get("time") or obj.get("_meta", {}).get("date", "")
+
+
+def _gw_ts(obj):
+    return obj.get("time") or obj.get("_meta", {}).get("date", "")
+
+
+def _gw_msg(obj):
     msg = obj.get("1", "")
-    if not isinstance(msg, str):
-        msg = str(msg)
-    sub = ""
+    return msg if isinstance(msg, str) else str(msg)
+
+
+def _gw_sub(obj):
+    """嵌套在 "0" 字段里的 subsystem; "0" 通常是又一层 JSON 字符串"""
     try:
         s0 = obj.get("0", "{}")
         if isinstance(s0, str):
-            sub = json.loads(s0).get("subsystem", "")
-        elif isinstance(s0, dict):
-            sub = s0.get("subsystem", "")
+            return _fast_loads(s0).get("subsystem", "")
+        if isinstance(s0, dict):
+            return s0.get("subsystem", "")
     except Exception:
         pass
-    return ts, sub, msg
+    return ""
 
 
-def fmt_gw(ts, sub, msg):
-    t = _ts(ts)
-
-    if "SeaTalk webhook event_type=message_from_bot_subscriber" in msg:
-        return f"{_c(CY)}{t}{_c(R)} {_c(GR)}>>> 收到私聊消息{_c(R)} {_c(DIM)}(SeaTalk){_c(R)}"
-    if "SeaTalk webhook event_type=new_mentioned_message_received_from_group_chat" in msg:
-        return f"{_c(CY)}{t}{_c(R)} {_c(GR)}>>> 收到群聊@消息{_c(R)} {_c(DIM)}(SeaTalk){_c(R)}"
-    if "chat.send" in msg and "req" in msg[:20]:
-        return f"{_c(CY)}{t}{_c(R)} {_c(GR)}>>> 收到对话请求{_c(R)} {_c(DIM)}(WebChat){_c(R)}"
-    if "prompt.send" in msg and "req" in msg[:20]:
-        return f"{_c(CY)}{t}{_c(R)} {_c(GR)}>>> 收到 prompt 请求{_c(R)} {_c(DIM)}(HTTP){_c(R)}"
-
-    m = re.search(r"embedded run start: runId=(\S+) sessionId=(\S+) provider=(\S+) model=(\S+).*messageChannel=(\S+)", msg)
-    if m:
-        rid, _, prov, model, ch = m.groups()
-        return f"{_c(CY)}{t}{_c(R)} {_c(YL)}[开始处理]{_c(R)}  run={_c(B)}{_sid(rid)}{_c(R)}  模型={_c(MG)}{prov}/{model}{_c(R)}  来源={ch}"
+def parse_gw(raw):
+    raw = raw.strip()
+    if not raw: return None
+    obj = _loads(raw)
+    if not isinstance(obj, dict):
+        return None
+    return _gw_ts(obj), _gw_sub(obj), _gw_msg(obj)
 
-    m = re.search(r"embedded run prompt start: runId=(\S+)", msg)
-    if m:
-        return f"{_c(CY)}{t}{_c(R)} {_c(BL)}[调用模型]{_c(R)}  run={_sid(m.group(1))}  思考中..."
 
-    m = re.search(r"embedded run prompt end: runId=(\S+) sessionId=\S+ durationMs=(\d+)", msg)
-    if m:
-        return f"{_c(CY)}{t}{_c(R)} {_c(BL)}[模型返回]{_c(R)}  run={_sid(m.group(1))}  耗时={_dur(m.group(2))}"
+# ---------------------------------------------------------------------------
+# Gateway event rules
+# ---------------------------------------------------------------------------
+# 每条规则: key 为必须出现的子串 (预筛), pattern 为可选的提取正则, when 为可选条件,
+# fmt 为输出模板 (None 表示命中后丢弃该行), conv 为字段转换.
+# 规则按顺序匹配, 第一条 key/pattern/when 都满足的规则决定结果; when 不满足时继续往下.
+# 模板里可用: 颜色名 ({CY} {R} ...), {t} 时间, {msg} 原文, {sub} subsystem, 以及 pattern 的命名分组.
+# {sub} 需要再解一层 JSON, 只有用到它的规则命中时才解.
+# 新增事件只需往 GW_RULES 里加一行.
+
+GwRule = namedtuple("GwRule", "key fmt pattern when conv nocase", defaults=(None, None, None, False))
+
+_REQ = lambda m: "req" in m.string[:20]
+
+GW_RULES = [
+    GwRule("SeaTalk webhook event_type=message_from_bot_subscriber",
+           "{CY}{t}{R} {GR}>>> 收到私聊消息{R} {DIM}(SeaTalk){R}"),
+    GwRule("SeaTalk webhook event_type=new_mentioned_message_received_from_group_chat",
+           "{CY}{t}{R} {GR}>>> 收到群聊@消息{R} {DIM}(SeaTalk){R}"),
+    GwRule("chat.send", "{CY}{t}{R} {GR}>>> 收到对话请求{R} {DIM}(WebChat){R}", when=_REQ),
+    GwRule("prompt.send", "{CY}{t}{R} {GR}>>> 收到 prompt 请求{R} {DIM}(HTTP){R}", when=_REQ),
+    GwRule("embedded run start:",
+           "{CY}{t}{R} {YL}[开始处理]{R}  run={B}{rid}{R}  模型={MG}{prov}/{model}{R}  来源={ch}",
+           r"embedded run start: runId=(?P<rid>\S+) sessionId=\S+ provider=(?P<prov>\S+) model=(?P<model>\S+).*messageChannel=(?P<ch>\S+)",
+           conv={"rid": _sid}),
+    GwRule("embedded run prompt start:",
+           "{CY}{t}{R} {BL}[调用模型]{R}  run={rid}  思考中...",
+           r"embedded run prompt start: runId=(?P<rid>\S+)", conv={"rid": _sid}),
+    GwRule("embedded run prompt end:",
+           "{CY}{t}{R} {BL}[模型返回]{R}  run={rid}  耗时={dur}",
+           r"embedded run prompt end: runId=(?P<rid>\S+) sessionId=\S+ durationMs=(?P<dur>\d+)",
+           conv={"rid": _sid, "dur": _dur}),
+    GwRule("embedded run done:",
+           "{CY}{t}{R} {RD}[已中止]{R}  run={rid}  总耗时={B}{dur}{R}",
+           r"embedded run done: runId=(?P<rid>\S+) sessionId=\S+ durationMs=(?P<dur>\d+) aborted=(?P<ab>\S+)",
+           when=lambda m: m.group("ab") == "true", conv={"rid": _sid, "dur": _dur}),
+    GwRule("embedded run done:",
+           "{CY}{t}{R} {GR}[完成]{R}  run={rid}  总耗时={B}{dur}{R}",
+           r"embedded run done: runId=(?P<rid>\S+) sessionId=\S+ durationMs=(?P<dur>\d+) aborted=\S+",
+           conv={"rid": _sid, "dur": _dur}),
+    GwRule("tool=start:",
+           "{CY}{t}{R} {YL}  [工具]{R} {B}{tool}{R}  开始执行",
+           r"stream=tool aseq=\d+ tool=start:(?P<tool>\S+) call=\S+"),
+    GwRule("tool=result:",
+           "{CY}{t}{R} {RD}  [工具] {tool} 失败{R}  {DIM}{meta}{R}",
+           r"stream=tool aseq=\d+ tool=result:(?P<tool>\S+) call=\S+\s*(?:meta=(?P<meta>.+?))?(?:\s+err=(?P<err>\S+))?$",
+           when=lambda m: m.group("err") not in (None, "", "false"), conv={"meta": lambda s: _tr(s or "", 80)}),
+    GwRule("tool=result:",
+           "{CY}{t}{R} {DIM}  [工具] {tool} 完成  {meta}{R}",
+           r"stream=tool aseq=\d+ tool=result:(?P<tool>\S+) call=\S+\s*(?:meta=(?P<meta>.+?))?(?:\s+err=\S+)?$",
+           conv={"meta": lambda s: _tr(s or "", 80)}),
+    GwRule("embedded run tool end", None),
+    GwRule("stream=assistant aseq=",
+           "{CY}{t}{R} {WH}[回复]{R}  {DIM}{text}{R}",
+           r"stream=assistant aseq=(?P<aseq>\d+) text=(?P<text>.+)",
+           when=lambda m: int(m.group("aseq")) <= 2, conv={"text": lambda s: _tr(s, 100)}),
+    GwRule("stream=assistant aseq=", None, r"stream=assistant aseq=\d+ text=."),
+    GwRule("session state:",
+           "{CY}{t}{R} {DIM}[会话] idle -> processing ({reason}){R}",
+           r"session state:.*prev=\S+ new=(?P<new>\S+) reason=\"?(?P<reason>[^\"]+)\"?",
+           when=lambda m: m.group("new") == "processing"),
+    GwRule("session state:",
+           "{CY}{t}{R} {DIM}[会话] processing -> idle ({reason}){R}",
+           r"session state:.*prev=\S+ new=(?P<new>\S+) reason=\"?(?P<reason>[^\"]+)\"?",
+           when=lambda m: m.group("new") == "idle"),
+    GwRule("session state:", None, r"session state:.*prev=\S+ new=\S+ reason=\"?[^\"]"),
+    GwRule("embedded run timeout:",
+           "{CY}{t}{R} {RD}[超时!]{R} run={rid} timeout={ms}",
+           r"embedded run timeout: runId=(?P<rid>\S+).*timeoutMs=(?P<ms>\d+)",
+           conv={"rid": _sid, "ms": _dur}),
+    GwRule("compaction start", "{CY}{t}{R} {DIM}[压缩] 上下文压缩中...{R}"),
+    GwRule("compaction retry", "{CY}{t}{R} {YL}[压缩] 重试{R}"),
+    GwRule("Tracking pending messaging text:",
+           "{CY}{t}{R} {DIM}[发送] {tool} ({n}字){R}",
+           r"Tracking pending messaging text: tool=(?P<tool>\S+) len=(?P<n>\d+)"),
+    GwRule("lane task done:",
+           "{CY}{t}{R} {DIM}[lane] 完成 耗时={dur}{R}",
+           r"lane task done: lane=main durationMs=(?P<dur>\d+)", conv={"dur": _dur}),
+    GwRule("lane enqueue",
+           "{CY}{t}{R} {YL}[排队] 深度={q}{R}",
+           r"lane enqueue.*queued=(?P<q>\d+)", when=lambda m: int(m.group("q")) > 0),
+    GwRule("error",
+           "{CY}{t}{R} {RD}[错误] {msg}{R}",
+           when=lambda m: "no_active_run" not in m.string, conv={"msg": lambda s: _tr(s, 120)},
+           nocase=True),
+]
+
+_COLORS = dict(R=R, DIM=DIM, B=B, CY=CY, GR=GR, YL=YL, RD=RD, MG=MG, BL=BL, WH=WH)
+_NO_COLORS = dict.fromkeys(_COLORS, "")
+# 没有提取正则的规则用它包一层, 让 when/模板统一拿到 match 对象
+_WHOLE_RE = re.compile(r".*", re.DOTALL)
+
+
+def compile_gw_rules(rules):
+    """把规则表编译成 (预筛正则, [(key, nocase, 编译后的 pattern, rule)])
+
+    预筛是所有 key 的单个交替正则: 绝大多数日志行一次 search 就能判定不相关,
+    命中后才按顺序逐条做子串检查与提取.
+    """
+    alts = []
+    for k in dict.fromkeys((r.key, r.nocase) for r in rules):
+        alts.append(f"(?i:{re.escape(k[0])})" if k[1] else re.escape(k[0]))
+    compiled = [(r.key.lower() if r.nocase else r.key, r.nocase,
+                 re.compile(r.pattern) if r.pattern else _WHOLE_RE, r)
+                for r in rules]
+    return re.compile("|".join(alts)), compiled
+
+
+GW_PREFILTER, GW_COMPILED = compile_gw_rules(GW_RULES)
+
+
+def classify_gw(msg):
+    """返回命中的规则与 match; 没有规则命中时返回 (None, None)"""
+    if not GW_PREFILTER.search(msg):
+        return None, None
+    low = None
+    for key, nocase, rx, rule in GW_COMPILED:
+        if nocase:
+            if low is None: low = msg.lower()
+            if key not in low: continue
+        elif key not in msg:
+            continue
+        m = rx.search(msg)
+        if m and (rule.when is None or rule.when(m)):
+            return rule, m
+    return None, None
+
+
+def _render(rule, m, ts, sub, msg):
+    fields = m.groupdict()
+    fields["msg"] = msg
+    fields["sub"] = sub
+    for name, fn in (rule.conv or {}).items():
+        fields[name] = fn(fields[name])
+    return rule.fmt.format(t=_ts(ts), **(_COLORS if _use_color else _NO_COLORS), **fields)
 
-    m = re.search(r"embedded run done: runId=(\S+) sessionId=\S+ durationMs=(\d+) aborted=(\S+)", msg)
-    if m:
-        rid, dur, ab = m.group(1), m.group(2), m.group(3)
-        if ab == "true":
-            return f"{_c(CY)}{t}{_c(R)} {_c(RD)}[已中止]{_c(R)}  run={_sid(rid)}  总耗时={_c(B)}{_dur(dur)}{_c(R)}"
-        return f"{_c(CY)}{t}{_c(R)} {_c(GR)}[完成]{_c(R)}  run={_sid(rid)}  总耗时={_c(B)}{_dur(dur)}{_c(R)}"
 
-    m = re.search(r"stream=tool aseq=\d+ tool=start:(\S+) call=(\S+)", msg)
-    if m:
-        return f"{_c(CY)}{t}{_c(R)} {_c(YL)}  [工具]{_c(R)} {_c(B)}{m.group(1)}{_c(R)}  开始执行"
+def fmt_gw(ts, sub, msg):
+    rule, m = classify_gw(msg)
+    if rule is None or rule.fmt is None:
+        return None
+    return _render(rule, m, ts, sub, msg)
 
-    m = re.search(r"stream=tool aseq=\d+ tool=result:(\S+) call=\S+\s*(?:meta=(.+?))?(?:\s+err=(\S+))?$", msg)
-    if m:
-        tool, meta, err = m.group(1), m.group(2) or "", m.group(3)
-        if err and err != "false":
-            return f"{_c(CY)}{t}{_c(R)} {_c(RD)}  [工具] {tool} 失败{_c(R)}  {_c(DIM)}{_tr(meta,80)}{_c(R)}"
-        return f"{_c(CY)}{t}{_c(R)} {_c(DIM)}  [工具] {tool} 完成  {_tr(meta,80)}{_c(R)}"
 
-    if "embedded run tool end" in msg:
-        return None
+def format_gw_line(raw):
+    """一行原始 gateway.log (bytes 或 str) -> 输出文本, 不相关的行返回 None.
 
-    m = re.search(r"stream=assistant aseq=(\d+) text=(.+)", msg)
-    if m:
-        aseq = int(m.group(1))
-        if aseq <= 2:
-            return f"{_c(CY)}{t}{_c(R)} {_c(WH)}[回复]{_c(R)}  {_c(DIM)}{_tr(m.group(2), 100)}{_c(R)}"
+    等价于 parse_gw + fmt_gw, 但只解外层 JSON 并在 msg 上分类; 嵌套的 subsystem
+    (又一层 JSON 字符串) 只在命中规则的模板用到 {sub} 时才解, 无关行不再为它付钱.
+    """
+    try:
+        obj = _fast_loads(raw)
+    except ValueError:
+        obj = _loads(raw)
+    if obj.__class__ is not dict:
         return None
-
-    m = re.search(r"session state:.*prev=(\S+) new=(\S+) reason=\"?([^\"]+)\"?", msg)
-    if m:
-        prev, new, reason = m.groups()
-        if new == "processing":
-            return f"{_c(CY)}{t}{_c(R)} {_c(DIM)}[会话] idle -> processing ({reason}){_c(R)}"
-        if new == "idle":
-            return f"{_c(CY)}{t}{_c(R)} {_c(DIM)}[会话] processing -> idle ({reason}){_c(R)}"
+    msg = obj.get("1", "")
+    if msg.__class__ is not str:
+        msg = str(msg)
+    rule, m = classify_gw(msg)
+    if rule is None or rule.fmt is None:
         return None
-
-    m = re.search(r"embedded run timeout: runId=(\S+).*timeoutMs=(\d+)", msg)
-    if m:
-        return f"{_c(CY)}{t}{_c(R)} {_c(RD)}[超时!]{_c(R)} run={_sid(m.group(1))} timeout={_dur(m.group(2))}"
-
-    if "compaction start" in msg:
-        return f"{_c(CY)}{t}{_c(R)} {_c(DIM)}[压缩] 上下文压缩中...{_c(R)}"
-    if "compaction retry" in msg:
-        return f"{_c(CY)}{t}{_c(R)} {_c(YL)}[压缩] 重试{_c(R)}"
-
-    m = re.search(r"Tracking pending messaging text: tool=(\S+) len=(\d+)", msg)
-    if m:
-        return f"{_c(CY)}{t}{_c(R)} {_c(DIM)}[发送] {m.group(1)} ({m.group(2)}字){_c(R)}"
-
-    m = re.search(r"lane task done: lane=main durationMs=(\d+)", msg)
-    if m:
-        return f"{_c(CY)}{t}{_c(R)} {_c(DIM)}[lane] 完成 耗时={_dur(m.group(1))}{_c(R)}"
-    m = re.search(r"lane enqueue.*queued=(\d+)", msg)
-    if m and int(m.group(1)) > 0:
-        return f"{_c(CY)}{t}{_c(R)} {_c(YL)}[排队] 深度={m.group(1)}{_c(R)}"
-
-    if "error" in msg.lower() and "no_active_run" not in msg:
-        return f"{_c(CY)}{t}{_c(R)} {_c(RD)}[错误] {_tr(msg,120)}{_c(R)}"
-
-    return None
+    sub = _gw_sub(obj) if "{sub}" in rule.fmt else ""
+    return _render(rule, m, _gw_ts(obj), sub, msg)
 
 # ---------------------------------------------------------------------------
 # Session JSONL parser
@@ -275,93 +401,545 @@ def emit(line):
 # Replay / Tail
 # ---------------------------------------------------------------------------
 
-def replay_gw(path, n):
-    events = []
-    with open(path, "r", encoding="utf-8", errors="replace") as f:
-        for raw in f:
-            p = parse_gw(raw)
-            if not p: continue
-            out = fmt_gw(*p)
-            if out: events.append(out)
-    for ev in events[-n:]:
-        emit(ev)
+# 时间字段: gateway.log 为 "time" (或 _meta.date), session JSONL 为 "timestamp"
+TS_BYTES_RE = re.compile(rb'"(?:time|date|timestamp)"\s*:\s*"([^"]+)"')
+# 旁路索引每隔多少字节记一个 (时间, 行首偏移) 点
+INDEX_STEP = 1 << 20
+INDEX_SUFFIX = ".idx"
+
+
+def _epoch(iso):
+    try:
+        return datetime.fromisoformat(iso.replace("Z", "+00:00")).timestamp()
+    except (ValueError, AttributeError):
+        return None
+
+
+def _line_epoch(line):
+    m = TS_BYTES_RE.search(line)
+    return _epoch(m.group(1).decode("ascii", "replace")) if m else None
+
+
+def time_spec(s):
+    """--since/--until: 相对时间 (30m / 2h / 1d), 当天 HH:MM[:SS], 或 ISO 时间"""
+    s = s.strip()
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", s)
+    if m:
+        return time.time() - float(m.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[m.group(2)]
+    if re.fullmatch(r"\d{1,2}:\d{2}(:\d{2})?", s):
+        s = f"{datetime.now().date().isoformat()}T{s}"
+    ts = _epoch(s)
+    if ts is None:
+        raise argparse.ArgumentTypeError(f"无法解析的时间: {s}")
+    return ts
+
+
+def _open_mmap(path):
+    """只读 mmap; 空文件返回 (None, None)"""
+    f = open(path, "rb")
+    try:
+        if os.fstat(f.fileno()).st_size == 0:
+            f.close()
+            return None, None
+        return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception:
+        f.close()
+        raise
+
+
+def _lines_backward(mm, end):
+    """从 end 往文件头逐行产出 (行首偏移, 行内容); 只触碰实际读到的页"""
+    pos = end
+    while pos > 0:
+        stop = pos - 1 if mm[pos - 1:pos] == b"\n" else pos
+        start = mm.rfind(b"\n", 0, stop) + 1
+        yield start, mm[start:stop]
+        pos = start
+
+
+def _lines_forward(mm, start, end=None):
+    end = len(mm) if end is None else end
+    pos = start
+    while pos < end:
+        nl = mm.find(b"\n", pos, end)
+        if nl < 0:
+            nl = end
+        yield pos, mm[pos:nl]
+        pos = nl + 1
+
+
+def _line_start(mm, pos):
+    """pos 所在行的下一行行首 (pos 本身是行首时不动)"""
+    if pos <= 0:
+        return 0
+    nl = mm.find(b"\n", pos - 1)
+    return len(mm) if nl < 0 else nl + 1
+
+
+def _first_epoch(mm, start, end, max_lines=64):
+    for _off, line in _lines_forward(mm, start, end):
+        ts = _line_epoch(line)
+        if ts is not None:
+            return ts
+        max_lines -= 1
+        if max_lines <= 0:
+            break
+    return None
 
 
-def replay_session(n):
+def _bisect_offset(mm, target, lo=0, hi=None):
+    """二分定位: 返回一个行首偏移, 之前的行时间都早于 target (日志按时间追加)"""
+    hi = len(mm) if hi is None else hi
+    while hi - lo > 64 * 1024:
+        mid = _line_start(mm, (lo + hi) // 2)
+        if mid >= hi:
+            break
+        ts = _first_epoch(mm, mid, hi)
+        if ts is None or ts >= target:
+            hi = mid
+        else:
+            lo = mid
+    return _line_start(mm, lo)
+
+
+class OffsetIndex:
+    """gateway.log 的旁路索引 (<log>.idx): 每隔 INDEX_STEP 字节记一个 (时间, 行首偏移).
+
+    每次使用前增量补齐新追加的部分; 文件被轮转 (inode 变化), 截断, 或被截断后又写回
+    比原来还长 (copytruncate, 首尾索引点对不上) 时重建.
+    索引只用来缩小二分范围, 写不进去 (只读目录等) 时照样可用.
+    """
+
+    def __init__(self, log_path):
+        self.path = log_path + INDEX_SUFFIX
+        self.entries = []    # [(epoch, offset)], 按偏移递增
+        self._times = []
+        self._meta = {}
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._meta = json.loads(f.readline())
+                self.entries = [(float(a), int(b)) for a, b in (ln.split() for ln in f if ln.strip())]
+        except (OSError, ValueError):
+            self._meta, self.entries = {}, []
+
+    def _save(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self._meta) + "\n")
+                f.writelines(f"{ts:.3f} {off}\n" for ts, off in self.entries)
+            os.replace(tmp, self.path)
+        except OSError:
+            try: os.remove(tmp)
+            except OSError: pass
+
+    def _matches(self, mm):
+        """首尾两个索引点是否仍是同样时间的行首; 文件被重写过就对不上"""
+        for ts, off in self.entries[:1] + self.entries[-1:]:
+            if off >= len(mm) or (off and mm[off - 1:off] != b"\n"):
+                return False
+            cur = _first_epoch(mm, off, len(mm))
+            if cur is None or abs(cur - ts) > 1e-3:
+                return False
+        return True
+
+    def update(self, mm, st):
+        self._load()
+        ident = [st.st_dev, st.st_ino]
+        if (self._meta.get("file") != ident or self._meta.get("size", 0) > len(mm)
+                or not self._matches(mm)):
+            self._meta, self.entries = {"file": ident, "size": 0, "next": 0}, []
+        pos = self._meta.get("next", 0)
+        if pos < len(mm):
+            while pos < len(mm):
+                start = _line_start(mm, pos)
+                if start >= len(mm):
+                    break
+                ts = _first_epoch(mm, start, len(mm))
+                if ts is not None:
+                    self.entries.append((ts, start))
+                pos = start + INDEX_STEP
+            self._meta["next"] = pos
+            self._meta["size"] = len(mm)
+            self._save()
+        self._times = [ts for ts, _off in self.entries]
+
+    def narrow(self, target, size):
+        """target 所在的 [lo, hi) 字节区间, 供 _bisect_offset 在其中二分"""
+        k = bisect.bisect_left(self._times, target)
+        lo = self.entries[k - 1][1] if k > 0 else 0
+        hi = self.entries[k][1] if k < len(self.entries) else size
+        return lo, hi
+
+
+def _locate(mm, target, index):
+    lo, hi = index.narrow(target, len(mm)) if index else (0, len(mm))
+    return _bisect_offset(mm, target, lo, hi)
+
+
+def _end_offset(mm, until, index):
+    """第一条时间晚于 until 的行首偏移 (二分只给下界, 再往后顺序补齐)"""
+    for off, line in _lines_forward(mm, _locate(mm, until, index)):
+        ts = _line_epoch(line)
+        if ts is not None and ts > until:
+            return off
+    return len(mm)
+
+
+def replay_gw(path, n, since=None, until=None, use_index=False):
+    """回放 gateway 关键事件.
+
+    无 --since 时从文件尾 (或 --until 处) 倒着读, 凑够 n 条即停;
+    有 --since 时先二分 (可借助旁路索引) 定位起点, 再顺序读到 --until.
+    """
+    f, mm = _open_mmap(path)
+    if mm is None:
+        return
+    try:
+        index = None
+        if use_index and (since is not None or until is not None):
+            index = OffsetIndex(path)
+            index.update(mm, os.fstat(f.fileno()))
+
+        if since is not None:
+            events = deque(maxlen=n or None)
+            for _off, line in _lines_forward(mm, _locate(mm, since, index)):
+                ts = _line_epoch(line)
+                if ts is not None:
+                    if ts < since:
+                        continue
+                    if until is not None and ts > until:
+                        break
+                out = format_gw_line(line)
+                if out: events.append(out)
+        else:
+            end = len(mm) if until is None else _end_offset(mm, until, index)
+            events = []
+            for _off, line in _lines_backward(mm, end):
+                out = format_gw_line(line)
+                if out:
+                    events.append(out)
+                    if len(events) >= n:
+                        break
+            events.reverse()
+        for ev in events:
+            emit(ev)
+    finally:
+        mm.close()
+        f.close()
+
+
+def replay_session(n, since=None, until=None):
     sf = get_latest_session()
     if not sf:
         print("No session files found.", file=sys.stderr)
         return
     emit(f"Session: {os.path.basename(sf)}")
     emit("-" * 60)
+    f, mm = _open_mmap(sf)
+    if mm is None:
+        return
     events = []
-    with open(sf, "r", encoding="utf-8", errors="replace") as f:
-        for line in f:
+    try:
+        for _off, line in _lines_backward(mm, len(mm)):
             line = line.strip()
             if not line: continue
-            try:
-                obj = json.loads(line)
-                if obj.get("type") == "message":
-                    out = fmt_session(obj)
-                    if out: events.append(out)
-            except json.JSONDecodeError:
-                pass
-    for ev in events[-n:]:
+            obj = _loads(line)  # mmap 给的是 bytes, 非法 UTF-8 按 replace 解, 与原先按文本读一致
+            if not isinstance(obj, dict) or obj.get("type") != "message":
+                continue
+            if since is not None or until is not None:
+                ts = _epoch(obj.get("timestamp", ""))
+                if ts is not None:
+                    if until is not None and ts > until:
+                        continue
+                    if since is not None and ts < since:
+                        break
+            out = fmt_session(obj)
+            if out:
+                events.append(out)
+                if n and len(events) >= n:
+                    break
+    finally:
+        mm.close()
+        f.close()
+    for ev in reversed(events):
         emit(ev)
 
 
-def tail_loop(log_path, watch_session):
-    emit(f"OpenClaw Gateway 实时监控  日志={log_path}")
+# ---------------------------------------------------------------------------
+# File watching: inotify (Linux) / polling fallback
+# ---------------------------------------------------------------------------
+
+POLL_INTERVAL = 0.3
+# inotify 模式下无事件时的兜底检查间隔 (网络文件系统等可能收不到事件)
+IDLE_CHECK = 5.0
+
+
+class InotifyWatcher:
+    """通过 ctypes 调用 inotify, 监听目录内文件的写入/创建/移动/删除.
+
+    wait() 返回发生变化的文件路径列表 (按事件顺序去重); 超时返回 [];
+    事件队列溢出时返回 None, 调用方应做一次全量检查.
+    """
+
+    IN_MODIFY = 0x002
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = (IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            | IN_DELETE_SELF | IN_MOVE_SELF)
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._fd = fd
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(fd, selectors.EVENT_READ)
+        self._dirs = {}        # wd -> 目录
+        self._pending = []     # 尚不存在 / 被删除的目录, 每次 wait 时重试
+
+    def watch_dir(self, path):
+        path = os.path.abspath(path)
+        wd = self._add_watch(self._fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            if path not in self._pending:
+                self._pending.append(path)
+            return False
+        self._dirs[wd] = path
+        return True
+
+    def wait(self, timeout):
+        if self._pending:
+            # 目录出现之前建的文件收不到事件: 补上监听后让调用方全量检查一次
+            for path in self._pending[:]:
+                self._pending.remove(path)
+                if self.watch_dir(path):
+                    return None
+            timeout = min(timeout, 1.0)
+        if not self._sel.select(timeout):
+            return []
+        changed = {}
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            off = 0
+            while off + self._EVENT.size <= len(data):
+                wd, mask, _cookie, ln = self._EVENT.unpack_from(data, off)
+                name = data[off + self._EVENT.size:off + self._EVENT.size + ln].rstrip(b"\0")
+                off += self._EVENT.size + ln
+                if mask & self.IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                d = self._dirs.get(wd)
+                if d is None:
+                    continue
+                if mask & self.IN_IGNORED:
+                    # 目录被删除/移走: 等它重新出现
+                    del self._dirs[wd]
+                    self._pending.append(d)
+                    continue
+                if name:
+                    changed[os.path.join(d, os.fsdecode(name))] = None
+            if len(data) < 64 * 1024:
+                break
+        return None if overflow else list(changed)
+
+    def close(self):
+        self._sel.close()
+        os.close(self._fd)
+
+
+class PollWatcher:
+    """inotify 不可用时的回退: 固定间隔唤醒, 每次都做全量检查."""
+
+    def watch_dir(self, path):
+        return True
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, POLL_INTERVAL))
+        return None
+
+    def close(self):
+        pass
+
+
+def make_watcher(use_inotify=True):
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollWatcher()
+
+
+class FileTail:
+    """按行增量读取一个文件.
+
+    - 只返回完整的行, 写了一半的行留到下次;
+    - inode 变化视为日志轮转: 读完旧文件剩余内容后切到新文件从头读;
+    - 截断 (copytruncate) 在读之前检查: 文件比上次读到的位置短, 或者上次读到的
+      最后 SIG_LEN 字节已经变了 (截断后马上写入了更长的内容), 都回到开头重新读.
+    """
+
+    SIG_LEN = 64
+
+    def __init__(self, path, from_end=True, decode=True):
+        self.path = path
+        self._decode = decode
+        self._f = None
+        self._id = None
+        self._buf = b""
+        self._sig = b""      # 上次读到位置之前的最后几个字节
+        self._open(from_end)
+
+    def _open(self, from_end):
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            self._f = None
+            return
+        st = os.fstat(f.fileno())
+        self._id = (st.st_dev, st.st_ino)
+        self._sig = b""
+        if from_end:
+            end = f.seek(0, 2)
+            f.seek(max(0, end - self.SIG_LEN))
+            self._sig = f.read(end - f.tell())
+        self._f = f
+        self._buf = b""
+
+    def _drain(self):
+        data = self._f.read()
+        if not data:
+            return []
+        self._sig = (self._sig + data)[-self.SIG_LEN:]
+        parts = (self._buf + data).split(b"\n")
+        self._buf = parts.pop()
+        if not self._decode:
+            return parts
+        return [p.decode("utf-8", errors="replace") for p in parts]
+
+    def _truncated(self, size):
+        pos = self._f.tell()
+        if size < pos:
+            return True
+        if not self._sig:
+            return False
+        self._f.seek(pos - len(self._sig))
+        same = self._f.read(len(self._sig)) == self._sig
+        self._f.seek(pos)
+        return not same
+
+    def read_lines(self):
+        if self._f is None:
+            self._open(from_end=False)
+            if self._f is None:
+                return []
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return self._drain()  # 轮转过程中新文件还没建出来, 先读完旧文件, 下次再看
+        if (st.st_dev, st.st_ino) != self._id:
+            lines = self._drain()
+            self._f.close()
+            self._open(from_end=False)
+            if self._f is not None:
+                lines += self._drain()
+            return lines
+        if self._truncated(st.st_size):
+            self._f.seek(0)
+            self._buf = b""
+            self._sig = b""
+        return self._drain()
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def _emit_session_line(sl):
+    sl = sl.strip()
+    if not sl: return
+    try:
+        obj = json.loads(sl)
+        if obj.get("type") == "message":
+            out = fmt_session(obj)
+            if out: emit(out)
+    except json.JSONDecodeError:
+        pass
+
+
+def _newest_session_event(changed):
+    """事件里最后一个被写入/创建的 session 文件 (不再 glob 整个目录)"""
+    sessions_dir = os.path.abspath(SESSIONS_DIR)
+    for path in reversed(changed):
+        if path.endswith(".jsonl") and os.path.dirname(path) == sessions_dir and os.path.exists(path):
+            return path
+    return None
+
+
+def tail_loop(log_path, watch_session, use_inotify=True):
+    watcher = make_watcher(use_inotify)
+    mode = "inotify" if isinstance(watcher, InotifyWatcher) else "poll"
+    emit(f"OpenClaw Gateway 实时监控  日志={log_path}  ({mode})")
     emit("-" * 60)
 
-    sf = None
-    spos = 0
+    gw = FileTail(log_path, from_end=True, decode=False)
+    watcher.watch_dir(os.path.dirname(os.path.abspath(log_path)))
+
+    session = None
     if watch_session:
         sf = get_latest_session()
         if sf:
-            spos = os.path.getsize(sf)
+            session = FileTail(sf, from_end=True)
+        watcher.watch_dir(SESSIONS_DIR)
 
-    with open(log_path, "r", encoding="utf-8", errors="replace") as f:
-        f.seek(0, 2)
+    try:
         while True:
-            line = f.readline()
-            if line:
-                p = parse_gw(line)
-                if p:
-                    out = fmt_gw(*p)
-                    if out: emit(out)
+            for line in gw.read_lines():
+                out = format_gw_line(line)
+                if out: emit(out)
 
+            if session is not None:
+                for sl in session.read_lines():
+                    _emit_session_line(sl)
+
+            changed = watcher.wait(IDLE_CHECK)
             if watch_session:
-                nsf = get_latest_session()
-                if nsf and nsf != sf:
-                    sf = nsf
-                    spos = 0
-                    emit(f"-- 新会话: {os.path.basename(sf)} --")
-                if sf:
-                    try:
-                        sz = os.path.getsize(sf)
-                    except OSError:
-                        sz = 0
-                    if sz > spos:
-                        with open(sf, "r", encoding="utf-8", errors="replace") as sfh:
-                            sfh.seek(spos)
-                            for sl in sfh:
-                                sl = sl.strip()
-                                if not sl: continue
-                                try:
-                                    obj = json.loads(sl)
-                                    if obj.get("type") == "message":
-                                        out = fmt_session(obj)
-                                        if out: emit(out)
-                                except json.JSONDecodeError:
-                                    pass
-                            spos = sfh.tell()
-
-            if not line:
-                time.sleep(0.3)
-
-
-def daemon_mode(log_path):
+                # 轮询 / 事件溢出时才扫描整个目录, 否则只看事件里的新文件
+                nsf = get_latest_session() if changed is None else _newest_session_event(changed)
+                if nsf and (session is None or os.path.abspath(nsf) != os.path.abspath(session.path)):
+                    if session is not None:
+                        session.close()
+                    session = FileTail(nsf, from_end=False)
+                    emit(f"-- 新会话: {os.path.basename(nsf)} --")
+    finally:
+        gw.close()
+        if session is not None:
+            session.close()
+        watcher.close()
+
+
+def daemon_mode(log_path, use_inotify=True):
     """后台守护: 不带颜色, 输出到 gateway-readable.log, 同时监控 session."""
     global _use_color, _output_file
     _use_color = False
@@ -384,13 +962,391 @@ def daemon_mode(log_path):
 
     _output_file = open(READABLE_LOG, "a", encoding="utf-8")
     try:
-        tail_loop(log_path, watch_session=True)
+        tail_loop(log_path, watch_session=True, use_inotify=use_inotify)
     finally:
         _output_file.close()
         try: os.remove(MONITOR_PID)
         except OSError: pass
 
 
+# ---------------------------------------------------------------------------
+# Session analytics (--stats)
+# ---------------------------------------------------------------------------
+# 每个文件各自维护一份可合并的聚合结果和读到的偏移, 存在 checkpoint 里;
+# 再次运行时只读新追加的完整行. 文件被轮转 (inode 变化) 或删除时, 它的结果
+# 并入 retired 保留; 同一文件变短 (被重写) 则丢弃旧结果从头扫.
+# 耗时分布不存原始样本, 存固定对数分桶的直方图 (按整数毫秒), 体积有上限且可直接相加,
+# 分位数取所在桶的上界, 相对误差不超过 HIST_GROWTH - 1.
+
+STATS_VERSION = 2
+STATS_CHUNK = 4 << 20
+STATS_SAVE_EVERY = 2.0   # 秒, 扫描过程中落盘 checkpoint 的间隔
+PENDING_RUNS_MAX = 10000
+HIST_GROWTH = 1.01
+_HIST_LOG = math.log(HIST_GROWTH)
+
+RUN_START_RE = re.compile(r"embedded run start: runId=(\S+) sessionId=\S+ provider=(\S+) model=(\S+)")
+RUN_PROMPT_END_RE = re.compile(r"embedded run prompt end: runId=\S+ sessionId=\S+ durationMs=(\d+)")
+RUN_DONE_RE = re.compile(r"embedded run done: runId=(\S+) sessionId=\S+ durationMs=(\d+) aborted=(\S+)")
+
+
+def _new_hist():
+    return {"count": 0, "sum": 0, "min": None, "max": None, "buckets": {}}
+
+
+def _hist_add(h, v):
+    """v 为非负整数 (毫秒); 桶 i 覆盖 (GROWTH**(i-1), GROWTH**i], 0 和 1 都落在桶 0"""
+    key = str(max(0, math.ceil(math.log(v) / _HIST_LOG))) if v > 0 else "0"
+    h["buckets"][key] = h["buckets"].get(key, 0) + 1
+    h["count"] += 1
+    h["sum"] += v
+    h["min"] = v if h["min"] is None else min(h["min"], v)
+    h["max"] = v if h["max"] is None else max(h["max"], v)
+
+
+def _merge_hist(dst, src):
+    for key, n in src["buckets"].items():
+        dst["buckets"][key] = dst["buckets"].get(key, 0) + n
+    dst["count"] += src["count"]
+    dst["sum"] += src["sum"]
+    for k, pick in (("min", min), ("max", max)):
+        if src[k] is not None:
+            dst[k] = src[k] if dst[k] is None else pick(dst[k], src[k])
+    return dst
+
+
+def _new_stats():
+    return {"models": {}, "tools": {}, "turn_latency": _new_hist(), "runs": {}, "prompt_ms": _new_hist(),
+            "messages": 0}
+
+
+def _merge_stats(dst, src):
+    for name, section in (("models", src["models"]), ("tools", src["tools"]), ("runs", src["runs"])):
+        d = dst[name]
+        for key, vals in section.items():
+            cur = d.setdefault(key, {})
+            for k, v in vals.items():
+                if isinstance(v, dict):
+                    _merge_hist(cur.setdefault(k, _new_hist()), v)
+                else:
+                    cur[k] = cur.get(k, 0) + v
+    _merge_hist(dst["turn_latency"], src["turn_latency"])
+    _merge_hist(dst["prompt_ms"], src["prompt_ms"])
+    dst["messages"] += src["messages"]
+    return dst
+
+
+def _session_record(agg, obj, carry):
+    msg = obj.get("message")
+    if obj.get("type") != "message" or not isinstance(msg, dict):
+        return
+    agg["messages"] += 1
+    role = msg.get("role", "")
+    ts = _epoch(obj.get("timestamp", ""))
+
+    if role == "user":
+        # 连续多条用户消息时, 从第一条开始算等待时间
+        if carry.get("pending") is None and ts is not None:
+            carry["pending"] = ts
+        return
+
+    if role == "assistant":
+        if carry.get("pending") is not None and ts is not None:
+            _hist_add(agg["turn_latency"], round(max(0.0, ts - carry["pending"]) * 1000))
+        carry["pending"] = None
+        parts = msg.get("content", [])
+        for p in parts if isinstance(parts, list) else ():
+            if isinstance(p, dict) and p.get("type") == "toolCall":
+                t = agg["tools"].setdefault(p.get("name", "?"), {"calls": 0, "results": 0, "errors": 0})
+                t["calls"] += 1
+        usage = msg.get("usage")
+        if isinstance(usage, dict):
+            m = agg["models"].setdefault(msg.get("model", "?"), {"replies": 0})
+            m["replies"] += 1
+            for k, v in usage.items():
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    m[k] = m.get(k, 0) + v
+        return
+
+    if role == "toolResult":
+        t = agg["tools"].setdefault(msg.get("toolName", "?"), {"calls": 0, "results": 0, "errors": 0})
+        t["results"] += 1
+        if msg.get("isError"):
+            t["errors"] += 1
+
+
+def _gateway_record(agg, obj, carry):
+    msg = _gw_msg(obj)
+    m = RUN_DONE_RE.search(msg)
+    if m:
+        model = carry.setdefault("runs", {}).pop(m.group(1), "?")
+        r = agg["runs"].setdefault(model, {"count": 0, "aborted": 0, "durations": _new_hist()})
+        r["count"] += 1
+        r["aborted"] += m.group(3) == "true"
+        _hist_add(r["durations"], int(m.group(2)))
+        return
+    m = RUN_PROMPT_END_RE.search(msg)
+    if m:
+        _hist_add(agg["prompt_ms"], int(m.group(1)))
+        return
+    m = RUN_START_RE.search(msg)
+    if m:
+        runs = carry.setdefault("runs", {})
+        if len(runs) >= PENDING_RUNS_MAX:  # 没有 done 的 run (进程被杀等), 丢掉最早的
+            runs.pop(next(iter(runs)))
+        runs[m.group(1)] = f"{m.group(2)}/{m.group(3)}"
+
+
+def _scan_stats_file(task):
+    """在子进程里扫描一个文件从 offset 起新追加的完整行, 返回增量聚合与新偏移"""
+    kind, path, offset, carry = task
+    agg = _new_stats()
+    record = _session_record if kind == "session" else _gateway_record
+    marker = b"embedded run " if kind == "gateway" else b'"message"'
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return path, None, offset, agg, carry
+    with f:
+        st = os.fstat(f.fileno())
+        f.seek(offset)
+        buf = b""
+        while True:
+            chunk = f.read(STATS_CHUNK)
+            if not chunk:
+                break
+            lines = (buf + chunk).split(b"\n")
+            buf = lines.pop()
+            for line in lines:
+                offset += len(line) + 1
+                if marker not in line:
+                    continue
+                obj = _loads(line)
+                if isinstance(obj, dict):
+                    record(agg, obj, carry)
+    return path, [st.st_dev, st.st_ino], offset, agg, carry
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            ck = json.load(f)
+        if ck.get("version") == STATS_VERSION:
+            return ck
+    except (OSError, ValueError):
+        pass
+    return {"version": STATS_VERSION, "files": {}, "retired": _new_stats()}
+
+
+def _save_checkpoint(path, ck):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(ck, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"checkpoint 写入失败: {e}", file=sys.stderr)
+        try: os.remove(tmp)
+        except OSError: pass
+
+
+def _plan_stats(ck, targets):
+    """对比 checkpoint 决定每个文件从哪里开始读, 顺带处理轮转/重写/删除"""
+    files = ck["files"]
+    for path in list(files):
+        if path not in targets:
+            _merge_stats(ck["retired"], files.pop(path)["agg"])
+    tasks = []
+    for path, kind in targets.items():
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        ent = files.get(path)
+        if ent is not None and ent["ident"] != [st.st_dev, st.st_ino]:
+            _merge_stats(ck["retired"], ent["agg"])
+            ent = None
+        elif ent is not None and st.st_size < ent["offset"]:
+            ent = None
+        if ent is None:
+            ent = files[path] = {"kind": kind, "ident": [st.st_dev, st.st_ino], "offset": 0,
+                                 "carry": {}, "agg": _new_stats()}
+        if st.st_size > ent["offset"]:
+            tasks.append((st.st_size - ent["offset"], (kind, path, ent["offset"], ent["carry"])))
+    # 大文件先排, 进程池尾部不至于只剩一个大任务在跑; 用上面 stat 到的大小, 文件中途消失也不影响排序
+    tasks.sort(key=lambda t: -t[0])
+    return [t for _, t in tasks]
+
+
+def _iter_scans(tasks, jobs):
+    done = set()
+    if jobs > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+                for fut in as_completed([pool.submit(_scan_stats_file, t) for t in tasks]):
+                    res = fut.result()
+                    done.add(res[0])
+                    yield res
+            return
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            # 受限环境 (无 /dev/shm 等) 建不了进程池, 剩下的退回单进程
+            print(f"进程池不可用, 改为单进程扫描: {e}", file=sys.stderr)
+    for t in tasks:
+        if t[1] not in done:
+            yield _scan_stats_file(t)
+
+
+def _dist(h, digits=3, scale=1):
+    """由直方图算 count / mean / 分位数 / max; 分位数按 nearest-rank 取桶上界, 夹在 [min, max] 内"""
+    n = h["count"]
+    if not n:
+        return {"count": 0}
+    out = {"count": n, "mean": round(h["sum"] / n * scale, digits)}
+    buckets = sorted((int(k), c) for k, c in h["buckets"].items())
+    for q in (50, 90, 99):
+        rank, seen = max(1, -(-q * n // 100)), 0
+        for i, c in buckets:
+            seen += c
+            if seen >= rank:
+                break
+        v = min(max(HIST_GROWTH ** i, h["min"]), h["max"])
+        out[f"p{q}"] = round(v * scale, digits)
+    out["max"] = round(h["max"] * scale, digits)
+    return out
+
+
+def stats_report(ck):
+    total = _merge_stats(_new_stats(), ck["retired"])
+    for ent in ck["files"].values():
+        _merge_stats(total, ent["agg"])
+    tools = {}
+    for name, t in sorted(total["tools"].items(), key=lambda kv: -kv[1]["calls"]):
+        tools[name] = dict(t, error_rate=round(t["errors"] / t["results"], 4) if t["results"] else 0.0)
+    runs = {}
+    for model, r in sorted(total["runs"].items()):
+        runs[model] = {"count": r["count"], "aborted": r["aborted"], "duration_ms": _dist(r["durations"], 1)}
+    all_runs = _new_hist()
+    for r in total["runs"].values():
+        _merge_hist(all_runs, r["durations"])
+    return {
+        "generated": datetime.now().astimezone().isoformat(timespec="seconds"),
+        "session_files": sum(1 for e in ck["files"].values() if e["kind"] == "session"),
+        "messages": total["messages"],
+        "models": dict(sorted(total["models"].items())),
+        "tools": tools,
+        "turn_latency_s": _dist(total["turn_latency"], 3, 1e-3),
+        "prompt_ms": _dist(total["prompt_ms"], 1),
+        "runs": {"all": _dist(all_runs, 1), "by_model": runs},
+    }
+
+
+def _stats_rows(report):
+    """把报告摊平成 (section, name, metric, value) 行, 供 CSV 输出"""
+    for section in ("session_files", "messages"):
+        yield section, "", "count", report[section]
+    for model, m in report["models"].items():
+        for k, v in m.items():
+            yield "model", model, k, v
+    for tool, t in report["tools"].items():
+        for k, v in t.items():
+            yield "tool", tool, k, v
+    for section in ("turn_latency_s", "prompt_ms"):
+        for k, v in report[section].items():
+            yield section, "", k, v
+    for k, v in report["runs"]["all"].items():
+        yield "run", "*", f"duration_ms.{k}", v
+    for model, r in report["runs"]["by_model"].items():
+        yield "run", model, "count", r["count"]
+        yield "run", model, "aborted", r["aborted"]
+        for k, v in r["duration_ms"].items():
+            yield "run", model, f"duration_ms.{k}", v
+
+
+def stats_mode(log_path, checkpoint, fmt="json", out=None, jobs=None):
+    """扫描全部 session 文件 (及 gateway.log 里的 embedded run 事件) 输出聚合统计"""
+    targets = {p: "session" for p in sorted(glob.glob(os.path.join(SESSIONS_DIR, "*.jsonl")))}
+    if os.path.exists(log_path):
+        targets[os.path.abspath(log_path)] = "gateway"
+    ck = _load_checkpoint(checkpoint) if checkpoint else {"version": STATS_VERSION, "files": {}, "retired": _new_stats()}
+    tasks = _plan_stats(ck, targets)
+
+    last_save = time.monotonic()
+    for path, ident, offset, agg, carry in _iter_scans(tasks, jobs or os.cpu_count() or 1):
+        ent = ck["files"][path]
+        if ident is not None and ident != ent["ident"]:
+            continue  # 扫描期间文件被换掉了, 下次再来
+        _merge_stats(ent["agg"], agg)
+        ent["offset"], ent["carry"] = offset, carry
+        if checkpoint and time.monotonic() - last_save >= STATS_SAVE_EVERY:
+            _save_checkpoint(checkpoint, ck)
+            last_save = time.monotonic()
+    if checkpoint:
+        _save_checkpoint(checkpoint, ck)
+
+    report = stats_report(ck)
+    f = open(out, "w", encoding="utf-8", newline="") if out else sys.stdout
+    try:
+        if fmt == "csv":
+            import csv
+            w = csv.writer(f)
+            w.writerow(["section", "name", "metric", "value"])
+            w.writerows(_stats_rows(report))
+        else:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+    finally:
+        if out: f.close()
+    print(f"已扫描 {len(tasks)} 个有新增内容的文件 (共 {len(targets)} 个)", file=sys.stderr)
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def bench_gw(path, rounds=3, limit=0):
+    """对一份录制好的 gateway.log 测解析/分类吞吐, 并统计各规则命中次数"""
+    with open(path, "rb") as f:
+        lines = f.readlines() if not limit else [ln for _, ln in zip(range(limit), f)]
+    if not lines:
+        print("日志为空, 无法测试", file=sys.stderr)
+        return
+    parsed = [p for p in map(parse_gw, lines) if p]
+
+    def best(fn):
+        times = []
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        return min(times)
+
+    t_parse = best(lambda: [parse_gw(ln) for ln in lines])
+    t_cls = best(lambda: [classify_gw(msg) for _, _, msg in parsed])
+    t_fmt = best(lambda: [fmt_gw(*p) for p in parsed])
+    t_both = best(lambda: [fmt_gw(*p) if p else None for p in map(parse_gw, lines)])
+    t_line = best(lambda: [format_gw_line(ln) for ln in lines])
+
+    hits = {}
+    for _, _, msg in parsed:
+        rule, _m = classify_gw(msg)
+        if rule is not None:
+            k = (rule.key, rule.fmt is not None)
+            hits[k] = hits.get(k, 0) + 1
+
+    rate = lambda n, dt: f"{n / dt:,.0f} 行/秒" if dt > 0 else "-"
+    print(f"样本: {path}  共 {len(lines)} 行, 可解析 {len(parsed)} 行, 取 {rounds} 轮最好成绩  (JSON: {JSON_BACKEND})")
+    print(f"  parse_gw     {t_parse:8.3f}s  {rate(len(lines), t_parse)}")
+    print(f"  classify_gw  {t_cls:8.3f}s  {rate(len(parsed), t_cls)}")
+    print(f"  fmt_gw       {t_fmt:8.3f}s  {rate(len(parsed), t_fmt)}")
+    print(f"  端到端       {t_both:8.3f}s  {rate(len(lines), t_both)}  (parse_gw + fmt_gw)")
+    print(f"  快速路径     {t_line:8.3f}s  {rate(len(lines), t_line)}  (format_gw_line: subsystem 按需解码)")
+    print(f"  命中规则 {sum(hits.values())} 行:")
+    for (key, shown), n in sorted(hits.items(), key=lambda kv: -kv[1]):
+        print(f"    {n:>9}  {key}{'' if shown else '  (丢弃)'}")
+
+
 def main():
     ap = argparse.ArgumentParser(description="OpenClaw Gateway 实时日志监控")
     ap.add_argument("--log", default=DEFAULT_LOG, help="gateway.log 路径")
@@ -398,25 +1354,57 @@ def main():
                      help="回放最近 N 条 gateway 关键事件")
     ap.add_argument("--last-session", type=int, default=0, metavar="N",
                      help="回放最近 N 条对话记录")
+    ap.add_argument("--since", type=time_spec, default=None, metavar="T",
+                     help="回放起始时间: 30m / 2h / 1d / HH:MM / ISO 时间")
+    ap.add_argument("--until", type=time_spec, default=None, metavar="T",
+                     help="回放截止时间, 格式同 --since")
+    ap.add_argument("--index", action="store_true",
+                     help=f"按时间回放时维护旁路偏移索引 (<log>{INDEX_SUFFIX})")
     ap.add_argument("--session", action="store_true",
                      help="同时监控 session 对话内容")
     ap.add_argument("--daemon", action="store_true",
                      help=f"后台守护模式, 写入 {READABLE_LOG}")
+    ap.add_argument("--poll", action="store_true",
+                     help="不使用 inotify, 固定间隔轮询文件变化")
+    ap.add_argument("--stats", action="store_true",
+                     help="汇总全部 session 与 gateway.log: 模型 token, 工具调用/错误率, 回复延迟, run 耗时")
+    ap.add_argument("--format", choices=("json", "csv"), default="json",
+                     help="--stats 输出格式")
+    ap.add_argument("--out", default=None, metavar="PATH",
+                     help="--stats 输出文件 (默认 stdout)")
+    ap.add_argument("--checkpoint", default=STATS_CHECKPOINT, metavar="PATH",
+                     help="--stats 增量 checkpoint, 再次运行只扫描新追加的内容")
+    ap.add_argument("--no-checkpoint", action="store_true",
+                     help="--stats 忽略 checkpoint, 全量扫描且不写回")
+    ap.add_argument("--jobs", type=int, default=0, metavar="N",
+                     help="--stats 并行扫描的进程数 (默认 CPU 数)")
+    ap.add_argument("--bench", action="store_true",
+                     help="对 --log 指定的日志样本测试事件分类吞吐")
+    ap.add_argument("--bench-lines", type=int, default=0, metavar="N",
+                     help="--bench 只取前 N 行 (默认全部)")
     args = ap.parse_args()
 
+    if args.stats:
+        stats_mode(args.log, None if args.no_checkpoint else args.checkpoint,
+                   fmt=args.format, out=args.out, jobs=args.jobs)
+        return
+
     if not os.path.exists(args.log):
         print(f"日志文件不存在: {args.log}", file=sys.stderr)
         sys.exit(1)
 
-    if args.daemon:
-        daemon_mode(args.log)
+    if args.bench:
+        bench_gw(args.log, limit=args.bench_lines)
+    elif args.daemon:
+        daemon_mode(args.log, use_inotify=not args.poll)
     elif args.last_session > 0:
-        replay_session(args.last_session)
-    elif args.last > 0:
-        replay_gw(args.log, args.last)
+        replay_session(args.last_session, args.since, args.until)
+    elif args.last > 0 or args.since is not None or args.until is not None:
+        replay_gw(args.log, args.last or (0 if args.since is not None else 50),
+                  args.since, args.until, use_index=args.index)
     else:
         try:
-            tail_loop(args.log, args.session)
+            tail_loop(args.log, args.session, use_inotify=not args.poll)
         except KeyboardInterrupt:
             print(f"\n{_c(DIM)}监控已停止{_c(R)}")
 
@@ -3,10 +3,13 @@ OpenClaw ↔ my_agent 桥接服务
 
 接收 my_agent 的 Simple 协议请求，转发给本地 OpenClaw Gateway 处理，返回结果。
 /api/skills 端点实时从 OpenClaw 获取能力列表，新增技能后无需重启。
+/api/chat 传 "stream": true（或 ?stream=1）时以 SSE 透传 Gateway 的流式输出。
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 import httpx
+import json
 import logging
+import os
 import time
 import threading
 
@@ -35,7 +38,49 @@ SKILLS_PROMPT = (
 
 _skills_cache = {"tools": {}, "skills": {}, "fetched_at": 0}
 _skills_lock = threading.Lock()
+# 当前是否有刷新在进行，以及本轮刷新完成的通知（单飞：同一时刻只有一个上游请求）
+_skills_refresh = {"running": False, "done": threading.Event()}
 CACHE_TTL = 300  # 5 分钟缓存
+# 无可用旧值时，调用方等待首轮刷新的最长时间（秒）
+SKILLS_REFRESH_WAIT_SECONDS = 35
+# 最近一次成功结果落盘，重启后无需先等一次 LLM 调用
+SKILLS_CACHE_FILE = os.getenv(
+    "BRIDGE_SKILLS_CACHE_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".skills_cache.json"),
+)
+
+
+def _openclaw_headers() -> dict:
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {OPENCLAW_TOKEN}",
+    }
+
+
+def _openclaw_payload(message: str, stream: bool = False) -> dict:
+    return {
+        "model": "openclaw",
+        "stream": stream,
+        "messages": [{"role": "user", "content": message}],
+    }
+
+
+def _extract_content(data: dict) -> str:
+    """从 /v1/chat/completions 的非流式响应中取出回复文本。"""
+    return (
+        data.get("choices", [{}])[0]
+        .get("message", {})
+        .get("content", "")
+    )
+
+
+def _parse_skills_content(content: str) -> dict:
+    """从回复中提取 JSON（兼容 markdown code block 包裹）。"""
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else text[3:]
+        text = text.rsplit("```", 1)[0]
+    return json.loads(text)
 
 
 def _call_openclaw(message: str, timeout: int = 120) -> tuple:
@@ -43,54 +88,192 @@ def _call_openclaw(message: str, timeout: int = 120) -> tuple:
     start = time.time()
     resp = httpx.post(
         OPENCLAW_URL,
-        json={
-            "model": "openclaw",
-            "stream": False,
-            "messages": [{"role": "user", "content": message}],
-        },
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {OPENCLAW_TOKEN}",
-        },
+        json=_openclaw_payload(message),
+        headers=_openclaw_headers(),
         timeout=timeout,
     )
     elapsed_ms = int((time.time() - start) * 1000)
     if resp.status_code != 200:
         raise RuntimeError(f"OpenClaw HTTP {resp.status_code}: {resp.text}")
-    content = (
-        resp.json().get("choices", [{}])[0]
-        .get("message", {})
-        .get("content", "")
+    return _extract_content(resp.json()), elapsed_ms
+
+
+def _wants_stream(data: dict, args) -> bool:
+    """请求体 "stream": true 或 ?stream=1 时启用流式透传。"""
+    value = data.get("stream", args.get("stream", ""))
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "sse")
+
+
+def _sse(data: str, event: str = "") -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {data}\n\n"
+
+
+def _sse_data(line: str):
+    """解析一行上游 SSE，返回 data 内容；非 data 行返回 None。"""
+    if not line.startswith("data:"):
+        return None
+    return line[5:].strip()
+
+
+def _is_content_chunk(data: str) -> bool:
+    """判断一个 chat.completion.chunk 是否携带了回复文本（用于记录首 token 时间）。"""
+    try:
+        delta = json.loads(data).get("choices", [{}])[0].get("delta", {})
+    except (ValueError, AttributeError, IndexError):
+        return False
+    return bool(delta.get("content"))
+
+
+def _stream_metadata(start: float, first_token_at) -> dict:
+    return {
+        "agent_id": AGENT_ID,
+        "stream": True,
+        "first_token_ms": int((first_token_at - start) * 1000) if first_token_at else None,
+        "processing_time_ms": int((time.time() - start) * 1000),
+    }
+
+
+def _stream_openclaw(message: str, timeout: int = 120):
+    """以 stream=True 调用 OpenClaw，返回逐条产出 SSE 帧的生成器。
+
+    上游 HTTP 错误在返回生成器之前抛出，调用方仍可回复普通的错误 JSON；
+    上游 chunk 原样转发，结束前追加一条 event: metadata（含首 token / 总耗时）。
+    """
+    start = time.time()
+    client = httpx.Client(timeout=timeout)
+    req = client.build_request(
+        "POST", OPENCLAW_URL,
+        json=_openclaw_payload(message, stream=True),
+        headers=_openclaw_headers(),
     )
-    return content, elapsed_ms
+    try:
+        resp = client.send(req, stream=True)
+    except Exception:
+        client.close()
+        raise
+    if resp.status_code != 200:
+        text = resp.read().decode("utf-8", errors="replace")
+        resp.close()
+        client.close()
+        raise RuntimeError(f"OpenClaw HTTP {resp.status_code}: {text}")
+
+    def generate():
+        first_token_at = None
+        status = "success"
+        try:
+            for line in resp.iter_lines():
+                data = _sse_data(line)
+                if data is None:
+                    continue
+                if data == "[DONE]":
+                    break
+                if first_token_at is None and _is_content_chunk(data):
+                    first_token_at = time.time()
+                yield _sse(data)
+        except Exception as e:
+            logger.error(f"OpenClaw stream aborted: {e}")
+            status = "error"
+            yield _sse(json.dumps({"error": str(e), "status": "error"}), event="error")
+        finally:
+            resp.close()
+            client.close()
+        metadata = _stream_metadata(start, first_token_at)
+        logger.info(
+            f"OpenClaw stream done (first_token={metadata['first_token_ms']}ms, "
+            f"total={metadata['processing_time_ms']}ms)"
+        )
+        yield _sse(json.dumps({"status": status, "metadata": metadata}), event="metadata")
+        yield _sse("[DONE]")
 
+    return generate()
 
-def _fetch_skills() -> dict:
-    """从 OpenClaw 实时获取工具和技能列表，带缓存。"""
-    now = time.time()
+
+def _load_persisted_skills():
+    """启动时从磁盘恢复上次成功的能力列表（保留原 fetched_at，过期后照常后台刷新）。"""
+    try:
+        with open(SKILLS_CACHE_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        logger.warning(f"Failed to load persisted skills from {SKILLS_CACHE_FILE}: {e}")
+        return
     with _skills_lock:
-        if _skills_cache["fetched_at"] and now - _skills_cache["fetched_at"] < CACHE_TTL:
-            return _skills_cache
+        _skills_cache["tools"] = data.get("tools", {})
+        _skills_cache["skills"] = data.get("skills", {})
+        _skills_cache["fetched_at"] = float(data.get("fetched_at", 0) or 0)
+    logger.info(f"Loaded persisted skills: {len(_skills_cache['tools'])} tools, {len(_skills_cache['skills'])} skills")
+
 
+def _persist_skills():
+    """原子写入（临时文件 + rename），避免并发或崩溃时留下半个文件。"""
+    tmp_path = f"{SKILLS_CACHE_FILE}.{os.getpid()}.tmp"
     try:
-        content, _ = _call_openclaw(SKILLS_PROMPT, timeout=30)
-        # 从回复中提取 JSON（兼容 markdown code block 包裹）
-        text = content.strip()
-        if text.startswith("```"):
-            text = text.split("\n", 1)[1] if "\n" in text else text[3:]
-            text = text.rsplit("```", 1)[0]
-        import json
-        data = json.loads(text)
         with _skills_lock:
-            _skills_cache["tools"] = data.get("tools", {})
-            _skills_cache["skills"] = data.get("skills", {})
-            _skills_cache["fetched_at"] = now
-        logger.info(f"Refreshed skills: {len(_skills_cache['tools'])} tools, {len(_skills_cache['skills'])} skills")
+            snapshot = dict(_skills_cache)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, SKILLS_CACHE_FILE)
+    except Exception as e:
+        logger.warning(f"Failed to persist skills to {SKILLS_CACHE_FILE}: {e}")
+
+
+def _apply_skills(data: dict, persist: bool = True):
+    """更新内存中的 _skills_cache；persist=False 时由调用方自行落盘（异步版放到线程里做）。"""
+    with _skills_lock:
+        _skills_cache["tools"] = data.get("tools", {})
+        _skills_cache["skills"] = data.get("skills", {})
+        _skills_cache["fetched_at"] = time.time()
+    if persist:
+        _persist_skills()
+    logger.info(f"Refreshed skills: {len(_skills_cache['tools'])} tools, {len(_skills_cache['skills'])} skills")
+
+
+def _refresh_skills():
+    try:
+        content, _ = _call_openclaw(SKILLS_PROMPT, timeout=30)
+        _apply_skills(_parse_skills_content(content))
     except Exception as e:
         logger.warning(f"Failed to fetch skills from OpenClaw: {e}")
+    finally:
+        with _skills_lock:
+            _skills_refresh["running"] = False
+            _skills_refresh["done"].set()
+
+
+def _start_skills_refresh() -> threading.Event:
+    """没有刷新在进行时启动一个后台刷新线程；返回本轮刷新完成的 Event。"""
+    with _skills_lock:
+        if not _skills_refresh["running"]:
+            _skills_refresh["running"] = True
+            _skills_refresh["done"] = threading.Event()
+            threading.Thread(target=_refresh_skills, name="skills-refresh", daemon=True).start()
+        return _skills_refresh["done"]
+
+
+def _fetch_skills(force: bool = False) -> dict:
+    """从 OpenClaw 获取工具和技能列表，带缓存。
+
+    过期后立即返回旧值，同时在后台单飞刷新（stale-while-revalidate）；
+    只有在没有任何旧值或强制刷新时才等待刷新结果，并发调用者共享同一次上游请求。
+    """
+    with _skills_lock:
+        fetched_at = _skills_cache["fetched_at"]
+    if not force and fetched_at and time.time() - fetched_at < CACHE_TTL:
+        return _skills_cache
+
+    done = _start_skills_refresh()
+    if force or not fetched_at:
+        done.wait(timeout=SKILLS_REFRESH_WAIT_SECONDS)
     return _skills_cache
 
 
+_load_persisted_skills()
+
+
 def _build_description() -> str:
     return "查询config配置, ab实验结果查询, google文档读写, 查询功能默认为prerank相关"
 
@@ -107,6 +290,13 @@ def chat():
         message = data.get("message", "")
         logger.info(f"Received from my_agent: {message[:200]}")
 
+        if _wants_stream(data, request.args):
+            return Response(
+                stream_with_context(_stream_openclaw(message)),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
         content, elapsed_ms = _call_openclaw(message)
         logger.info(f"OpenClaw replied ({elapsed_ms}ms): {content[:200]}")
 
@@ -129,12 +319,7 @@ def chat():
 @app.route("/api/skills", methods=["GET"])
 def skills():
     """实时从 OpenClaw 获取能力列表（5 分钟缓存）。"""
-    force = request.args.get("refresh") == "1"
-    if force:
-        with _skills_lock:
-            _skills_cache["fetched_at"] = 0
-
-    info = _fetch_skills()
+    info = _fetch_skills(force=request.args.get("refresh") == "1")
     return jsonify({
         "agent_id": AGENT_ID,
         "agent_name": AGENT_NAME,
@@ -0,0 +1,271 @@
+"""
+OpenClaw ↔ my_agent 桥接服务（ASGI / 异步模式）
+
+与 agent_server.py 提供相同的 /api/chat、/api/skills、/health 端点，但：
+- 全进程共享一个 httpx.AsyncClient（keep-alive 连接池），不再每次请求新建 TCP 连接；
+- 用信号量限制同时在途的 OpenClaw 调用数，排队数超过上限时直接返回 429；
+- 慢的 OpenClaw 回复不会占住 worker，/health 与 /api/skills 始终可用。
+
+用法:
+  python3 agent_server_async.py                      # Sanic 内置服务器
+  uvicorn agent_server_async:app --port 8080         # 任意 ASGI 服务器
+"""
+import asyncio
+import json
+import os
+import time
+
+import httpx
+from sanic import Sanic, Request
+from sanic.response import json as json_response
+
+from agent_server import (
+    AGENT_ID, AGENT_NAME, CACHE_TTL, OPENCLAW_URL, PORT, SKILLS_PROMPT,
+    SKILLS_REFRESH_WAIT_SECONDS, _apply_skills, _build_description, _extract_content,
+    _is_content_chunk, _openclaw_headers, _openclaw_payload, _parse_skills_content, _persist_skills,
+    _skills_cache, _sse, _sse_data, _stream_metadata, _wants_stream, logger, register,
+)
+
+app = Sanic("openclaw_bridge")
+
+# 同时在途的 OpenClaw 调用上限；超出后进入等待队列。
+MAX_INFLIGHT = int(os.getenv("BRIDGE_MAX_INFLIGHT", "8"))
+# 等待队列上限；队列已满的请求直接 429，不再堆积。
+MAX_QUEUED = int(os.getenv("BRIDGE_MAX_QUEUED", "16"))
+# 在队列中等待空闲槽位的最长时间（秒），超时同样返回 429。
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("BRIDGE_QUEUE_TIMEOUT_SECONDS", "30"))
+POOL_MAX_CONNECTIONS = int(os.getenv("BRIDGE_POOL_MAX_CONNECTIONS", "32"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("BRIDGE_POOL_KEEPALIVE_EXPIRY", "60"))
+
+_client: httpx.AsyncClient | None = None
+_inflight_sem: asyncio.Semaphore | None = None
+_skills_refresh_task: asyncio.Task | None = None
+_stats = {"inflight": 0, "queued": 0, "rejected": 0, "completed": 0}
+
+
+class BridgeBusy(Exception):
+    """在途请求和等待队列都已满。"""
+
+
+@app.before_server_start
+async def _setup(app, _loop):
+    global _client, _inflight_sem
+    _client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_CONNECTIONS,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+        ),
+        headers=_openclaw_headers(),
+    )
+    _inflight_sem = asyncio.Semaphore(MAX_INFLIGHT)
+    logger.info(
+        f"Async bridge ready: max_inflight={MAX_INFLIGHT}, max_queued={MAX_QUEUED}, "
+        f"pool={POOL_MAX_CONNECTIONS}"
+    )
+
+
+@app.after_server_stop
+async def _teardown(app, _loop):
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class _InflightSlot:
+    """获取一个在途槽位；排队已满或等待超时则抛出 BridgeBusy。"""
+
+    async def __aenter__(self):
+        if _inflight_sem.locked():
+            if _stats["queued"] >= MAX_QUEUED:
+                _stats["rejected"] += 1
+                raise BridgeBusy()
+        _stats["queued"] += 1
+        try:
+            await asyncio.wait_for(_inflight_sem.acquire(), timeout=QUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            _stats["rejected"] += 1
+            raise BridgeBusy()
+        finally:
+            _stats["queued"] -= 1
+        _stats["inflight"] += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        _stats["inflight"] -= 1
+        _stats["completed"] += 1
+        _inflight_sem.release()
+        return False
+
+
+async def _call_openclaw_async(message: str, timeout: int = 120) -> tuple:
+    """异步调用 OpenClaw Gateway（复用连接池），返回 (content, elapsed_ms)。"""
+    start = time.time()
+    resp = await _client.post(OPENCLAW_URL, json=_openclaw_payload(message), timeout=timeout)
+    elapsed_ms = int((time.time() - start) * 1000)
+    if resp.status_code != 200:
+        raise RuntimeError(f"OpenClaw HTTP {resp.status_code}: {resp.text}")
+    return _extract_content(resp.json()), elapsed_ms
+
+
+async def _stream_openclaw_async(request: Request, message: str, state: dict, timeout: int = 120):
+    """以 stream=True 调用 OpenClaw，把上游 SSE chunk 逐条转发给调用方。
+
+    上游返回非 200 时在开始响应之前抛出；开始转发之后 state["started"] 置为 True，
+    之后的异常以 event: error 帧告知，调用方已断开时只记日志，不再向外抛。
+    """
+    start = time.time()
+    first_token_at = None
+    status = "success"
+    async with _client.stream(
+        "POST", OPENCLAW_URL, json=_openclaw_payload(message, stream=True), timeout=timeout,
+    ) as resp:
+        if resp.status_code != 200:
+            text = (await resp.aread()).decode("utf-8", errors="replace")
+            raise RuntimeError(f"OpenClaw HTTP {resp.status_code}: {text}")
+        response = await request.respond(
+            content_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        state["started"] = True
+        try:
+            async for line in resp.aiter_lines():
+                data = _sse_data(line)
+                if data is None:
+                    continue
+                if data == "[DONE]":
+                    break
+                if first_token_at is None and _is_content_chunk(data):
+                    first_token_at = time.time()
+                await response.send(_sse(data))
+        except Exception as e:
+            logger.error(f"OpenClaw stream aborted: {e}")
+            status = "error"
+            try:
+                await response.send(_sse(json.dumps({"error": str(e), "status": "error"}), event="error"))
+            except Exception as send_err:
+                logger.warning(f"Client gone, error frame not sent: {send_err}")
+                return
+
+    metadata = _stream_metadata(start, first_token_at)
+    logger.info(
+        f"OpenClaw stream done (first_token={metadata['first_token_ms']}ms, "
+        f"total={metadata['processing_time_ms']}ms)"
+    )
+    try:
+        await response.send(_sse(json.dumps({"status": status, "metadata": metadata}), event="metadata"))
+        await response.send(_sse("[DONE]"))
+        await response.eof()
+    except Exception as e:
+        logger.warning(f"Client gone before stream end: {e}")
+
+
+async def _refresh_skills_async():
+    try:
+        content, _ = await _call_openclaw_async(SKILLS_PROMPT, timeout=30)
+        _apply_skills(_parse_skills_content(content), persist=False)
+        # 落盘是阻塞的文件写入 + rename，放到线程里，不占事件循环
+        await asyncio.to_thread(_persist_skills)
+    except Exception as e:
+        logger.warning(f"Failed to fetch skills from OpenClaw: {e}")
+
+
+async def _fetch_skills_async(force: bool = False) -> dict:
+    """异步版 _fetch_skills：与同步版共享 _skills_cache 与落盘文件，同样单飞 + stale-while-revalidate。"""
+    global _skills_refresh_task
+    fetched_at = _skills_cache["fetched_at"]
+    if not force and fetched_at and time.time() - fetched_at < CACHE_TTL:
+        return _skills_cache
+
+    if _skills_refresh_task is None or _skills_refresh_task.done():
+        _skills_refresh_task = asyncio.create_task(_refresh_skills_async())
+    if force or not fetched_at:
+        try:
+            await asyncio.wait_for(asyncio.shield(_skills_refresh_task), timeout=SKILLS_REFRESH_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+    return _skills_cache
+
+
+def _busy_response():
+    return json_response(
+        {"error": "Bridge busy, retry later", "status": "error"},
+        status=429,
+        headers={"Retry-After": "5"},
+    )
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    stream_state = {"started": False}
+    try:
+        data = request.json or {}
+        message = data.get("message", "")
+        logger.info(f"Received from my_agent: {message[:200]}")
+
+        if _wants_stream(data, request.args):
+            async with _InflightSlot():
+                await _stream_openclaw_async(request, message, stream_state)
+            return
+
+        async with _InflightSlot():
+            content, elapsed_ms = await _call_openclaw_async(message)
+        logger.info(f"OpenClaw replied ({elapsed_ms}ms): {content[:200]}")
+
+        return json_response({
+            "response": content,
+            "status": "success",
+            "metadata": {
+                "agent_id": AGENT_ID,
+                "processing_time_ms": elapsed_ms,
+            },
+        })
+    except BridgeBusy:
+        logger.warning(f"Rejected /api/chat: inflight={_stats['inflight']} queued={_stats['queued']}")
+        return _busy_response()
+    except Exception as e:
+        if stream_state["started"]:
+            # 流式响应已经开始，不能再返回 JSON
+            logger.error(f"Error after stream started: {e}", exc_info=True)
+            return
+        if isinstance(e, httpx.TimeoutException):
+            logger.error("OpenClaw request timed out")
+            return json_response({"error": "OpenClaw timeout", "status": "error"}, status=504)
+        logger.error(f"Error: {e}", exc_info=True)
+        return json_response({"error": str(e), "status": "error"}, status=500)
+
+
+@app.get("/api/skills")
+async def skills(request: Request):
+    """实时从 OpenClaw 获取能力列表（5 分钟缓存）。"""
+    info = await _fetch_skills_async(force=request.args.get("refresh") == "1")
+    return json_response({
+        "agent_id": AGENT_ID,
+        "agent_name": AGENT_NAME,
+        "description": _build_description(),
+        "tools": info.get("tools", {}),
+        "skills": info.get("skills", {}),
+        "cached_at": info.get("fetched_at", 0),
+        "usage": "POST /api/chat with {\"message\": \"你的任务描述\"}",
+    })
+
+
+@app.get("/health")
+async def health(request: Request):
+    return json_response({
+        "status": "healthy",
+        "agent_id": AGENT_ID,
+        "mode": "asgi",
+        "inflight": _stats["inflight"],
+        "queued": _stats["queued"],
+        "rejected": _stats["rejected"],
+        "completed": _stats["completed"],
+        "max_inflight": MAX_INFLIGHT,
+        "max_queued": MAX_QUEUED,
+    })
+
+
+if __name__ == "__main__":
+    register()
+    app.run(host="0.0.0.0", port=PORT, access_log=False, auto_reload=False)
@@ -3,35 +3,202 @@
 
 兼容目标：Python 2.7+ / Python 3.x
 - 避免 pathlib / typing / encoding= 等 Python3-only 特性
+
+存储：cache_dir 下单个 SQLite 文件（WAL 日志），值为 zlib 压缩的紧凑 JSON。
+- 写入在事务内完成，多个 skill 进程并发读写同一文件是安全的；
+- 总大小 / 条目数超过上限时按最近访问时间（LRU）淘汰；
+- 过期条目在读到时删除，并每隔若干次写入批量清理一次；
+- 当前环境没有 sqlite3 模块时回退为每个 key 一个 JSON 文件的旧实现。
 """
 
 from __future__ import absolute_import, division, print_function
 
 import json
 import os
+import threading
 import time
+import zlib
+
+try:
+    import sqlite3
+    HAS_SQLITE = True
+except Exception:
+    HAS_SQLITE = False
+
+DB_FILENAME = "cache.sqlite3"
+# 访问时间只在距上次记录超过该秒数时才回写，避免每次命中都产生一次写事务
+TOUCH_INTERVAL = 30
+# 每写入多少次做一次过期清理 + 容量检查
+MAINTENANCE_EVERY = 20
+
+
+def _stderr(msg):
+    try:
+        import sys
+        sys.stderr.write(msg)
+    except Exception:
+        pass
+
+
+def _hash_key(key):
+    import hashlib
+    try:
+        k = key.encode("utf-8")
+    except Exception:
+        k = str(key)
+    return hashlib.md5(k).hexdigest()
+
+
+def _encode(value):
+    raw = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    if not isinstance(raw, bytes):
+        raw = raw.encode("utf-8")
+    return zlib.compress(raw, 6)
+
+
+def _decode(blob):
+    raw = zlib.decompress(bytes(blob))
+    return json.loads(raw.decode("utf-8"))
 
 
 class CacheManager(object):
-    def __init__(self, cache_dir=".cache", ttl=300):
+    def __init__(self, cache_dir=".cache", ttl=300, max_bytes=None, max_entries=None):
         self.cache_dir = cache_dir
         self.ttl = ttl
+        self.max_bytes = int(max_bytes if max_bytes is not None else (os.getenv("AB_CACHE_MAX_BYTES") or 64 * 1024 * 1024))
+        self.max_entries = int(max_entries if max_entries is not None else (os.getenv("AB_CACHE_MAX_ENTRIES") or 2000))
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
         if not os.path.exists(self.cache_dir):
             try:
                 os.makedirs(self.cache_dir)
             except Exception:
                 pass
+        if HAS_SQLITE:
+            try:
+                self._conn = self._open(os.path.join(self.cache_dir, DB_FILENAME))
+            except Exception as e:
+                _stderr("警告: 无法打开缓存数据库，回退到 JSON 文件缓存: %s\n" % e)
+                self._conn = None
 
-    def _get_cache_path(self, key):
-        import hashlib
+    def _open(self, path):
+        conn = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries(accessed_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries(expires_at)")
+        return conn
+
+    def get(self, key):
+        if self._conn is None:
+            return self._file_get(key)
+        h = _hash_key(key)
+        now = time.time()
         try:
-            k = key.encode("utf-8")
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, created_at, accessed_at FROM entries WHERE key = ?", (h,)
+                ).fetchone()
+                if row is None:
+                    return None
+                blob, created_at, accessed_at = row
+                if now - created_at > self.ttl:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (h,))
+                    return None
+                if now - accessed_at > TOUCH_INTERVAL:
+                    self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, h))
+            return _decode(blob)
         except Exception:
-            k = str(key)
-        h = hashlib.md5(k).hexdigest()
-        return os.path.join(self.cache_dir, "%s.json" % h)
+            return None
 
-    def get(self, key):
+    def set(self, key, value):
+        if self._conn is None:
+            return self._file_set(key, value)
+        h = _hash_key(key)
+        now = time.time()
+        try:
+            blob = _encode(value)
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, created_at, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (h, sqlite3.Binary(blob), len(blob), now, now + self.ttl, now),
+                )
+                self._writes += 1
+                if self._writes % MAINTENANCE_EVERY == 1:
+                    self._maintain(now)
+        except Exception as e:
+            _stderr("警告: 无法写入缓存: %s\n" % e)
+
+    def _maintain(self, now):
+        """批量删除过期条目，再按 LRU 淘汰到容量上限以内（调用方持有 _lock）"""
+        self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+        victims = []
+        for k, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((k,))
+            count -= 1
+            total -= size
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def purge_expired(self):
+        """立即清理所有过期条目并执行容量淘汰；返回删除的条目数"""
+        if self._conn is None:
+            return 0
+        with self._lock:
+            before = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            self._maintain(time.time())
+            after = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return before - after
+
+    def clear(self):
+        if self._conn is None:
+            return 0
+        with self._lock:
+            return self._conn.execute("DELETE FROM entries").rowcount
+
+    def stats(self):
+        if self._conn is None:
+            return {"backend": "json"}
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            "backend": "sqlite",
+            "entries": count,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+    # ---- 无 sqlite3 时的旧实现：每个 key 一个 JSON 文件 ----
+
+    def _get_cache_path(self, key):
+        return os.path.join(self.cache_dir, "%s.json" % _hash_key(key))
+
+    def _file_get(self, key):
         p = self._get_cache_path(key)
         if not os.path.exists(p):
             return None
@@ -48,14 +215,12 @@ class CacheManager(object):
         except Exception:
             return None
 
-    def set(self, key, value):
+    def _file_set(self, key, value):
         p = self._get_cache_path(key)
+        tmp = "%s.%s.tmp" % (p, os.getpid())
         try:
-            with open(p, "w") as f:
-                json.dump({"timestamp": time.time(), "data": value}, f, ensure_ascii=False, indent=2)
+            with open(tmp, "w") as f:
+                json.dump({"timestamp": time.time(), "data": value}, f, ensure_ascii=False, separators=(",", ":"))
+            os.rename(tmp, p)
         except Exception as e:
-            try:
-                import sys
-                sys.stderr.write("警告: 无法写入缓存: %s\n" % e)
-            except Exception:
-                pass
+            _stderr("警告: 无法写入缓存: %s\n" % e)
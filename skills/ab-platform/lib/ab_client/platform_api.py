@@ -10,16 +10,26 @@
 from __future__ import absolute_import, division, print_function
 
 import os
+import threading
 import time
 import uuid
 from datetime import datetime, timedelta
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
     HAS_REQUESTS = True
 except Exception:
     HAS_REQUESTS = False
 
+try:
+    from urllib3.util.retry import Retry
+except Exception:
+    try:
+        from requests.packages.urllib3.util.retry import Retry
+    except Exception:
+        Retry = None
+
 def _load_env_file(path):
     """不依赖 dotenv：手动读 .env 并写入 os.environ（Python 2 或无 dotenv 时回退）"""
     if not path or not os.path.isfile(path):
@@ -49,9 +59,70 @@ except Exception:
 _load_env_file(os.path.expanduser("~/.openclaw/.env"))
 
 from .default_metrics import get_default_metrics
+from .poller import AdaptivePoller
 
 DEFAULT_METRICS = get_default_metrics()
 
+# 进程内共享：同一进程内多次查询同一实验时复用学到的完成耗时
+_shared_poller = None
+# 进程内共享的 requests.Session（keep-alive 连接池），按连接池大小区分
+_shared_sessions = {}
+_shared_sessions_lock = threading.Lock()
+
+
+def _build_retry(retries, backoff):
+    """5xx 与连接错误时退避重试；POST 也重试（open_get_summary_* 均可安全重放）"""
+    if Retry is None or retries <= 0:
+        return retries
+    kwargs = dict(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=(500, 502, 503, 504),
+        raise_on_status=False,
+    )
+    try:
+        return Retry(allowed_methods=frozenset(["GET", "POST"]), **kwargs)
+    except TypeError:  # urllib3 < 1.26
+        return Retry(method_whitelist=frozenset(["GET", "POST"]), **kwargs)
+
+
+def _create_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        max_retries=_build_retry(
+            int(os.getenv("AB_API_RETRIES") or "2"),
+            float(os.getenv("AB_API_RETRY_BACKOFF") or "0.5"),
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _get_shared_session(pool_size):
+    with _shared_sessions_lock:
+        session = _shared_sessions.get(pool_size)
+        if session is None:
+            session = _shared_sessions[pool_size] = _create_session(pool_size)
+        return session
+
+
+def _get_shared_poller(poll_interval, max_poll_attempts):
+    global _shared_poller
+    if _shared_poller is None:
+        _shared_poller = AdaptivePoller(
+            first_delay=float(os.getenv("AB_POLL_FIRST_DELAY") or "0.5"),
+            max_delay=float(poll_interval) * 2,
+            deadline=float(os.getenv("AB_POLL_DEADLINE") or (poll_interval * max_poll_attempts)),
+            max_attempts=max_poll_attempts,
+        )
+    return _shared_poller
+
 
 def _normalize_space_text(value):
     try:
@@ -65,7 +136,7 @@ def _normalize_space_text(value):
 class PlatformAPIClient(object):
     """Shopee AB Report Open API 客户端"""
 
-    def __init__(self, token=None):
+    def __init__(self, token=None, session=None, pool_size=None):
         env = (os.getenv("AB_API_ENV") or "live").lower()
         if env == "live":
             self.api_url = "https://httpgateway.abtest.shopee.io/request_spex"
@@ -78,11 +149,19 @@ class PlatformAPIClient(object):
         self.client_server_name = (os.getenv("AB_CLIENT_SERVER_NAME") or "").strip()
         self.operator = (os.getenv("AB_OPERATOR") or "").strip()
         self.timeout = int(os.getenv("AB_API_TIMEOUT") or "30")
+        self.connect_timeout = float(os.getenv("AB_API_CONNECT_TIMEOUT") or "5")
         self.use_mock = (os.getenv("USE_MOCK_DATA") or "true").lower() == "true"
         if self.token and self.use_mock:
             self.use_mock = False
         self.poll_interval = int(os.getenv("AB_POLL_INTERVAL") or "2")
         self.max_poll_attempts = int(os.getenv("AB_MAX_POLL_ATTEMPTS") or "30")
+        self.poller = _get_shared_poller(self.poll_interval, self.max_poll_attempts)
+        # 默认复用进程内共享的 Session；pool_size 取并发线程数（compare.py 会传入）
+        if session is None and HAS_REQUESTS:
+            session = _get_shared_session(int(pool_size or os.getenv("AB_HTTP_POOL_SIZE") or "4"))
+        self.session = session
+        self._stats_lock = threading.Lock()
+        self._latency = {}
 
     def _get_headers(self, namespace):
         return {
@@ -111,6 +190,34 @@ class PlatformAPIClient(object):
         except Exception:
             pass
 
+    def _record_latency(self, namespace, seconds, ok=True):
+        name = namespace.rsplit(".", 1)[-1]
+        ms = seconds * 1000.0
+        with self._stats_lock:
+            st = self._latency.get(name)
+            if st is None:
+                st = self._latency[name] = {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+            st["count"] += 1
+            if not ok:
+                st["errors"] += 1
+            st["total_ms"] += ms
+            st["last_ms"] = ms
+            if ms > st["max_ms"]:
+                st["max_ms"] = ms
+
+    def get_latency_stats(self):
+        """按接口（open_get_summary_key / open_get_summary_result）统计的请求耗时（毫秒）"""
+        with self._stats_lock:
+            out = {}
+            for name, st in self._latency.items():
+                item = dict(st)
+                item["avg_ms"] = round(st["total_ms"] / st["count"], 1) if st["count"] else 0.0
+                item["total_ms"] = round(st["total_ms"], 1)
+                item["max_ms"] = round(st["max_ms"], 1)
+                item["last_ms"] = round(st["last_ms"], 1)
+                out[name] = item
+            return out
+
     def _make_request(self, namespace, body):
         if (not HAS_REQUESTS) or self.use_mock or (not self.token):
             return {}
@@ -131,12 +238,19 @@ class PlatformAPIClient(object):
                 self._stderr("AB_API_DEBUG headers=%s" % safe_headers)
                 self._stderr("AB_API_DEBUG body=%s" % body_preview)
 
-            resp = requests.post(
-                self.api_url,
-                headers=headers,
-                json=body,
-                timeout=self.timeout,
-            )
+            poster = self.session.post if self.session is not None else requests.post
+            start = time.time()
+            try:
+                resp = poster(
+                    self.api_url,
+                    headers=headers,
+                    json=body,
+                    timeout=(self.connect_timeout, self.timeout),
+                )
+            except Exception:
+                self._record_latency(namespace, time.time() - start, ok=False)
+                raise
+            self._record_latency(namespace, time.time() - start, ok=resp.status_code == 200)
             if debug:
                 text_preview = (resp.text or "")
                 if len(text_preview) > 2000:
@@ -269,7 +383,8 @@ class PlatformAPIClient(object):
         normalization=None,
         **kwargs
     ):
-        for attempt in range(self.max_poll_attempts):
+        run = self.poller.run(experiment_id)
+        for _ in run:
             result = self.get_summary_result(
                 project_id=project_id,
                 experiment_id=experiment_id,
@@ -284,15 +399,13 @@ class PlatformAPIClient(object):
                 **kwargs
             )
             if not result:
-                if attempt < self.max_poll_attempts - 1:
-                    time.sleep(self.poll_interval)
-                    continue
-                return {}
+                continue
             if result.get("retcode", -1) != 0:
                 return {}
             # 若已返回有效数据（body/relative 非空），直接视为完成
             data = result.get("data") or {}
             if data.get("body") or data.get("relative"):
+                run.mark_done()
                 return result
             # status 可能在顶层或 key_info 子字段，1/2 表示仍在计算
             status = result.get("status")
@@ -300,10 +413,8 @@ class PlatformAPIClient(object):
                 ki = result.get("key_info") or {}
                 status = ki.get("status", 0)
             if status in (1, 2):
-                if attempt < self.max_poll_attempts - 1:
-                    time.sleep(self.poll_interval)
-                    continue
-                return {}
+                continue
+            run.mark_done()
             return result
         return {}
 
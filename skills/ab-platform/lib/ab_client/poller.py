@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""结果轮询退避策略（ab-platform skill 内嵌）
+
+兼容目标：Python 2.7+ / Python 3.x
+- 不使用函数/变量注解
+- 不使用 f-string
+
+首次探测很快发出；之后按指数退避（带抖动）拉长间隔，直到总时限耗尽。
+按实验 ID 记录完成耗时（EWMA），当本轮尚未到达预计完成时间时，把下一次探测推迟到预计时间附近。
+与 extend_tool/ab_proxy.py 中的 AdaptivePoller 使用同一套调度规则。
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import random
+import threading
+import time
+from collections import OrderedDict
+
+
+class AdaptivePoller(object):
+    def __init__(
+        self,
+        first_delay=0.5,
+        base_delay=1.0,
+        max_delay=5.0,
+        factor=1.6,
+        jitter=0.2,
+        deadline=60.0,
+        max_attempts=30,
+        ewma_alpha=0.3,
+        max_tracked_keys=256,
+    ):
+        self.first_delay = first_delay
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.ewma_alpha = ewma_alpha
+        self.max_tracked_keys = max_tracked_keys
+        self._estimates = OrderedDict()
+        # 同一个 poller 可能被多个线程共享（如 compare.py 并发查询）
+        self._lock = threading.Lock()
+
+    def estimate(self, key):
+        return self._estimates.get(key)
+
+    def observe(self, key, seconds):
+        """把一次实际完成耗时合并进该 key 的估计值"""
+        with self._lock:
+            prev = self._estimates.pop(key, None)
+            if prev is None:
+                self._estimates[key] = seconds
+            else:
+                self._estimates[key] = prev + self.ewma_alpha * (seconds - prev)
+            while len(self._estimates) > self.max_tracked_keys:
+                self._estimates.popitem(last=False)
+
+    def next_delay(self, key, attempt, elapsed):
+        """第 attempt+1 次探测前需要等待的秒数；预算耗尽时返回 None"""
+        if attempt >= self.max_attempts:
+            return None
+        remaining = self.deadline - elapsed
+        if remaining <= 0:
+            return None
+        if attempt == 0:
+            delay = self.first_delay
+        else:
+            delay = min(self.max_delay, self.base_delay * (self.factor ** (attempt - 1)))
+            est = self._estimates.get(key)
+            if est is not None and elapsed < est:
+                delay = max(delay, min(self.max_delay, 0.9 * est - elapsed))
+            if self.jitter:
+                delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(0.0, min(delay, remaining))
+
+    def run(self, key):
+        return PollRun(self, key)
+
+
+class PollRun(object):
+    """探测次数迭代器：for attempt in poller.run(key)；拿到完整结果后调用 mark_done()"""
+
+    def __init__(self, poller, key):
+        self.poller = poller
+        self.key = key
+        self.attempt = 0
+        self.started_at = time.time()
+
+    @property
+    def elapsed(self):
+        return time.time() - self.started_at
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        delay = self.poller.next_delay(self.key, self.attempt, self.elapsed)
+        if delay is None:
+            raise StopIteration
+        if delay > 0:
+            time.sleep(delay)
+        self.attempt += 1
+        return self.attempt
+
+    next = __next__  # Python 2
+
+    def mark_done(self):
+        self.poller.observe(self.key, self.elapsed)
@@ -11,6 +11,7 @@ from .ab_report import (
     get_grouped_summary,
 )
 from .comparison import ComparisonAnalyzer
+from .stats import compute_lift_stats, format_ci, overall_ab_metrics
 
 __all__ = [
     "DIMENSION_COLUMNS",
@@ -22,4 +23,7 @@ __all__ = [
     "get_metric_columns",
     "get_grouped_summary",
     "ComparisonAnalyzer",
+    "compute_lift_stats",
+    "format_ci",
+    "overall_ab_metrics",
 ]
@@ -6,6 +6,15 @@ AB 报告解析（ab-platform skill 内嵌）
 
 from __future__ import absolute_import, division, unicode_literals
 
+from collections import OrderedDict
+from operator import itemgetter
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
 DIMENSION_COLUMNS = {
     "group_prefix", "group_name", "abtest_group",
     "abtest_region", "abtest_date", "card_type", "sort_type",
@@ -83,6 +92,25 @@ def _compute_lift(treatment_agg, control_agg, metric_cols):
     return lifts
 
 
+def _relative_lifts(row, metric_cols):
+    """单行 relative 的 (abtest_group, {metric: float})；对照组 / 无 group / 无有效值时返回 None"""
+    gid = (row.get("abtest_group") or "").strip()
+    if not gid or _is_control_row(row):
+        return None
+    lifts = {}
+    for metric in metric_cols:
+        v = row.get(metric)
+        if v is None or v == "":
+            continue
+        try:
+            lifts[metric] = float(v)
+        except (ValueError, TypeError):
+            pass
+    if not lifts:
+        return None
+    return gid, lifts
+
+
 def _build_relative_map(relative_rows, metric_cols):
     """
     从 API 返回的 relative 行构建 {abtest_group: {metric: float}} 查找表。
@@ -90,27 +118,14 @@ def _build_relative_map(relative_rows, metric_cols):
     """
     rmap = {}
     for row in (relative_rows or []):
-        gid = (row.get("abtest_group") or "").strip()
-        if not gid:
-            continue
-        if _is_control_row(row):
-            continue
-        lifts = {}
-        for metric in metric_cols:
-            v = row.get(metric)
-            if v is None or v == "":
-                continue
-            try:
-                lifts[metric] = float(v)
-            except (ValueError, TypeError):
-                pass
-        if lifts:
-            rmap[gid] = lifts
+        entry = _relative_lifts(row, metric_cols)
+        if entry:
+            rmap[entry[0]] = entry[1]
     return rmap
 
 
-def _get_lift_for_group(group, control_agg, metric_cols, relative_map):
-    """优先用 API relative 预计算 lift；无则从绝对值计算"""
+def _api_lifts(group, metric_cols, relative_map):
+    """该组在 API relative 中的预计算 lift（只保留 metric_cols 内的指标）；没有则返回 None"""
     gid = group.get("abtest_group", "")
     api_lifts = relative_map.get(gid) if relative_map else None
     if api_lifts:
@@ -120,7 +135,59 @@ def _get_lift_for_group(group, control_agg, metric_cols, relative_map):
                 result[metric] = api_lifts[metric]
         if result:
             return result
-    return _compute_lift(group["agg"], control_agg, metric_cols)
+    return None
+
+
+def _get_lift_for_group(group, control_agg, metric_cols, relative_map):
+    """优先用 API relative 预计算 lift；无则从绝对值计算"""
+    return _api_lifts(group, metric_cols, relative_map) or \
+        _compute_lift(group["agg"], control_agg, metric_cols)
+
+
+def _row_gid(row):
+    gid = (row.get("abtest_group") or "").strip()
+    if not gid:
+        gid = (row.get("group_prefix") or row.get("group_name") or "").strip() or "_"
+    return gid
+
+
+def _row_date(row):
+    return (row.get("abtest_date") or "").strip()
+
+
+def _describe_group(gid, rows, agg, bucket_map, control_ids):
+    """由组 ID 与该组的行构建分组条目（标签 / 对照标记 / 桶名）"""
+    is_control = _is_control_row(rows[0])
+    is_control_bucket = (not is_control) and (gid in control_ids)
+    bucket_name = bucket_map.get(gid, "")
+    if gid == "_":
+        label = rows[0].get("group_prefix") or rows[0].get("group_name") or "Unknown"
+    elif gid.isdigit() or (gid and gid.lstrip("-").isdigit()):
+        if bucket_name:
+            label = "%s (%s)" % (bucket_name, gid)
+        else:
+            label = "Control (%s)" % gid if is_control else "Treatment (%s)" % gid
+    elif ";" in gid and bucket_map:
+        parts = [p.strip() for p in gid.split(";") if p.strip()]
+        mapped = [bucket_map.get(p, p) for p in parts]
+        bucket_name = ";".join(mapped)
+        label = "%s (%s)" % (bucket_name, gid)
+    else:
+        label = gid
+    return {
+        "group_key": label,
+        "abtest_group": gid if gid != "_" else "",
+        "bucket_name": bucket_name,
+        "is_control": is_control,
+        "is_control_bucket": is_control_bucket,
+        "rows": rows,
+        "agg": agg,
+    }
+
+
+def _group_sort_key(group):
+    # 与 reverse=True 配合：Control 放最前
+    return (group["is_control"], group["abtest_group"])
 
 
 def group_body_by_experiment_group(body, metric_cols, bucket_map=None, control_group_ids=None):
@@ -134,9 +201,7 @@ def group_body_by_experiment_group(body, metric_cols, bucket_map=None, control_g
     _ctrl_ids = set(str(x) for x in (control_group_ids or []))
     by_group = {}
     for row in body:
-        gid = (row.get("abtest_group") or "").strip()
-        if not gid:
-            gid = (row.get("group_prefix") or row.get("group_name") or "").strip() or "_"
+        gid = _row_gid(row)
         if gid not in by_group:
             by_group[gid] = []
         by_group[gid].append(row)
@@ -145,65 +210,289 @@ def group_body_by_experiment_group(body, metric_cols, bucket_map=None, control_g
     for gid, rows in by_group.items():
         if not rows:
             continue
-        is_control = _is_control_row(rows[0])
-        is_control_bucket = (not is_control) and (gid in _ctrl_ids)
-        bucket_name = bucket_map.get(gid, "")
-        if gid == "_":
-            label = rows[0].get("group_prefix") or rows[0].get("group_name") or "Unknown"
-        elif gid.isdigit() or (gid and gid.lstrip("-").isdigit()):
-            if bucket_name:
-                label = "%s (%s)" % (bucket_name, gid)
-            else:
-                label = "Control (%s)" % gid if is_control else "Treatment (%s)" % gid
-        elif ";" in gid and bucket_map:
-            parts = [p.strip() for p in gid.split(";") if p.strip()]
-            mapped = [bucket_map.get(p, p) for p in parts]
-            bucket_name = ";".join(mapped)
-            label = "%s (%s)" % (bucket_name, gid)
-        else:
-            label = gid
-        result.append({
-            "group_key": label,
-            "abtest_group": gid if gid != "_" else "",
-            "bucket_name": bucket_name,
-            "is_control": is_control,
-            "is_control_bucket": is_control_bucket,
-            "rows": rows,
-            "agg": _aggregate_metrics(rows, metric_cols),
-        })
-    # Control 放最前
-    result.sort(key=lambda x: (x["is_control"], x["abtest_group"]), reverse=True)
+        result.append(_describe_group(gid, rows, _aggregate_metrics(rows, metric_cols), bucket_map, _ctrl_ids))
+    result.sort(key=_group_sort_key, reverse=True)
     return result
 
 
+def _to_matrix(rows, metric_cols):
+    """
+    指标列 → (float64 矩阵, present 布尔矩阵)，形状均为 行 × 指标。
+    present 标记 float() 解析成功的单元格；缺失 / 无法解析的单元格在矩阵中填 NaN 且 present 为 False。
+    值本身为 "nan" 的单元格 present 为 True，与纯 Python 路径一样参与求和（结果为 nan）。
+    """
+    n, m = len(rows), len(metric_cols)
+    cells = np.empty((n, m), dtype=object)
+    try:
+        getter = itemgetter(*metric_cols)
+        if m == 1:
+            cells[:, 0] = [getter(row) for row in rows]
+        else:
+            cells[:, :] = [getter(row) for row in rows]
+    except KeyError:
+        # 部分行缺列（原始行比表头短）
+        cells[:, :] = [[row.get(metric) for metric in metric_cols] for row in rows]
+    missing = np.equal(cells, None) | np.equal(cells, "")
+    cells[missing] = np.nan
+    present = ~missing
+    try:
+        # object → float 对每个单元格调用 float()，解析规则与纯 Python 路径相同
+        return cells.astype(float), present
+    except (ValueError, TypeError):
+        pass
+    matrix = np.full((n, m), np.nan)
+    for j in range(m):
+        try:
+            matrix[:, j] = cells[:, j].astype(float)
+            continue
+        except (ValueError, TypeError):
+            pass
+        # 该列夹杂非数字时逐个单元格解析，解析失败的单元格记为缺失
+        for i, v in enumerate(cells[:, j].tolist()):
+            try:
+                matrix[i, j] = float(v)
+            except (ValueError, TypeError):
+                present[i, j] = False
+    return matrix, present
+
+
+def _lift_matrix(t_sums, t_got, c_sums, c_got):
+    """向量化的 _compute_lift：缺失值按 0 处理，control 为 0 时 lift 记 0.0"""
+    c = np.where(c_got, c_sums, 0.0)
+    t = np.where(t_got, t_sums, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(c != 0, (t - c) / c, 0.0)
+
+
+class _GroupView(object):
+    """某个时间范围（全部天数或单日）内的分组结果；sums / got 与 groups 逐行对齐（纯 Python 回退时为 None）"""
+
+    def __init__(self, metric_cols, groups, sums=None, got=None):
+        self.metric_cols = metric_cols
+        self.groups = groups
+        self.sums = sums
+        self.got = got
+        self.control_pos = next((k for k, g in enumerate(groups) if g["is_control"]), None)
+
+    @property
+    def control(self):
+        return self.groups[self.control_pos] if self.control_pos is not None else None
+
+    def lifts(self, relative_map):
+        """各组相对 Control 的 lift（与 groups 对齐，对照组本身为 None）；优先使用 API relative"""
+        control = self.control
+        if control is None:
+            return [None] * len(self.groups)
+        if self.sums is not None:
+            k = self.control_pos
+            computed = _lift_matrix(self.sums, self.got, self.sums[k], self.got[k]).tolist()
+        result = []
+        for k, g in enumerate(self.groups):
+            if g["is_control"]:
+                result.append(None)
+                continue
+            lifts = _api_lifts(g, self.metric_cols, relative_map)
+            if not lifts:
+                if self.sums is not None:
+                    lifts = dict(zip(self.metric_cols, computed[k]))
+                else:
+                    lifts = _compute_lift(g["agg"], control["agg"], self.metric_cols)
+            result.append(lifts)
+        return result
+
+    def overall_treatment(self):
+        """真正的实验组（不含对照桶个体）汇总及其相对 Control 的 lift；无 Control 数据时返回 None"""
+        control = self.control
+        control_agg = control["agg"] if control else {}
+        picked = [k for k, g in enumerate(self.groups)
+                  if not g["is_control"] and not g.get("is_control_bucket")]
+        if not picked or not control_agg:
+            return None
+        if self.sums is None:
+            total_agg = {}
+            for metric in self.metric_cols:
+                total_agg[metric] = sum(self.groups[k]["agg"].get(metric, 0) for k in picked)
+            return {"agg": total_agg, "lift_vs_control": _compute_lift(total_agg, control_agg, self.metric_cols)}
+        # 按组顺序逐个累加，保证与纯 Python 路径的浮点结果一致
+        total = np.zeros(len(self.metric_cols))
+        with np.errstate(invalid="ignore"):
+            # inf + (-inf) 得到 nan，与纯 Python 一致，不需要告警
+            for k in picked:
+                total += np.where(self.got[k], self.sums[k], 0.0)
+        c = self.control_pos
+        lifts = _lift_matrix(total, True, self.sums[c], self.got[c])
+        # 所有实验组都没有值的指标保持纯 Python 路径里 sum() 的整数 0
+        any_got = self.got[picked].any(axis=0).tolist()
+        totals = [v if g else 0 for v, g in zip(total.tolist(), any_got)]
+        return {
+            "agg": dict(zip(self.metric_cols, totals)),
+            "lift_vs_control": dict(zip(self.metric_cols, lifts.tolist())),
+        }
+
+
+class _ReportFrame(object):
+    """
+    一份报告的分析视图：body / relative 各只遍历一次，按 (实验组, 日期) 建立行索引，
+    汇总视图与分天视图共用。安装了 NumPy 时指标值一次性转成 float 矩阵及 present 掩码，
+    分组求和与 lift 用数组运算完成；否则回退到逐行的纯 Python 实现，输出一致。
+    """
+
+    def __init__(self, parsed_data, bucket_map=None, control_group_ids=None, use_numpy=None):
+        self.metric_cols = get_metric_columns(parsed_data.get("columns", []))
+        self.body = parsed_data.get("body", []) or []
+        self.relative = parsed_data.get("relative", []) or []
+        self.bucket_map = bucket_map or {}
+        self.control_ids = set(str(x) for x in (control_group_ids or []))
+        if use_numpy is None:
+            use_numpy = HAS_NUMPY
+        self.use_numpy = bool(use_numpy and self.metric_cols and self.body)
+
+        self._gids = [_row_gid(row) for row in self.body]
+        self._rows_by_date = OrderedDict()
+        for i, row in enumerate(self.body):
+            date = _row_date(row)
+            if date:
+                self._rows_by_date.setdefault(date, []).append(i)
+        self.dates = sorted(self._rows_by_date)
+        self._relative_maps = None
+        self._views = {}
+
+        self._matrix = None
+        if self.use_numpy:
+            self._matrix, self._valid = _to_matrix(self.body, self.metric_cols)
+            self._filled = np.where(self._valid, self._matrix, 0.0)
+            self._gid_codes = {}
+            self._codes = np.array([self._gid_codes.setdefault(g, len(self._gid_codes)) for g in self._gids],
+                                   dtype=np.intp)
+            self._daily = None
+
+    def view(self, date=None):
+        """date 为 None 时返回全部天数的分组，否则只含该日期的行"""
+        if date not in self._views:
+            if date is None:
+                index = range(len(self.body))
+            else:
+                index = self._rows_by_date.get(date, [])
+            self._views[date] = self._build_view(index, date)
+        return self._views[date]
+
+    def _group_sums(self, codes, n, rows=None):
+        """按 codes 分桶求和 → (sums, got)，形状 n × 指标数。
+        bincount 按行顺序逐个累加，结果与 _aggregate_metrics 逐位一致。"""
+        filled, valid = self._filled, self._valid
+        if rows is not None:
+            filled, valid = filled[rows], valid[rows]
+        m = len(self.metric_cols)
+        sums = np.empty((n, m))
+        got = np.empty((n, m), dtype=bool)
+        for j in range(m):
+            sums[:, j] = np.bincount(codes, weights=filled[:, j], minlength=n)
+            got[:, j] = np.bincount(codes, weights=valid[:, j], minlength=n) > 0
+        return sums, got
+
+    def _sums_for(self, date):
+        """全部天数或某一天的 (sums, got)，行号为全局组编号"""
+        n_groups = len(self._gid_codes)
+        if date is None:
+            return self._group_sums(self._codes, n_groups)
+        if self._daily is None:
+            # 所有日期一次算完：编号 = 日期序号 × 组数 + 组编号
+            date_pos = dict((d, k) for k, d in enumerate(self.dates))
+            rows = np.array([i for d in self.dates for i in self._rows_by_date[d]], dtype=np.intp)
+            day = np.array([date_pos[d] for d in self.dates for _i in self._rows_by_date[d]], dtype=np.intp)
+            sums, got = self._group_sums(day * n_groups + self._codes[rows], len(self.dates) * n_groups, rows)
+            shape = (len(self.dates), n_groups, len(self.metric_cols))
+            self._daily = (date_pos, sums.reshape(shape), got.reshape(shape))
+        date_pos, sums, got = self._daily
+        return sums[date_pos[date]], got[date_pos[date]]
+
+    def _build_view(self, index, date):
+        by_group = OrderedDict()
+        for i in index:
+            by_group.setdefault(self._gids[i], []).append(i)
+
+        if self._matrix is None or not by_group:
+            groups = []
+            for gid, idx in by_group.items():
+                rows = [self.body[i] for i in idx]
+                groups.append(_describe_group(gid, rows, _aggregate_metrics(rows, self.metric_cols),
+                                              self.bucket_map, self.control_ids))
+            groups.sort(key=_group_sort_key, reverse=True)
+            return _GroupView(self.metric_cols, groups)
+
+        sums, got = self._sums_for(date)
+        groups = []
+        for gid, idx in by_group.items():
+            code = self._gid_codes[gid]
+            values = sums[code].tolist()
+            ok = got[code].tolist()
+            agg = dict((metric, values[j]) for j, metric in enumerate(self.metric_cols) if ok[j])
+            group = _describe_group(gid, [self.body[i] for i in idx], agg, self.bucket_map, self.control_ids)
+            groups.append((group, code))
+        groups.sort(key=lambda x: _group_sort_key(x[0]), reverse=True)
+        order = [code for _g, code in groups]
+        return _GroupView(self.metric_cols, [g for g, _code in groups], sums[order], got[order])
+
+    def relative_map(self, date=None):
+        """{abtest_group: {metric: lift}}；date 不为 None 时只用该日期的 relative 行"""
+        if self._relative_maps is None:
+            self._relative_maps = self._build_relative_maps()
+        return self._relative_maps.get(date, {})
+
+    def _build_relative_maps(self):
+        """一次遍历 relative，得到全部天数（键 None）及每个日期的查找表；同组靠后的行覆盖靠前的"""
+        maps = {None: {}}
+        if not self.use_numpy or not self.relative:
+            for row in self.relative:
+                entry = _relative_lifts(row, self.metric_cols)
+                if entry:
+                    maps[None][entry[0]] = entry[1]
+                    maps.setdefault(_row_date(row), {})[entry[0]] = entry[1]
+            return maps
+        matrix, valid = _to_matrix(self.relative, self.metric_cols)
+        has_value = valid.any(axis=1).tolist()
+        for i, row in enumerate(self.relative):
+            gid = (row.get("abtest_group") or "").strip()
+            if not gid or not has_value[i] or _is_control_row(row):
+                continue
+            maps[None][gid] = i
+            maps.setdefault(_row_date(row), {})[gid] = i
+        # 只为最终生效的行构建 {metric: lift}
+        lifts = {}
+        for rmap in maps.values():
+            for gid, i in rmap.items():
+                if i not in lifts:
+                    values = matrix[i].tolist()
+                    ok = valid[i].tolist()
+                    lifts[i] = dict((metric, values[j]) for j, metric in enumerate(self.metric_cols) if ok[j])
+                rmap[gid] = lifts[i]
+        return maps
+
+
 def format_ab_summary(parsed_data, experiment_id=0, bucket_map=None, control_group_ids=None):
     if not parsed_data or "columns" not in parsed_data:
         return "无数据"
-    columns = parsed_data["columns"]
-    body = parsed_data.get("body", [])
-    relative = parsed_data.get("relative", [])
-    metric_cols = get_metric_columns(columns)
-    relative_map = _build_relative_map(relative, metric_cols)
+    frame = _ReportFrame(parsed_data, bucket_map=bucket_map, control_group_ids=control_group_ids)
+    metric_cols = frame.metric_cols
 
     lines = []
     if experiment_id:
         lines.append("实验 %s 指标概览" % experiment_id)
         lines.append("=" * 50)
 
-    groups = group_body_by_experiment_group(body, metric_cols, bucket_map=bucket_map,
-                                           control_group_ids=control_group_ids)
-    control_group = next((g for g in groups if g["is_control"]), None)
+    view = frame.view()
+    control_group = view.control
     control_agg = control_group["agg"] if control_group else {}
+    all_lifts = view.lifts(frame.relative_map())
 
     lines.append("\n【按实验组】")
-    for g in groups:
+    for g, lifts in zip(view.groups, all_lifts):
         lines.append("\n  %s（汇总）:" % g["group_key"])
         for metric in metric_cols:
             if metric in g["agg"]:
                 val = g["agg"][metric]
                 lines.append("    %s: %s" % (metric, _fmt_val(val)))
         if not g["is_control"] and control_agg:
-            lifts = _get_lift_for_group(g, control_agg, metric_cols, relative_map)
             lines.append("    相对 Control:")
             for metric in metric_cols:
                 if metric in lifts:
@@ -216,18 +505,16 @@ def format_ab_summary(parsed_data, experiment_id=0, bucket_map=None, control_gro
                     lines.append("      %s: %s" % (metric, row[metric]))
 
     # 总体 Treatment：只包含真正的实验组（排除控制桶个体）
-    real_treatments = [g for g in groups if not g["is_control"] and not g.get("is_control_bucket")]
-    if real_treatments and control_agg:
+    overall = view.overall_treatment()
+    if overall:
         lines.append("\n【总体 Treatment（实验组汇总，不含对照桶）】")
-        total_treatment_agg = {}
-        for metric in metric_cols:
-            total_treatment_agg[metric] = sum(g["agg"].get(metric, 0) for g in real_treatments)
+        total_treatment_agg = overall["agg"]
         lines.append("  汇总指标:")
         for metric in metric_cols:
             if metric in total_treatment_agg:
                 val = total_treatment_agg[metric]
                 lines.append("    %s: %s" % (metric, _fmt_val(val)))
-        lifts = _compute_lift(total_treatment_agg, control_agg, metric_cols)
+        lifts = overall["lift_vs_control"]
         lines.append("  相对 Control 提升:")
         for metric in metric_cols:
             if metric in lifts:
@@ -242,19 +529,13 @@ def get_grouped_summary(parsed_data, bucket_map=None, control_group_ids=None):
     """
     if not parsed_data or "columns" not in parsed_data:
         return {"by_group": [], "overall_treatment": None}
-    columns = parsed_data.get("columns", [])
-    body = parsed_data.get("body", [])
-    relative = parsed_data.get("relative", [])
-    metric_cols = get_metric_columns(columns)
-    relative_map = _build_relative_map(relative, metric_cols)
-
-    groups = group_body_by_experiment_group(body, metric_cols, bucket_map=bucket_map,
-                                           control_group_ids=control_group_ids)
-    control_group = next((g for g in groups if g["is_control"]), None)
+    frame = _ReportFrame(parsed_data, bucket_map=bucket_map, control_group_ids=control_group_ids)
+    view = frame.view()
+    control_group = view.control
     control_agg = control_group["agg"] if control_group else {}
 
     by_group = []
-    for g in groups:
+    for g, lifts in zip(view.groups, view.lifts(frame.relative_map())):
         item = {
             "group_key": g["group_key"],
             "abtest_group": g["abtest_group"],
@@ -265,21 +546,10 @@ def get_grouped_summary(parsed_data, bucket_map=None, control_group_ids=None):
             "lift_vs_control": None,
         }
         if not g["is_control"] and control_agg:
-            item["lift_vs_control"] = _get_lift_for_group(g, control_agg, metric_cols, relative_map)
+            item["lift_vs_control"] = lifts
         by_group.append(item)
 
-    overall_treatment = None
-    real_treatments = [g for g in groups if not g["is_control"] and not g.get("is_control_bucket")]
-    if real_treatments and control_agg:
-        total_agg = {}
-        for metric in metric_cols:
-            total_agg[metric] = sum(g["agg"].get(metric, 0) for g in real_treatments)
-        overall_treatment = {
-            "agg": total_agg,
-            "lift_vs_control": _compute_lift(total_agg, control_agg, metric_cols),
-        }
-
-    return {"by_group": by_group, "overall_treatment": overall_treatment}
+    return {"by_group": by_group, "overall_treatment": view.overall_treatment()}
 
 
 def format_lift_report(parsed_data, experiment_id=0, show_absolute=False,
@@ -290,33 +560,25 @@ def format_lift_report(parsed_data, experiment_id=0, show_absolute=False,
     """
     if not parsed_data or "columns" not in parsed_data:
         return "无数据"
-    columns = parsed_data["columns"]
-    body = parsed_data.get("body", [])
-    relative = parsed_data.get("relative", [])
-    metric_cols = get_metric_columns(columns)
-    relative_map = _build_relative_map(relative, metric_cols)
+    frame = _ReportFrame(parsed_data, bucket_map=bucket_map, control_group_ids=control_group_ids)
+    metric_cols = frame.metric_cols
 
     lines = []
     if experiment_id:
         lines.append("实验 %s 指标概览" % experiment_id)
         lines.append("=" * 50)
 
-    _grp_kwargs = dict(bucket_map=bucket_map, control_group_ids=control_group_ids)
-    groups = group_body_by_experiment_group(body, metric_cols, **_grp_kwargs)
-    control_group = next((g for g in groups if g["is_control"]), None)
-    individual_groups = [g for g in groups if not g["is_control"]]
-
-    if not control_group:
+    view = frame.view()
+    if not view.control:
         lines.append("未找到对照组数据")
         return "\n".join(lines)
 
-    control_agg = control_group["agg"]
-
     # ── 汇总（全部天数）──
     lines.append("\n【汇总（全部天数）】相对 Control 提升")
 
-    for tg in individual_groups:
-        lifts = _get_lift_for_group(tg, control_agg, metric_cols, relative_map)
+    for tg, lifts in zip(view.groups, view.lifts(frame.relative_map())):
+        if tg["is_control"]:
+            continue
         tag = " [对照桶]" if tg.get("is_control_bucket") else ""
         lines.append("\n  %s%s:" % (tg["group_key"], tag))
         for metric in metric_cols:
@@ -328,31 +590,21 @@ def format_lift_report(parsed_data, experiment_id=0, show_absolute=False,
                     lines.append("    %s: %s" % (metric, format_lift(lifts[metric])))
 
     # ── 分天统计 ──
-    all_dates = sorted(set(
-        (row.get("abtest_date") or "").strip()
-        for row in body if (row.get("abtest_date") or "").strip()
-    ))
-
-    if all_dates:
+    if frame.dates:
         lines.append("\n【分天统计】相对 Control 提升")
-        for date in all_dates:
-            date_rows = [r for r in body if (r.get("abtest_date") or "").strip() == date]
-            date_relative = [r for r in relative if (r.get("abtest_date") or "").strip() == date]
-            date_relative_map = _build_relative_map(date_relative, metric_cols)
-            date_groups = group_body_by_experiment_group(date_rows, metric_cols, **_grp_kwargs)
-            date_control = next((g for g in date_groups if g["is_control"]), None)
-            if not date_control:
+        for date in frame.dates:
+            date_view = frame.view(date)
+            if not date_view.control:
                 lines.append("\n  %s: (无对照组数据)" % date)
                 continue
-            date_control_agg = date_control["agg"]
-            date_individuals = [g for g in date_groups if not g["is_control"]]
-            if not date_individuals:
+            date_lifts = [(g, lifts) for g, lifts in zip(date_view.groups, date_view.lifts(frame.relative_map(date)))
+                          if not g["is_control"]]
+            if not date_lifts:
                 continue
 
             lines.append("\n  %s:" % date)
 
-            for tg in date_individuals:
-                lifts = _get_lift_for_group(tg, date_control_agg, metric_cols, date_relative_map)
+            for tg, lifts in date_lifts:
                 tag = " [对照桶]" if tg.get("is_control_bucket") else ""
                 lift_strs = []
                 for metric in metric_cols:
@@ -374,31 +626,17 @@ def get_daily_lift_summary(parsed_data, bucket_map=None, control_group_ids=None)
     """
     if not parsed_data or "columns" not in parsed_data:
         return []
-    columns = parsed_data["columns"]
-    body = parsed_data.get("body", [])
-    relative = parsed_data.get("relative", [])
-    metric_cols = get_metric_columns(columns)
-    _grp_kwargs = dict(bucket_map=bucket_map, control_group_ids=control_group_ids)
-
-    all_dates = sorted(set(
-        (row.get("abtest_date") or "").strip()
-        for row in body if (row.get("abtest_date") or "").strip()
-    ))
+    frame = _ReportFrame(parsed_data, bucket_map=bucket_map, control_group_ids=control_group_ids)
 
     daily = []
-    for date in all_dates:
-        date_rows = [r for r in body if (r.get("abtest_date") or "").strip() == date]
-        date_relative = [r for r in relative if (r.get("abtest_date") or "").strip() == date]
-        date_relative_map = _build_relative_map(date_relative, metric_cols)
-        date_groups = group_body_by_experiment_group(date_rows, metric_cols, **_grp_kwargs)
-        date_control = next((g for g in date_groups if g["is_control"]), None)
-        if not date_control:
+    for date in frame.dates:
+        date_view = frame.view(date)
+        if not date_view.control:
             continue
-        date_control_agg = date_control["agg"]
-        date_individuals = [g for g in date_groups if not g["is_control"]]
         day_lifts = []
-        for tg in date_individuals:
-            lifts = _get_lift_for_group(tg, date_control_agg, metric_cols, date_relative_map)
+        for tg, lifts in zip(date_view.groups, date_view.lifts(frame.relative_map(date))):
+            if tg["is_control"]:
+                continue
             day_lifts.append({
                 "group": tg["group_key"],
                 "abtest_group": tg["abtest_group"],
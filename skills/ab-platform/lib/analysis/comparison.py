@@ -6,6 +6,8 @@
 
 from __future__ import absolute_import, division
 
+from .stats import compute_lift_stats, overall_ab_metrics
+
 try:
     import numpy as np
     HAS_NUMPY = True
@@ -25,18 +27,27 @@ class ComparisonAnalyzer(object):
             data = exp_result.get("data", {})
             relative = data.get("relative", [])
             columns = data.get("columns", [])
+            # 有本地显著性结果（compute_lift_stats）时，按 abtest_group 附上 p 值与区间
+            stats_by_group = dict((g["abtest_group"], g["metrics"])
+                                  for g in (exp_result.get("stats") or {}).get("groups", []))
             for rel_row in relative:
                 prefix = (rel_row.get("group_prefix") or "").lower()
                 name = rel_row.get("group_prefix", "")
                 if prefix.startswith("treatment") or name != "Control Group":
                     row_data = {"experiment_id": exp_id}
                     target_metrics = metric_names or [c for c in columns if c not in dim_cols]
+                    group_stats = stats_by_group.get((rel_row.get("abtest_group") or "").strip(), {})
                     for metric in target_metrics:
                         if metric in rel_row:
                             try:
                                 row_data["%s_lift" % metric] = float(rel_row[metric])
                             except (ValueError, TypeError):
                                 row_data["%s_lift" % metric] = rel_row[metric]
+                        ms = group_stats.get(metric)
+                        if ms and ms.get("p_value") is not None:
+                            row_data["%s_p_value" % metric] = ms["p_value"]
+                            row_data["%s_ci" % metric] = [ms["ci_low"], ms["ci_high"]]
+                            row_data["%s_significant" % metric] = ms["significant"]
                     comparison_table.append(row_data)
         return {"comparison_table": comparison_table, "experiment_count": len(results)}
 
@@ -45,6 +56,7 @@ class ComparisonAnalyzer(object):
         experiments_data,
         metric_name="conversion_rate",
         metric_key="lift",
+        alpha=0.05,
     ):
         ranked = []
         for exp in experiments_data:
@@ -54,6 +66,26 @@ class ComparisonAnalyzer(object):
             if isinstance(metric_data, dict):
                 value = metric_data.get(metric_key, 0)
                 p_value = metric_data.get("p_value", 1.0)
+                if value is None:
+                    continue
+                if p_value is None:
+                    p_value = 1.0
                 ranked.append({"experiment_id": exp_id, "value": value, "p_value": p_value, "data": exp})
-        ranked.sort(key=lambda x: (x["p_value"] >= 0.05, -x["value"]))
+        ranked.sort(key=lambda x: (x["p_value"] >= alpha, -x["value"]))
         return ranked
+
+    @staticmethod
+    def rank_by_significance(results, metric_name, alpha=0.05, **stats_kwargs):
+        """
+        按本地计算的显著性给实验排序：显著的排前，其次按“总体 Treatment”lift 从高到低。
+        results 为 [{"experiment_id", "data", 可选 "stats"}]；缺 stats 时就地用 body 行计算，不请求平台。
+        """
+        experiments = []
+        for exp_result in results:
+            if exp_result.get("stats") is None:
+                exp_result["stats"] = compute_lift_stats(exp_result.get("data") or {}, alpha=alpha, **stats_kwargs)
+            experiments.append({
+                "id": exp_result.get("experiment_id", "unknown"),
+                "ab_metrics": overall_ab_metrics(exp_result["stats"]),
+            })
+        return ComparisonAnalyzer.rank_experiments(experiments, metric_name=metric_name, alpha=alpha)
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+AB 指标显著性（ab-platform skill 内嵌）
+兼容 Python 2.7.18 / Python 3.x
+
+直接用 parse_summary_data 返回的 body 行估计置信区间，不再额外请求平台：
+- 同一 (日期, 地区, card_type, sort_type) 单元格内各组的值视为一次配对观测；
+- lift 定义为 (Σx_t / Σy_t) / (Σx_c / Σy_c) - 1。普通求和指标 y ≡ 1；
+  比率指标（如 gmv_per_uu）由分子列反推分母 y = 分子 / 比率，按“比率之比”而不是单元格比率均值计算；
+- delta method：对 log(lift + 1) 线性化，单元格数较少时按 t 分布近似取分位数；
+  bootstrap：按单元格有放回重采样（四个序列同步），取百分位区间。
+NumPy 存在时所有 treatment × 指标一次向量化计算；否则回退为逐个循环的纯 Python delta method。
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import math
+import re
+import sys
+
+from .ab_report import DIMENSION_COLUMNS, format_lift, get_metric_columns, group_body_by_experiment_group
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# 构成一个观测单元格的维度列（除实验组以外的维度）
+UNIT_COLUMNS = ("abtest_date", "abtest_region", "card_type", "sort_type")
+# 比率指标 → 分子列；未列出的按 <分子>_per_<分母>[_后缀] 命名规则推断
+RATIO_NUMERATORS = {
+    "gmv_per_uu": "gmv",
+    "gmv_per_uu_995": "gmv_995",
+    "order_per_uu": "order_cnt",
+}
+# 少于该数量的配对单元格时不给区间 / p 值
+MIN_UNITS = 3
+OVERALL_KEY = "__overall__"
+
+_RATIO_RE = re.compile(r"^(.+?)_per_[a-z]+(_\w+)?$")
+
+
+def _stderr(msg):
+    try:
+        sys.stderr.write(msg)
+    except Exception:
+        pass
+
+
+def _num(v):
+    if v is None or v == "":
+        return None
+    try:
+        f = float(v)
+    except (ValueError, TypeError):
+        return None
+    return f if f == f else None
+
+
+def ratio_numerator(metric, columns):
+    """比率指标对应的分子列；不是比率指标或分子列不在 columns 中时返回 None"""
+    num = RATIO_NUMERATORS.get(metric)
+    if num is None:
+        m = _RATIO_RE.match(metric)
+        if m:
+            num = m.group(1) + (m.group(2) or "")
+            if num not in columns and (m.group(1) + "_cnt" + (m.group(2) or "")) in columns:
+                num = m.group(1) + "_cnt" + (m.group(2) or "")
+    if num and num != metric and num in columns:
+        return num
+    return None
+
+
+def _norm_ppf(p):
+    """标准正态分位数（二分法，无需 scipy）"""
+    lo, hi = -10.0, 10.0
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if 0.5 * math.erfc(-mid / math.sqrt(2)) < p:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def _t_quantile(z, df):
+    """由正态分位数 z 近似 t 分布分位数（Cornish-Fisher 展开）"""
+    z3, z5, z7, z9 = z ** 3, z ** 5, z ** 7, z ** 9
+    return (z + (z3 + z) / (4 * df) + (5 * z5 + 16 * z3 + 3 * z) / (96 * df ** 2)
+            + (3 * z7 + 19 * z5 + 17 * z3 - 15 * z) / (384 * df ** 3)
+            + (79 * z9 + 776 * z7 + 1482 * z5 - 1920 * z3 - 945 * z) / (92160 * df ** 4))
+
+
+def _t_pvalue(t, df):
+    """双侧 t 检验 p 值：反解 _t_quantile 得到等价的正态分位数，与区间的取法保持一致"""
+    if t != t:
+        return None
+    t = abs(t)
+    lo, hi = 0.0, min(t, 40.0)
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if _t_quantile(mid, df) < t:
+            lo = mid
+        else:
+            hi = mid
+    return math.erfc((lo + hi) / 2 / math.sqrt(2))
+
+
+def _clean(v):
+    if v is None:
+        return None
+    v = float(v)
+    return v if v == v and abs(v) != float("inf") else None
+
+
+# ---- 从 body 行整理出配对观测 ----
+
+def _cell_values(rows, metrics, numerators, unit_cols):
+    """{unit: [(x, y) 或 None, ...]}：同一单元格多行时求和；任一行缺值则该单元格该指标记缺失"""
+    cells = {}
+    for row in rows:
+        unit = tuple((row.get(c) or "").strip() for c in unit_cols)
+        acc = cells.get(unit)
+        if acc is None:
+            acc = cells[unit] = [(0.0, 0.0)] * len(metrics)
+        for j, metric in enumerate(metrics):
+            if acc[j] is None:
+                continue
+            v = _num(row.get(metric))
+            num_col = numerators[j]
+            if num_col is None:
+                xy = (v, 1.0) if v is not None else None
+            else:
+                x = _num(row.get(num_col))
+                xy = (x, x / v) if (x and v) else None
+            acc[j] = (acc[j][0] + xy[0], acc[j][1] + xy[1]) if xy else None
+    return cells
+
+
+def _collect(parsed_data, metrics, bucket_map, control_group_ids):
+    columns = parsed_data.get("columns", []) or []
+    body = parsed_data.get("body", []) or []
+    metric_cols = [m for m in (metrics or get_metric_columns(columns)) if m not in DIMENSION_COLUMNS]
+    groups = group_body_by_experiment_group(body, metric_cols, bucket_map=bucket_map,
+                                            control_group_ids=control_group_ids)
+    control = next((g for g in groups if g["is_control"]), None)
+    if control is None or not metric_cols:
+        return None
+    unit_cols = [c for c in UNIT_COLUMNS if c in columns]
+    numerators = [ratio_numerator(m, columns) for m in metric_cols]
+    units = sorted(_cell_values(control["rows"], metric_cols, numerators, unit_cols))
+
+    def _series(cells):
+        # 每个指标一组 (x 列表, y 列表)，按 units 对齐，缺失为 None
+        xs = [[None] * len(units) for _ in metric_cols]
+        ys = [[None] * len(units) for _ in metric_cols]
+        for u, unit in enumerate(units):
+            acc = cells.get(unit)
+            if acc is None:
+                continue
+            for j, xy in enumerate(acc):
+                if xy is not None:
+                    xs[j][u], ys[j][u] = xy
+        return xs, ys
+
+    treatments = [g for g in groups if not g["is_control"]]
+    series = [_series(_cell_values(g["rows"], metric_cols, numerators, unit_cols)) for g in treatments]
+    entries = [{
+        "group": g["group_key"],
+        "abtest_group": g["abtest_group"],
+        "bucket_name": g.get("bucket_name", ""),
+        "is_control_bucket": g.get("is_control_bucket", False),
+    } for g in treatments]
+
+    # 总体 Treatment：真正实验组（不含对照桶）逐单元格求和，任一组缺值则该单元格缺失
+    real = [k for k, g in enumerate(treatments) if not g.get("is_control_bucket")]
+    if real:
+        xs = [[None] * len(units) for _ in metric_cols]
+        ys = [[None] * len(units) for _ in metric_cols]
+        for j in range(len(metric_cols)):
+            for u in range(len(units)):
+                parts = [(series[k][0][j][u], series[k][1][j][u]) for k in real]
+                if all(x is not None for x, _y in parts):
+                    xs[j][u] = sum(x for x, _y in parts)
+                    ys[j][u] = sum(y for _x, y in parts)
+        series.append((xs, ys))
+        entries.append({"group": "总体 Treatment", "abtest_group": OVERALL_KEY,
+                        "bucket_name": "", "is_control_bucket": False})
+
+    return {
+        "metrics": metric_cols,
+        "numerators": numerators,
+        "units": units,
+        "control": _series(_cell_values(control["rows"], metric_cols, numerators, unit_cols)),
+        "treatments": series,
+        "entries": entries,
+    }
+
+
+# ---- delta method / bootstrap ----
+
+def _delta_one(xt, yt, xc, yc, z_crit):
+    """纯 Python：单个 treatment × 指标；返回 (lift, ci_low, ci_high, p_value, n)"""
+    pts = [(a, b, c, d) for a, b, c, d in zip(xt, yt, xc, yc)
+           if a is not None and b is not None and c is not None and d is not None]
+    n = len(pts)
+    if not n:
+        return None, None, None, None, 0
+    a = sum(p[0] for p in pts) / n
+    b = sum(p[1] for p in pts) / n
+    c = sum(p[2] for p in pts) / n
+    d = sum(p[3] for p in pts) / n
+    if not (a > 0 and b > 0 and c > 0 and d > 0):
+        lift = (a / b) / (c / d) - 1 if (b and c and d) else None
+        return lift, None, None, None, n
+    log_g = math.log(a * d / (b * c))
+    if n < MIN_UNITS:
+        return math.exp(log_g) - 1, None, None, None, n
+    zs = [(p[0] - a) / a - (p[1] - b) / b - (p[2] - c) / c + (p[3] - d) / d for p in pts]
+    se = math.sqrt(sum(z * z for z in zs) / (n - 1) / n)
+    if se <= 0:
+        return math.exp(log_g) - 1, None, None, None, n
+    q = _t_quantile(z_crit, n - 1)
+    return (math.exp(log_g) - 1, math.exp(log_g - q * se) - 1, math.exp(log_g + q * se) - 1,
+            _t_pvalue(log_g / se, n - 1), n)
+
+
+def _to_arrays(data):
+    nan = float("nan")
+
+    def _arr(rows):
+        return np.array([[nan if v is None else v for v in row] for row in rows], dtype=float)
+
+    xc, yc = _arr(data["control"][0]), _arr(data["control"][1])
+    xt = np.array([_arr(s[0]) for s in data["treatments"]])
+    yt = np.array([_arr(s[1]) for s in data["treatments"]])
+    mask = ~(np.isnan(xt) | np.isnan(yt) | np.isnan(xc) | np.isnan(yc))
+    return [np.where(mask, v, 0.0) for v in (xt, yt, np.broadcast_to(xc, xt.shape), np.broadcast_to(yc, xt.shape))], mask
+
+
+def _delta_arrays(data, z_crit):
+    """向量化 delta method：形状均为 (treatment, 指标)"""
+    (xt, yt, xc, yc), mask = _to_arrays(data)
+    n = mask.sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a, b, c, d = [v.sum(axis=-1) / n for v in (xt, yt, xc, yc)]
+        lift = (a / b) / (c / d) - 1
+        positive = (a > 0) & (b > 0) & (c > 0) & (d > 0)
+        log_g = np.where(positive, np.log(np.where(positive, a * d / (b * c), 1.0)), np.nan)
+        dev = ((xt - a[..., None]) / a[..., None] - (yt - b[..., None]) / b[..., None]
+               - (xc - c[..., None]) / c[..., None] + (yc - d[..., None]) / d[..., None])
+        se = np.sqrt((np.where(mask, dev, 0.0) ** 2).sum(axis=-1) / (n - 1) / n)
+    ok = positive & (n >= MIN_UNITS) & (se > 0)
+    q = np.array([[_t_quantile(z_crit, k - 1) if k >= MIN_UNITS else np.nan for k in row] for row in n.tolist()])
+    with np.errstate(invalid="ignore"):
+        lift = np.where(positive, np.exp(log_g) - 1, lift)
+        low = np.where(ok, np.exp(log_g - q * se) - 1, np.nan)
+        high = np.where(ok, np.exp(log_g + q * se) - 1, np.nan)
+        t = np.where(ok, log_g / se, np.nan)
+    p = [[_t_pvalue(tv, k - 1) if ok_v else None for tv, k, ok_v in zip(tr, nr, okr)]
+         for tr, nr, okr in zip(t.tolist(), n.tolist(), ok.tolist())]
+    return lift.tolist(), low.tolist(), high.tolist(), p, n.tolist()
+
+
+def _bootstrap_arrays(data, confidence, n_boot, seed):
+    """按单元格重采样：每次重采样对应一组单元格权重，所有 treatment × 指标共用"""
+    (xt, yt, xc, yc), mask = _to_arrays(data)
+    n_units = mask.shape[-1]
+    n = mask.sum(axis=-1)
+    rng = np.random.RandomState(seed)
+    weights = np.zeros((n_boot, n_units))
+    np.add.at(weights, (np.arange(n_boot)[:, None], rng.randint(0, n_units, size=(n_boot, n_units))), 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lift = (xt.sum(-1) / yt.sum(-1)) / (xc.sum(-1) / yc.sum(-1)) - 1
+        sxt, syt, sxc, syc = [np.einsum("tmu,bu->tmb", v, weights) for v in (xt, yt, xc, yc)]
+        boot = (sxt / syt) / (sxc / syc) - 1
+    boot = np.where(np.isfinite(boot), boot, np.nan)
+    ok = (n >= MIN_UNITS) & np.isfinite(boot).any(axis=-1)
+    tail = (1 - confidence) / 2 * 100
+    safe = np.where(ok[..., None], boot, 0.0)
+    low = np.where(ok, np.nanpercentile(safe, tail, axis=-1), np.nan)
+    high = np.where(ok, np.nanpercentile(safe, 100 - tail, axis=-1), np.nan)
+    valid = np.isfinite(boot).sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        below = (boot <= 0).sum(axis=-1) / valid
+        above = (boot >= 0).sum(axis=-1) / valid
+    p = np.where(ok, np.minimum(1.0, 2 * np.minimum(below, above)), np.nan)
+    return lift.tolist(), low.tolist(), high.tolist(), [[_clean(v) for v in row] for row in p.tolist()], n.tolist()
+
+
+def compute_lift_stats(parsed_data, metrics=None, bucket_map=None, control_group_ids=None,
+                       method="delta", confidence=0.95, alpha=None, n_boot=1000, seed=0):
+    """
+    对每个 treatment（含控制桶个体及“总体 Treatment”）× 指标给出 lift、置信区间与 p 值。
+    返回 {"method", "confidence", "units", "groups": [{..., "metrics": {metric: {...}}}]}；
+    没有对照组数据时 groups 为空。alpha 默认 1 - confidence。
+    """
+    if alpha is None:
+        alpha = 1 - confidence
+    result = {"method": method, "confidence": confidence, "units": 0, "groups": []}
+    if not parsed_data or "columns" not in parsed_data:
+        return result
+    data = _collect(parsed_data, metrics, bucket_map, control_group_ids)
+    if not data or not data["treatments"]:
+        return result
+    result["units"] = len(data["units"])
+    metric_cols = data["metrics"]
+
+    if method == "bootstrap" and not HAS_NUMPY:
+        _stderr("警告: 未安装 numpy，bootstrap 回退为 delta method\n")
+        method = result["method"] = "delta"
+    z_crit = _norm_ppf(1 - (1 - confidence) / 2)
+    if method == "bootstrap":
+        lift, low, high, p, n = _bootstrap_arrays(data, confidence, n_boot, seed)
+    elif HAS_NUMPY:
+        lift, low, high, p, n = _delta_arrays(data, z_crit)
+    else:
+        lift, low, high, p, n = [], [], [], [], []
+        (xc, yc) = data["control"]
+        for xs, ys in data["treatments"]:
+            cols = [_delta_one(xs[j], ys[j], xc[j], yc[j], z_crit) for j in range(len(metric_cols))]
+            for acc, k in ((lift, 0), (low, 1), (high, 2), (p, 3), (n, 4)):
+                acc.append([c[k] for c in cols])
+
+    for k, entry in enumerate(data["entries"]):
+        per_metric = {}
+        for j, metric in enumerate(metric_cols):
+            pv = _clean(p[k][j])
+            per_metric[metric] = {
+                "lift": _clean(lift[k][j]),
+                "ci_low": _clean(low[k][j]),
+                "ci_high": _clean(high[k][j]),
+                "p_value": pv,
+                "significant": pv is not None and pv < alpha,
+                "n_units": int(n[k][j]),
+                "ratio_of": data["numerators"][j],
+            }
+        item = dict(entry)
+        item["metrics"] = per_metric
+        result["groups"].append(item)
+    return result
+
+
+def overall_ab_metrics(stats):
+    """取“总体 Treatment”（没有时取第一个实验组）的 {metric: {lift, p_value, ...}}，供排序使用"""
+    groups = stats.get("groups") or []
+    picked = next((g for g in groups if g["abtest_group"] == OVERALL_KEY), None)
+    if picked is None:
+        picked = next((g for g in groups if not g.get("is_control_bucket")), None)
+    return dict(picked["metrics"]) if picked else {}
+
+
+def format_ci(metric_stats):
+    """'+1.23% [-0.40%, +2.86%] p=0.140 *'；缺区间时只给 lift"""
+    if not metric_stats or metric_stats.get("lift") is None:
+        return "N/A"
+    text = format_lift(metric_stats["lift"])
+    if metric_stats.get("ci_low") is not None and metric_stats.get("ci_high") is not None:
+        text += " [%s, %s]" % (format_lift(metric_stats["ci_low"]), format_lift(metric_stats["ci_high"]))
+    if metric_stats.get("p_value") is not None:
+        text += " p=%.3f" % metric_stats["p_value"]
+        if metric_stats.get("significant"):
+            text += " *"
+    return text
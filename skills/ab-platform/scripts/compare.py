@@ -12,6 +12,13 @@ import io
 import json
 import os
 import sys
+import threading
+import time
+
+try:
+    import queue as _queue
+except ImportError:  # Python 2
+    import Queue as _queue
 
 # Python 2: 让 sys.stdout 能输出 UTF-8
 if sys.version_info[0] < 3:
@@ -56,7 +63,9 @@ _load_env_file(os.path.expanduser("~/.openclaw/.env"))
 _load_env_file(os.path.join(SKILL_ROOT, ".env"))
 
 from ab_client import PlatformAPIClient, CacheManager, get_default_metrics
-from analysis import extract_metric_lifts, format_lift, get_metric_columns
+from analysis import (
+    compute_lift_stats, extract_metric_lifts, format_ci, format_lift, get_metric_columns, overall_ab_metrics,
+)
 from analysis.comparison import ComparisonAnalyzer
 
 
@@ -82,8 +91,13 @@ def _flatten_groups(groups):
     return ";".join(parts) if parts else ""
 
 
+# 并发宽度与整体超时（秒）；超时未完成的实验不计入对比结果
+DEFAULT_WORKERS = int(os.getenv("AB_COMPARE_WORKERS") or "4")
+DEFAULT_TIMEOUT = float(os.getenv("AB_COMPARE_TIMEOUT") or "180")
+
+
 def fetch_metrics_for_experiment(experiment_id, project_id=None, metrics=None,
-                                 dates=None, regions=None, token=None):
+                                 dates=None, regions=None, token=None, client=None):
     defaults = _load_defaults()
 
     if project_id is None:
@@ -95,7 +109,8 @@ def fetch_metrics_for_experiment(experiment_id, project_id=None, metrics=None,
 
     cache = CacheManager(cache_dir=os.path.join(SKILL_ROOT, ".cache"), ttl=300)
 
-    client = PlatformAPIClient(token=token)
+    if client is None:
+        client = PlatformAPIClient(token=token)
     kwargs = {}
     if regions:
         kwargs["regions"] = regions
@@ -188,26 +203,104 @@ def _get_treatment_avg_lifts(lifts, defaults):
     return treatment_lifts
 
 
-def compare_experiments(experiment_ids, project_id=None, metrics=None,
-                        sort_by=None, dates=None, regions=None, token=None):
-    defaults = _load_defaults()
-    results = []
+def _fetch_concurrently(experiment_ids, fetch_one, workers, timeout, progress=True):
+    """用 workers 个线程并发执行 fetch_one(exp_id)
+
+    返回 (data_by_id, failed_ids, timed_out_ids)。超过 timeout 秒仍未完成的实验
+    记入 timed_out_ids 并直接返回已完成的部分；后台线程为 daemon，不阻塞退出。
+    """
+    pending = _queue.Queue()
     for exp_id in experiment_ids:
-        data = fetch_metrics_for_experiment(exp_id, project_id, metrics, dates, regions, token=token)
+        pending.put(exp_id)
+    finished = _queue.Queue()
+
+    def _worker():
+        while True:
+            try:
+                exp_id = pending.get_nowait()
+            except _queue.Empty:
+                return
+            start = time.time()
+            try:
+                data = fetch_one(exp_id)
+            except Exception as e:
+                sys.stderr.write("警告: 实验 %s 查询异常: %s\n" % (exp_id, e))
+                data = None
+            finished.put((exp_id, data, time.time() - start))
+
+    total = len(experiment_ids)
+    for _ in range(max(1, min(workers, total))):
+        t = threading.Thread(target=_worker)
+        t.daemon = True
+        t.start()
+
+    deadline = time.time() + timeout if timeout else None
+    data_by_id = {}
+    failed = []
+    done = 0
+    while done < total:
+        remaining = None if deadline is None else deadline - time.time()
+        if remaining is not None and remaining <= 0:
+            break
+        try:
+            exp_id, data, elapsed = finished.get(timeout=remaining)
+        except _queue.Empty:
+            break
+        done += 1
         if data:
-            results.append({"experiment_id": exp_id, "data": data})
+            data_by_id[exp_id] = data
         else:
-            sys.stderr.write("警告: 实验 %s 获取数据失败\n" % exp_id)
+            failed.append(exp_id)
+        if progress:
+            sys.stderr.write("[%d/%d] 实验 %s %s (%.1fs)\n" % (
+                done, total, exp_id, "完成" if data else "失败", elapsed))
+
+    timed_out = [e for e in experiment_ids if e not in data_by_id and e not in failed]
+    return data_by_id, failed, timed_out
+
+
+def compare_experiments(experiment_ids, project_id=None, metrics=None,
+                        sort_by=None, dates=None, regions=None, token=None,
+                        workers=None, timeout=None, progress=True,
+                        ci_method="delta", confidence=0.95):
+    defaults = _load_defaults()
+    workers = workers or DEFAULT_WORKERS
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+
+    # 所有线程共用一个 client：连接池大小与并发宽度一致
+    client = PlatformAPIClient(token=token, pool_size=max(1, workers))
+
+    def _fetch_one(exp_id):
+        return fetch_metrics_for_experiment(exp_id, project_id, metrics, dates, regions, token=token, client=client)
+
+    data_by_id, failed, timed_out = _fetch_concurrently(experiment_ids, _fetch_one, workers, timeout, progress)
+    if (os.getenv("AB_API_DEBUG") or "").lower() in ("1", "true", "yes", "y"):
+        sys.stderr.write("AB_API_DEBUG latency=%s\n" % json.dumps(client.get_latency_stats(), sort_keys=True))
+    for exp_id in failed:
+        sys.stderr.write("警告: 实验 %s 获取数据失败\n" % exp_id)
+    for exp_id in timed_out:
+        sys.stderr.write("警告: 实验 %s 超过 %ss 未返回，已跳过\n" % (exp_id, timeout))
+
+    # 保持输入顺序
+    results = [{"experiment_id": e, "data": data_by_id[e]} for e in experiment_ids if e in data_by_id]
 
     if len(results) < 2:
-        return {"error": "需要至少2个实验的有效数据"}
+        return {"error": "需要至少2个实验的有效数据", "failed": failed, "timed_out": timed_out}
 
-    comparison = ComparisonAnalyzer.compare_ab_results(results)
     first_data = results[0]["data"]
     columns = first_data.get("columns", [])
     metric_cols = metrics if metrics else get_metric_columns(columns)
 
+    # 置信区间 / 显著性直接由已取回的 body 行计算，不再请求平台
+    ctrl_ids = defaults.get("control_groups") or []
+    for r in results:
+        r["stats"] = compute_lift_stats(r["data"], metrics=metric_cols, control_group_ids=ctrl_ids,
+                                        method=ci_method, confidence=confidence)
+    comparison = ComparisonAnalyzer.compare_ab_results(results)
+
     lines = ["实验对比（共 %s 个实验）" % len(results), "=" * 60]
+    if failed or timed_out:
+        lines.insert(1, "部分结果：缺少实验 %s" % ", ".join(str(e) for e in failed + timed_out))
     header = "%10s" % "实验ID"
     for m in metric_cols:
         header += "  %15s" % m
@@ -226,22 +319,26 @@ def compare_experiments(experiment_ids, project_id=None, metrics=None,
                 row += "  %15s" % "N/A"
         lines.append(row)
 
+    lines.append("\n显著性（总体 Treatment，%s，%d%% CI，* 为显著）:" % (ci_method, round(confidence * 100)))
+    for r in results:
+        overall = overall_ab_metrics(r["stats"])
+        lines.append("  实验 %s（%s 个配对单元格）:" % (r["experiment_id"], r["stats"].get("units", 0)))
+        for m in metric_cols:
+            lines.append("    %s: %s" % (m, format_ci(overall.get(m))))
+
     if sort_by and sort_by in metric_cols:
-        lines.append("\n按 %s 排序:" % sort_by)
-        sort_data = []
-        for r in results:
-            lifts = r["data"].get("lifts", {})
-            avg_lifts = _get_treatment_avg_lifts(lifts, defaults)
-            if sort_by in avg_lifts:
-                sort_data.append((r["experiment_id"], avg_lifts[sort_by]))
-        sort_data.sort(key=lambda x: x[1], reverse=True)
-        for i, (exp_id, lift) in enumerate(sort_data):
-            lines.append("  %s. 实验 %s: %s" % (i + 1, exp_id, format_lift(lift)))
+        lines.append("\n按 %s 排序（显著优先，其次按 lift）:" % sort_by)
+        ranked = ComparisonAnalyzer.rank_by_significance(results, sort_by, alpha=1 - confidence)
+        for i, item in enumerate(ranked):
+            lines.append("  %s. 实验 %s: %s" % (
+                i + 1, item["experiment_id"], format_ci(item["data"]["ab_metrics"].get(sort_by))))
 
     return {
         "experiment_ids": experiment_ids,
         "results": results,
         "comparison": comparison,
+        "failed": failed,
+        "timed_out": timed_out,
         "formatted_text": "\n".join(lines),
     }
 
@@ -255,6 +352,12 @@ def main():
     parser.add_argument("--dates", type=str, default=None, help="日期范围 start,end")
     parser.add_argument("--regions", type=str, default=None, help="地区，逗号分隔")
     parser.add_argument("--token", type=str, default=None, help="AB API Token（不传则用环境变量 AB_API_TOKEN）")
+    parser.add_argument("--workers", type=int, default=None, help="并发查询数（默认 AB_COMPARE_WORKERS 或 4）")
+    parser.add_argument("--timeout", type=float, default=None, help="整体超时秒数，超时后返回部分结果（默认 180）")
+    parser.add_argument("--quiet", action="store_true", help="不输出逐个实验的进度")
+    parser.add_argument("--ci-method", choices=["delta", "bootstrap"], default="delta",
+                        help="置信区间算法（bootstrap 需要 numpy）")
+    parser.add_argument("--confidence", type=float, default=0.95, help="置信水平（默认 0.95）")
     parser.add_argument("--json", action="store_true", help="输出 JSON")
     args = parser.parse_args()
 
@@ -279,6 +382,11 @@ def main():
         dates=dates,
         regions=regions,
         token=args.token,
+        workers=args.workers,
+        timeout=args.timeout,
+        progress=not args.quiet,
+        ci_method=args.ci_method,
+        confidence=args.confidence,
     )
     if "error" in result:
         sys.stderr.write("错误: %s\n" % result["error"])
@@ -287,6 +395,9 @@ def main():
         print(json.dumps({
             "experiment_ids": result["experiment_ids"],
             "comparison": result["comparison"],
+            "significance": dict((str(r["experiment_id"]), r["stats"]) for r in result["results"]),
+            "failed": result["failed"],
+            "timed_out": result["timed_out"],
         }, ensure_ascii=False, indent=2))
     else:
         print(result.get("formatted_text", "无数据"))
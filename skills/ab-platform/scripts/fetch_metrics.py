@@ -258,6 +258,8 @@ def fetch_metrics(
     params.update(call_kwargs)
 
     result = client.get_ab_metrics(**params)
+    if (os.getenv("AB_API_DEBUG") or "").lower() in ("1", "true", "yes", "y"):
+        sys.stderr.write("AB_API_DEBUG latency=%s\n" % json.dumps(client.get_latency_stats(), sort_keys=True))
 
     if result and card_type:
         ct = card_type.strip().lower()
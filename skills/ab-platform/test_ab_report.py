@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ab_report NumPy / 纯 Python 两条路径的一致性测试（兼容 Python 2.7.18 / Python 3.x）
+
+    python test_ab_report.py        # 或 python -m pytest test_ab_report.py
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import random
+import sys
+
+SKILL_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SKILL_ROOT, "lib"))
+
+from analysis import ab_report  # noqa: E402
+
+METRIC_VALUES = ["", None, "abc", "0", "nan", "NaN", "inf", "-inf", "1,000"]
+
+
+def _gen(seed):
+    """随机报告数据：含缺失、无法解析、nan / inf 单元格，以及多日期、对照桶"""
+    r = random.Random(seed)
+    metrics = ["m%d" % i for i in range(r.randint(1, 5))]
+    columns = ["group_prefix", "abtest_group", "abtest_region", "abtest_date"] + metrics
+    groups = [("Control Group", "1;2"), ("Treatment", "1"), ("Treatment", "2"),
+              ("Treatment", "3"), ("Treatment 2", "4")]
+    dates = ["2026-01-%02d" % d for d in range(1, r.randint(2, 5))]
+
+    def val():
+        if r.random() < 0.3:
+            return r.choice(METRIC_VALUES)
+        return "%.3f" % r.uniform(-10, 1000)
+
+    body, relative = [], []
+    for _ in range(r.randint(1, 50)):
+        prefix, gid = r.choice(groups)
+        row = {"group_prefix": prefix, "abtest_group": gid, "abtest_region": "SG",
+               "abtest_date": r.choice(dates)}
+        for metric in metrics:
+            row[metric] = val()
+        body.append(row)
+        if r.random() < 0.5:
+            rel = dict(row)
+            for metric in metrics:
+                rel[metric] = val()
+            relative.append(rel)
+    return {"columns": columns, "body": body, "relative": relative}, {"1": "b1", "4": "b4"}, ["1", "2"]
+
+
+def _run(parsed, bucket_map, control_ids, use_numpy):
+    saved = ab_report.HAS_NUMPY
+    ab_report.HAS_NUMPY = use_numpy
+    try:
+        return (
+            ab_report.format_ab_summary(parsed, 5, bucket_map, control_ids),
+            ab_report.format_lift_report(parsed, 5, False, bucket_map, control_ids),
+            ab_report.format_lift_report(parsed, 5, True, bucket_map, control_ids),
+            json.dumps(ab_report.get_grouped_summary(parsed, bucket_map, control_ids), sort_keys=True),
+            json.dumps(ab_report.get_daily_lift_summary(parsed, bucket_map, control_ids), sort_keys=True),
+        )
+    finally:
+        ab_report.HAS_NUMPY = saved
+
+
+def test_numpy_matches_pure_python():
+    if not ab_report.HAS_NUMPY:
+        print("未安装 NumPy，跳过向量化路径对比")
+        return
+    for seed in range(300):
+        parsed, bucket_map, control_ids = _gen(seed)
+        assert _run(parsed, bucket_map, control_ids, True) == \
+            _run(parsed, bucket_map, control_ids, False), "seed=%d" % seed
+
+
+def test_nan_cells_propagate():
+    """值为 "nan" 的单元格算作有值：求和结果为 nan，而不是被当成缺失丢掉"""
+    parsed = {
+        "columns": ["group_prefix", "abtest_group", "abtest_date", "gmv"],
+        "body": [
+            {"group_prefix": "Control Group", "abtest_group": "1", "abtest_date": "2026-01-01", "gmv": "4"},
+            {"group_prefix": "Treatment", "abtest_group": "2", "abtest_date": "2026-01-01", "gmv": "5"},
+            {"group_prefix": "Treatment", "abtest_group": "2", "abtest_date": "2026-01-01", "gmv": "nan"},
+        ],
+        "relative": [],
+    }
+    for use_numpy in ([False, True] if ab_report.HAS_NUMPY else [False]):
+        summary, lift = _run(parsed, {}, ["1"], use_numpy)[:2]
+        assert "gmv: nan" in summary, summary
+        assert "gmv: nan%" in lift, lift
+
+
+if __name__ == "__main__":
+    test_numpy_matches_pure_python()
+    test_nan_cells_propagate()
+    print("OK")